@@ -5,21 +5,256 @@ A web application for Splunk analysts to learn SPL (Search Processing Language).
 Mirrors SIFTed's scaffolding for learning philosophy with Splunk-inspired aesthetics.
 """
 
-import re
-
+import hashlib
+import hmac
+import os
+import time
+from functools import wraps
+
+import db_backup
+import db_maintenance
+import generate_cache
+import json_stream
+import profiling
+import rate_limit
+import spl_analyzer
+import spl_composer
+import spl_structure
+import splunk_app
 import storage
 import training_storage
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import write_queue
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, send_file, send_from_directory
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.routing import BaseConverter
 
-app = Flask(__name__)
 
+class TenantConverter(BaseConverter):
+    """Tenant namespace in /api/tenants/<tenant>/... routes."""
+    regex = storage.TENANT_PATTERN
+
+
+app = Flask(__name__)
+app.url_map.converters["tenant"] = TenantConverter
+app.config.update(
+    # Token required in X-Admin-Token for /admin routes; unset means direct loopback clients only
+    ADMIN_TOKEN=None,
+    # Serve /api/mappings/changes as server-sent events. Each open stream holds a worker thread,
+    # so enable it only with a threaded or async worker class (gunicorn -k gthread or gevent)
+    CHANGE_STREAM_ENABLED=False,
+    # Seconds an /api/mappings/changes event stream stays open before the browser reconnects
+    CHANGE_STREAM_SECONDS=300,
+    # Seconds between change log reads while an event stream is open
+    CHANGE_POLL_SECONDS=1.0,
+    # Set while scripts/freeze-site.py renders pages; loads the static API shim
+    STATIC_EXPORT=False,
+    **db_backup.DEFAULT_CONFIG,
+    **db_maintenance.DEFAULT_CONFIG,
+    **generate_cache.DEFAULT_CONFIG,
+    **profiling.DEFAULT_CONFIG,
+    **rate_limit.DEFAULT_CONFIG,
+    **write_queue.DEFAULT_CONFIG
+)
+app.config.from_prefixed_env("SPLUNKED")
+
+if app.config["TRUSTED_PROXIES"]:
+    # Rate limit buckets are keyed on the client address the proxies report
+    proxies = int(app.config["TRUSTED_PROXIES"])
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+
+storage.configure_write_queue(app.config)
 storage.init_db()
 training_storage.init_db()
+db_maintenance.start(app.config)
+
+# Pages precached by the offline service worker (endpoint names)
+OFFLINE_PAGE_ENDPOINTS = [
+    "index",
+    "glossary",
+    "references",
+    "prompt_builder",
+    "training",
+    "query_library"
+]
+
+# Upper bound on ids per /api/training/items batch request
+MAX_BATCH_ITEMS = 200
+
+# Idle event streams send a comment this often so proxies keep the connection open
+CHANGE_HEARTBEAT_SECONDS = 15
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+CHANGE_RETRY_MS = 3000
+
+# Headers a reverse proxy adds; a loopback request carrying one may come from anywhere
+FORWARDING_HEADERS = ("X-Forwarded-For", "X-Real-IP", "Forwarded")
+
+_offline_manifest = None
+
+
+def has_admin_token():
+    """True when an admin token is configured and the request carries it."""
+    token = app.config.get("ADMIN_TOKEN")
+    if not token:
+        return False
+    supplied = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode(), str(token).encode())
+
+
+def is_admin_request():
+    """True with the configured admin token, or from a direct loopback client when none is set."""
+    if app.config.get("ADMIN_TOKEN"):
+        return has_admin_token()
+    # Behind a local reverse proxy every client is loopback, so proxied requests need the token
+    if any(header in request.headers for header in FORWARDING_HEADERS):
+        return False
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def admin_required(view):
+    """Allow a request with the configured admin token, or from a direct loopback client when none is set."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def rate_limited(group):
+    """Admit the request through the group's per-client token bucket and concurrency cap."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Only the token exempts: without one, every client behind a local proxy is loopback
+            if app.config["RATE_LIMIT_EXEMPT_ADMIN"] and has_admin_token():
+                return view(*args, **kwargs)
+            slot = rate_limit.admit(app.config, group, request.remote_addr or "unknown")
+            if slot is None:
+                return view(*args, **kwargs)
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                slot.release()
+                raise
+            # Streamed bodies keep the slot until the client has read them
+            response.call_on_close(slot.release)
+            return response
+        return wrapper
+    return decorator
+
+
+@app.before_request
+def start_profile():
+    """Profile this request when profiling is enabled and an admin asks for it."""
+    if not app.config["PROFILING_ENABLED"]:
+        return
+    requested = request.headers.get(profiling.PROFILE_HEADER) or request.args.get(profiling.PROFILE_PARAM)
+    if requested in (None, "", "0") or not is_admin_request():
+        return
+    g.profile = profiling.RequestProfile(app.config)
+    g.profile.start()
+
+
+@app.after_request
+def save_profile(response):
+    """Save the request's profile and point the client at it with X-Profile-Id."""
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+
+    endpoint, method, path = request.endpoint, request.method, request.full_path.rstrip("?")
+    response.headers["X-Profile-Id"] = profile.profile_id(endpoint)
+
+    def finish():
+        profile.stop()
+        profile.save(endpoint, method, path, response.status_code)
+
+    if response.is_streamed:
+        # A streamed body is produced after this hook; keep profiling until the server has sent it
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+
+@app.teardown_request
+def discard_profile(exc):
+    """Stop the sampler if the request failed before after_request could save it."""
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
+
+
+def wants_ndjson():
+    """True when the client asked for newline-delimited JSON over a JSON document."""
+    best = request.accept_mimetypes.best_match(["application/json", json_stream.NDJSON_MIMETYPE])
+    return best == json_stream.NDJSON_MIMETYPE
+
+
+def stream_json(chunks, ndjson=False):
+    """Response that sends encoded JSON chunks as they are produced."""
+    mimetype = json_stream.NDJSON_MIMETYPE if ndjson else "application/json"
+    return Response(json_stream.buffered(chunks), mimetype=mimetype)
+
+
+def _list_param(data, name):
+    """A filter given as a JSON string or list, or as repeated ?name= query arguments."""
+    value = data.get(name) or request.args.getlist(name)
+    return value if isinstance(value, list) else [value]
+
+
+def get_catalog(tenant=None):
+    """Composition lookups for a tenant's mappings plus the shared set, rebuilt only after they change."""
+    return storage.tenant_cached(
+        tenant,
+        "catalog",
+        lambda: spl_composer.build_catalog(storage.get_all_mappings(tenant=tenant))
+    )
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
 
+def _iter_files(root):
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            path = os.path.join(dir_path, file_name)
+            yield os.path.relpath(path, root).replace(os.sep, "/"), path
 
-def index_by_id(items):
-    """Build an id->object lookup for fast access."""
-    return {item.get("id"): item for item in items if item.get("id")}
+
+def build_offline_manifest():
+    """List every precacheable URL with a content hash; the version changes when any entry does."""
+    global _offline_manifest
+    if _offline_manifest and not app.debug:
+        return _offline_manifest
+
+    template_digest = hashlib.sha256()
+    for rel_path, path in _iter_files(os.path.join(app.root_path, app.template_folder)):
+        template_digest.update(f"{rel_path}:{_hash_file(path)}\n".encode())
+    page_hash = template_digest.hexdigest()[:16]
+
+    entries = [{"url": url_for(endpoint), "hash": page_hash} for endpoint in OFFLINE_PAGE_ENDPOINTS]
+    for rel_path, path in _iter_files(app.static_folder):
+        if rel_path == "sw.js":
+            continue
+        entries.append({"url": url_for("static", filename=rel_path), "hash": _hash_file(path)})
+
+    version_digest = hashlib.sha256()
+    for entry in entries:
+        version_digest.update(f"{entry['url']}:{entry['hash']}\n".encode())
+
+    _offline_manifest = {
+        "version": version_digest.hexdigest()[:16],
+        "entries": entries
+    }
+    return _offline_manifest
 
 
 # Page Routes
@@ -71,42 +306,270 @@ def query_library():
     return render_template("query-library.html")
 
 
+# Offline Cache
+@app.route("/sw.js")
+def service_worker():
+    """Serve the service worker from the site root so its scope covers every page."""
+    response = send_from_directory(app.static_folder, "sw.js", max_age=0)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/offline-manifest.json")
+def offline_manifest():
+    """Return the precache manifest consumed by the service worker."""
+    response = jsonify(build_offline_manifest())
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 # Training Content API
 @app.route("/api/training/index", methods=["GET"])
+@rate_limited("index")
 def training_index():
-    """Return lightweight training metadata for search and listings."""
-    return jsonify(training_storage.get_training_index())
+    """Return lightweight training metadata, or only what changed after ?since=<revision>&epoch=<epoch>."""
+    since = request.args.get("since", type=int)
+    if since:
+        changes = training_storage.get_training_changes(since, request.args.get("epoch"))
+        if changes is not None:
+            return jsonify(changes)
+    return stream_json(_training_index_chunks(wants_ndjson()), wants_ndjson())
+
+
+def _training_index_chunks(ndjson):
+    # Runs while the response is sent, reading from one snapshot of training.db
+    with training_storage.snapshot() as conn:
+        revision = training_storage.current_revision(conn)
+        epoch = training_storage.current_epoch(conn)
+        if ndjson:
+            yield from json_stream.iter_ndjson([{"section": "revision", "revision": revision, "epoch": epoch}])
+            for section, lessons in (("lessons", True), ("training", False)):
+                yield from json_stream.iter_ndjson(
+                    {**module, "section": section, "indexCategory": category}
+                    for category, module in training_storage.iter_index_modules(conn, lessons)
+                )
+            yield from json_stream.iter_ndjson(
+                {**pipeline, "section": "pipelines"} for pipeline in training_storage.iter_pipelines(conn)
+            )
+            return
+
+        yield from json_stream.iter_object([
+            ("epoch", epoch),
+            ("lessons", json_stream.iter_grouped(training_storage.iter_index_modules(conn, True))),
+            ("pipelines", json_stream.iter_array(training_storage.iter_pipelines(conn))),
+            ("revision", revision),
+            ("training", json_stream.iter_grouped(training_storage.iter_index_modules(conn, False)))
+        ])
+
+
+@app.route("/api/training/pipelines/<pipeline_id>", methods=["GET"])
+def training_pipeline(pipeline_id):
+    """Return a pipeline with every step joined to its training module metadata."""
+    pipeline = training_storage.get_resolved_pipeline(pipeline_id)
+    if not pipeline:
+        return jsonify({"error": f"Pipeline not found: {pipeline_id}"}), 404
+    return jsonify(pipeline)
+
+
+@app.route("/api/training/items", methods=["GET"])
+@rate_limited("index")
+def training_items():
+    """Return several training items at once from ?ids=a,b,c and/or every step of ?pipeline=<id>."""
+    item_ids = [item_id.strip() for item_id in request.args.get("ids", "").split(",") if item_id.strip()]
+
+    pipeline_id = request.args.get("pipeline")
+    if pipeline_id:
+        source_ids = training_storage.get_pipeline_source_ids(pipeline_id)
+        if source_ids is None:
+            return jsonify({"error": f"Pipeline not found: {pipeline_id}"}), 404
+        item_ids.extend(source_ids)
+
+    item_ids = list(dict.fromkeys(item_ids))
+    if not item_ids:
+        return jsonify({"error": "No item ids provided"}), 400
+    if len(item_ids) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"Too many items requested (max {MAX_BATCH_ITEMS})"}), 400
+
+    items = training_storage.get_training_items(item_ids)
+    found = [items[item_id] for item_id in item_ids if item_id in items]
+    return jsonify({
+        "items": found,
+        "missing": [item_id for item_id in item_ids if item_id not in items],
+        # SPL shared by several items is sent once
+        "snippets": training_storage.collect_snippets(found)
+    })
 
 
 @app.route("/api/training/items/<item_id>", methods=["GET"])
 def training_item(item_id):
     """Return full training content for a specific item."""
-    item = training_storage.get_training_item(item_id)
+    item = training_storage.get_training_item_with_snippets(item_id)
     if not item:
         return jsonify({"error": f"Training item not found: {item_id}"}), 404
     return jsonify(item)
 
 
+@app.route("/api/training/items/<item_id>/check", methods=["POST"])
+@rate_limited("check")
+def check_training_answer(item_id):
+    """Compare submitted SPL with the item's reference solutions by structure; ?target= narrows to one."""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("spl"), str) or not data["spl"].strip():
+        return jsonify({"error": "No SPL provided"}), 400
+
+    answers = training_storage.get_answer_structures(item_id)
+    if answers is None:
+        return jsonify({"error": f"Training item not found: {item_id}"}), 404
+    target = data.get("target") or request.args.get("target")
+    if target:
+        answers = [answer for answer in answers if answer[0] == target or answer[0].startswith(f"{target}.")]
+    if not answers:
+        return jsonify({"error": f"No reference solution to check against: {target or item_id}"}), 404
+    return jsonify({"id": item_id, **spl_structure.check(data["spl"], answers)})
+
+
+@app.route("/api/training/items/<item_id>/similar", methods=["GET"])
+def similar_training_items(item_id):
+    """Queries and training modules most like this training module, from the rebuild-time index."""
+    return _similar("training", item_id)
+
+
+@app.route("/api/queries/<query_id>/similar", methods=["GET"])
+def similar_queries(query_id):
+    """Queries and training modules most like this library query, from the rebuild-time index."""
+    return _similar("query", query_id)
+
+
+def _similar(kind, item_id):
+    limit = request.args.get("limit", type=int)
+    found = training_storage.get_similar_items(kind, item_id, max(1, limit) if limit else None)
+    if found is None:
+        return jsonify({"error": f"Not found: {item_id}"}), 404
+    return jsonify({"id": item_id, "kind": kind, "similar": found})
+
+
 # API Routes for Prompt Builder
 @app.route("/api/mappings", methods=['GET'])
-def get_all_mappings():
-    """Get all search objects."""
-    return jsonify(storage.get_all_mappings())
+@app.route("/api/tenants/<tenant:tenant>/mappings", methods=['GET'])
+@rate_limited("index")
+def get_all_mappings(tenant=None):
+    """Get all search objects visible to the tenant, optionally limited to those carrying every ?tag=."""
+    # Read before the listing, so changes committed meanwhile are replayed rather than missed
+    latest = storage.get_mapping_changes(tenant=tenant)["latest"]
+    pairs = storage.iter_mappings(request.args.getlist("tag"), tenant)
+    if wants_ndjson():
+        records = ({**obj, "typeKey": type_key} for type_key, obj in pairs)
+        response = stream_json(json_stream.iter_ndjson(records), ndjson=True)
+    else:
+        response = stream_json(json_stream.iter_grouped(pairs, storage.DEFAULT_MAPPINGS))
+    response.headers["X-Mapping-Changes-Latest"] = str(latest)
+    return response
+
+
+@app.route("/api/mappings/tags", methods=['GET'])
+@app.route("/api/tenants/<tenant:tenant>/mappings/tags", methods=['GET'])
+def get_mapping_tags(tenant=None):
+    """Get tag usage counts across search objects, optionally for one ?type=."""
+    type_name = request.args.get("type")
+    counts = storage.get_tag_counts(type_name, tenant)
+    if counts is None:
+        return jsonify({"error": f"Unknown type: {type_name}"}), 404
+    return jsonify(counts)
+
+
+@app.route("/api/mappings/suggest", methods=['GET'])
+@app.route("/api/tenants/<tenant:tenant>/mappings/suggest", methods=['GET'])
+def suggest_mappings(tenant=None):
+    """Typeahead lookup of search objects by name, friendly name, tags, and SPL."""
+    query = request.args.get("q", "")
+    type_name = request.args.get("type")
+    limit = request.args.get("limit", 10, type=int)
+    limit = max(1, min(limit, 50))
+
+    if type_name and not storage.resolve_type_key(type_name):
+        return jsonify({"error": f"Unknown type: {type_name}"}), 404
+
+    return jsonify({
+        "query": query,
+        "results": storage.suggest_mappings(query, type_name, limit, tenant)
+    })
+
+
+def _change_since():
+    """Resume point from the EventSource Last-Event-ID header or ?since=, None when absent."""
+    value = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        return max(0, int(value)) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _change_events(since, tenant):
+    """Server-sent events for each mapping change after since, until CHANGE_STREAM_SECONDS pass."""
+    deadline = time.monotonic() + app.config["CHANGE_STREAM_SECONDS"]
+    if since is None:
+        since = storage.get_mapping_changes(tenant=tenant)["latest"]
+    yield f"retry: {CHANGE_RETRY_MS}\n\n"
+    last_sent = time.monotonic()
+    while True:
+        feed = storage.get_mapping_changes(since, tenant)
+        if feed["reset"]:
+            # Skip straight to the current position; the client reloads all mappings
+            since = storage.get_mapping_changes(tenant=tenant)["latest"]
+            yield f"id: {since}\nevent: reset\ndata: {json_stream.dumps({'latest': since})}\n\n"
+            last_sent = time.monotonic()
+            continue
+        for change in feed["changes"]:
+            yield f"id: {change['seq']}\nevent: {change['op']}\ndata: {json_stream.dumps(change)}\n\n"
+            last_sent = time.monotonic()
+        since = feed["latest"]
+        if feed["more"]:
+            continue
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        if now - last_sent >= CHANGE_HEARTBEAT_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = now
+        time.sleep(app.config["CHANGE_POLL_SECONDS"])
+
+
+@app.route("/api/mappings/changes", methods=['GET'])
+@app.route("/api/tenants/<tenant:tenant>/mappings/changes", methods=['GET'])
+@rate_limited("changes")
+def mapping_changes(tenant=None):
+    """Mapping create/update/delete events as server-sent events, or as JSON after ?since= for polling."""
+    since = _change_since()
+    if request.accept_mimetypes.best == "text/event-stream":
+        if not app.config["CHANGE_STREAM_ENABLED"]:
+            # 204 tells EventSource not to reconnect; the client falls back to ?since= polling
+            return "", 204
+        response = Response(_change_events(since, tenant), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+    return jsonify(storage.get_mapping_changes(since, tenant))
 
 
 @app.route("/api/mappings/<type_name>", methods=['GET'])
-def get_mappings_by_type(type_name):
+@app.route("/api/tenants/<tenant:tenant>/mappings/<type_name>", methods=['GET'])
+@rate_limited("index")
+def get_mappings_by_type(type_name, tenant=None):
     """Get search objects by type."""
     type_key = storage.resolve_type_key(type_name)
     if not type_key:
         return jsonify({"error": f"Unknown type: {type_name}"}), 404
 
-    records = storage.get_mappings_by_type(type_name)
-    return jsonify(records)
+    records = (obj for _, obj in storage.iter_mappings(request.args.getlist("tag"), tenant, type_key))
+    if wants_ndjson():
+        return stream_json(json_stream.iter_ndjson(records), ndjson=True)
+    return stream_json(json_stream.iter_array(records))
 
 
 @app.route("/api/mappings/<type_name>", methods=['POST'])
-def create_mapping(type_name):
+@app.route("/api/tenants/<tenant:tenant>/mappings/<type_name>", methods=['POST'])
+@rate_limited("write")
+def create_mapping(type_name, tenant=None):
     """Create a new search object."""
     type_key = storage.resolve_type_key(type_name)
     if not type_key:
@@ -116,13 +579,15 @@ def create_mapping(type_name):
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    new_object = storage.create_mapping(type_name, data)
+    new_object = storage.create_mapping(type_name, data, tenant)
     return jsonify(new_object), 201
 
 
 @app.route("/api/mappings/<type_name>/<obj_id>", methods=['PUT'])
-def update_mapping(type_name, obj_id):
-    """Update an existing search object."""
+@app.route("/api/tenants/<tenant:tenant>/mappings/<type_name>/<obj_id>", methods=['PUT'])
+@rate_limited("write")
+def update_mapping(type_name, obj_id, tenant=None):
+    """Update an existing search object owned by the tenant (or the shared set when unscoped)."""
     type_key = storage.resolve_type_key(type_name)
     if not type_key:
         return jsonify({"error": f"Unknown type: {type_name}"}), 404
@@ -131,212 +596,242 @@ def update_mapping(type_name, obj_id):
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    obj = storage.update_mapping(type_name, obj_id, data)
+    obj = storage.update_mapping(type_name, obj_id, data, tenant)
     if not obj:
         return jsonify({"error": f"Object not found: {obj_id}"}), 404
     return jsonify(obj)
 
 
 @app.route("/api/mappings/<type_name>/<obj_id>", methods=['DELETE'])
-def delete_mapping(type_name, obj_id):
-    """Delete a search object."""
+@app.route("/api/tenants/<tenant:tenant>/mappings/<type_name>/<obj_id>", methods=['DELETE'])
+@rate_limited("write")
+def delete_mapping(type_name, obj_id, tenant=None):
+    """Delete a search object owned by the tenant (or the shared set when unscoped)."""
     type_key = storage.resolve_type_key(type_name)
     if not type_key:
         return jsonify({"error": f"Unknown type: {type_name}"}), 404
 
-    deleted = storage.delete_mapping(type_name, obj_id)
+    deleted = storage.delete_mapping(type_name, obj_id, tenant)
     if not deleted:
         return jsonify({"error": f"Object not found: {obj_id}"}), 404
     return jsonify({"message": "Deleted", "object": deleted})
 
 
 @app.route("/api/generate-spl", methods=['POST'])
-def generate_spl():
-    """Generate SPL from a composition of search objects."""
+@app.route("/api/tenants/<tenant:tenant>/generate-spl", methods=['POST'])
+@rate_limited("generate")
+def generate_spl(tenant=None):
+    """Generate SPL from a composition of the tenant's and shared search objects."""
     data = request.get_json()
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    def normalize_spl_part(spl):
-        return " ".join(spl.split()) if spl else ""
-
-    def is_generating_spl(spl):
-        return normalize_spl_part(spl).startswith("|")
-
-    def is_wrapped(spl):
-        return spl.startswith("(") and spl.endswith(")")
-
-    def is_negated(spl):
-        return bool(re.match(r"^NOT\b", normalize_spl_part(spl), flags=re.IGNORECASE))
-
-    def wrap_spl(spl):
-        trimmed = normalize_spl_part(spl)
-        if not trimmed:
-            return ""
-        return trimmed if is_wrapped(trimmed) else f"({trimmed})"
-
-    def wrap_if_or(spl):
-        trimmed = normalize_spl_part(spl)
-        if not trimmed:
-            return ""
-        if is_negated(trimmed):
-            remainder = re.sub(r"^NOT\b\s*", "", trimmed, flags=re.IGNORECASE)
-            if not remainder:
-                return trimmed
-            if re.search(r"\bOR\b", remainder, flags=re.IGNORECASE) and not is_wrapped(remainder):
-                return f"NOT {wrap_spl(remainder)}"
-            return trimmed
-        return wrap_spl(trimmed) if re.search(r"\bOR\b", trimmed, flags=re.IGNORECASE) else trimmed
-
-    mappings = storage.get_all_mappings()
-    data_sources_by_id = index_by_id(mappings.get("dataSources", []))
-    patterns_by_id = index_by_id(mappings.get("patterns", []))
-    field_values_by_id = index_by_id(mappings.get("fieldValues", []))
-    output_shapes_by_id = index_by_id(mappings.get("outputShapes", []))
-    time_presets_by_id = index_by_id(mappings.get("timeRangePresets", []))
-    filter_objects_by_id = {**patterns_by_id, **field_values_by_id}
-
-    # Extract selections from request
-    data_sources = data.get("dataSources", [])
-    includes = data.get("includes", [])  # Patterns and field values to include
-    excludes = data.get("excludes", [])  # Patterns and field values to exclude
-    time_range = data.get("timeRange", "")
-    output_shape = data.get("outputShape", None)
-    output_field = data.get("outputField", "")
-
-    filter_parts = []
-    explanation_parts = []
-    base_search = ""
-
-    # Build data sources (OR together)
-    data_source_entries = []
-    if data_sources:
-        for ds_id in data_sources:
-            ds = data_sources_by_id.get(ds_id)
-            if ds:
-                spl = normalize_spl_part(ds.get("spl", ""))
-                if spl:
-                    data_source_entries.append({
-                        "name": ds.get("name"),
-                        "spl": spl
-                    })
-
-        generating_sources = [e for e in data_source_entries if is_generating_spl(e["spl"])]
-        event_sources = [e for e in data_source_entries if not is_generating_spl(e["spl"])]
-
-        if generating_sources:
-            base_search = generating_sources[0]["spl"]
-            explanation_parts.append(f"Search in: {generating_sources[0]['name']}")
-        elif event_sources:
-            ds_names = [e["name"] for e in event_sources if e["name"]]
-            ds_spls = [e["spl"] for e in event_sources]
-            or_group = " OR ".join(ds_spls)
-            base_search = or_group if len(ds_spls) > 1 else ds_spls[0]
-            if ds_names:
-                explanation_parts.append(f"Search in: {', '.join(ds_names)}")
-
-    # Build includes (AND together)
-    if includes:
-        include_spls = []
-        include_names = []
-        for inc_id in includes:
-            obj = filter_objects_by_id.get(inc_id)
-            if obj:
-                normalized = normalize_spl_part(obj.get("spl", ""))
-                if not normalized:
-                    continue
-                include_spls.append(wrap_if_or(normalized))
-                include_names.append(obj.get("name"))
-        if include_spls:
-            filter_parts.extend(include_spls)
-            explanation_parts.append(f"Filter for: {', '.join(include_names)}")
-
-    # Build excludes (NOT each)
-    if excludes:
-        exclude_spls = []
-        exclude_names = []
-        for exc_id in excludes:
-            obj = filter_objects_by_id.get(exc_id)
-            if obj:
-                normalized = normalize_spl_part(obj.get("spl", ""))
-                if not normalized:
-                    continue
-                if is_negated(normalized):
-                    exclude_spls.append(wrap_if_or(normalized))
-                else:
-                    exclude_spls.append(f"NOT {wrap_spl(normalized)}")
-                exclude_names.append(obj.get("name"))
-        if exclude_spls:
-            filter_parts.extend(exclude_spls)
-            explanation_parts.append(f"Excluding: {', '.join(exclude_names)}")
-
-    # Add time range
-    time_spl = ""
-    if time_range:
-        # Check if it's a preset ID
-        preset = time_presets_by_id.get(time_range)
-        if preset:
-            time_spl = normalize_spl_part(preset.get("spl", ""))
-            explanation_parts.append(f"Time range: {preset.get('name')}")
-        else:
-            # Assume it's custom SPL
-            time_spl = normalize_spl_part(time_range)
-            explanation_parts.append(f"Time range: {time_range}")
-
-    # Build base search
-    if not base_search and not filter_parts:
-        base_search = "*"
-
-    if base_search and not is_generating_spl(base_search):
-        if len([e for e in data_source_entries if not is_generating_spl(e["spl"])]) > 1 and (filter_parts or time_spl):
-            base_search = wrap_spl(base_search)
-        combined = [base_search]
-        if time_spl:
-            combined.append(time_spl)
-        combined.extend(filter_parts)
-        base_search = " ".join([c for c in combined if c])
-    elif base_search:
-        if time_spl:
-            base_search = f"{base_search} {time_spl}"
-        if filter_parts:
-            base_search = f"{base_search} | search {' '.join(filter_parts)}"
-    else:
-        combined = []
-        if filter_parts:
-            combined.append(" ".join(filter_parts))
-        if time_spl:
-            combined.append(time_spl)
-        base_search = " ".join([c for c in combined if c]) or "*"
-
-    # Add output shape
-    output_spl = ""
-    if output_shape:
-        os_obj = output_shapes_by_id.get(output_shape)
-        if os_obj:
-            output_spl = os_obj.get("spl", "")
-            # Replace field placeholder if needed
-            if os_obj.get("requiresField") and output_field:
-                output_spl = output_spl.replace(os_obj.get("fieldPlaceholder", "{field}"), output_field)
-                output_spl = output_spl.replace("{field1}", output_field)
-                output_spl = output_spl.replace("{field2}", output_field)
-            explanation_parts.append(f"Output: {os_obj.get('name')}")
-
-    # Combine everything
-    full_spl = base_search
-    if output_spl:
-        full_spl = f"{base_search} {output_spl}"
+    mode = data.get("mode") or request.args.get("mode", "search")
+    if mode not in spl_composer.MODES:
+        return jsonify({"error": f"Unknown mode: {mode}"}), 400
+    data["mode"] = mode
+
+    # Read before the catalog so an entry is never tagged newer than the mappings it used
+    generation = storage.get_generation(tenant)
+    catalog = get_catalog(tenant)
+
+    def compose(body):
+        result = spl_composer.compose_spl(body, catalog)
+        result["analysis"] = spl_analyzer.analyze_spl(result["spl"])
+        return result
+
+    return jsonify(generate_cache.get_or_compose(app.config, tenant, data, generation, catalog, compose))
 
+
+@app.route("/api/analyze-spl", methods=['POST'])
+@rate_limited("generate")
+def analyze_spl():
+    """Check SPL against the documented performance antipatterns."""
+    data = request.get_json()
+    if not data or not isinstance(data.get("spl"), str):
+        return jsonify({"error": "No SPL provided"}), 400
+    # Library, glossary and training SPL was analyzed at rebuild time
+    cached = training_storage.get_cached_analysis(data["spl"])
+    return jsonify(cached if cached is not None else spl_analyzer.analyze_spl(data["spl"]))
+
+
+@app.route("/api/snippets", methods=["GET"])
+def snippets():
+    """Shared SPL snippets for ?hash=a,b with their token metadata and analysis."""
+    hashes = [digest.strip() for digest in request.args.get("hash", "").split(",") if digest.strip()]
+    if not hashes:
+        return jsonify({"error": "No snippet hashes provided"}), 400
+    if len(hashes) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"Too many snippets requested (max {MAX_BATCH_ITEMS})"}), 400
+    found = training_storage.get_snippets(hashes)
+    return jsonify({
+        "snippets": found,
+        "missing": [digest for digest in hashes if digest not in found]
+    })
+
+
+@app.route("/api/snippets/<digest>", methods=["GET"])
+def snippet(digest):
+    """One shared SPL snippet and every library, glossary and training location that uses it."""
+    found = training_storage.get_snippet(digest)
+    if not found:
+        return jsonify({"error": f"Snippet not found: {digest}"}), 404
+    return jsonify(found)
+
+
+@app.route("/api/export/splunk-app", methods=["GET", "POST"])
+@app.route("/api/tenants/<tenant:tenant>/export/splunk-app", methods=["GET", "POST"])
+@rate_limited("export")
+def export_splunk_app(tenant=None):
+    """Stream the query library and search objects as a Splunk app tar.gz."""
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else {}
+    categories = _list_param(data, "category")
+    techniques = _list_param(data, "mitre")
+    tags = _list_param(data, "tag")
+    compositions = data.get("compositions", [])
+    if not isinstance(compositions, list) or not all(isinstance(c, dict) for c in compositions):
+        return jsonify({"error": "compositions must be a list of prompt builder selections"}), 400
+
+    include_library = data.get("includeLibrary", request.args.get("library", "1") != "0")
+    queries = splunk_app.load_queries() if include_library else []
+    catalog = get_catalog(tenant) if compositions else None
+
+    package = splunk_app.iter_app_package(
+        queries=splunk_app.iter_queries(queries, categories, techniques, tags),
+        compositions=compositions,
+        mappings=storage.iter_mappings(tags, tenant),
+        catalog=catalog
+    )
+    return Response(
+        package,
+        mimetype="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{splunk_app.export_filename()}"'}
+    )
+
+
+# Admin
+@app.route("/admin/db-stats", methods=["GET"])
+@admin_required
+def db_stats():
+    """Report mappings database size, WAL growth and the last maintenance run."""
+    stats = db_maintenance.get_db_stats()
+    stats["maintenance"] = {
+        "intervalSeconds": app.config["DB_MAINTENANCE_INTERVAL"],
+        "walThresholdBytes": app.config["DB_MAINTENANCE_WAL_BYTES"],
+        "dueNow": db_maintenance.due_trigger(app.config)
+    }
+    stats["writeQueue"] = storage.get_write_queue_stats()
+    return jsonify(stats)
+
+
+@app.route("/admin/generate-cache", methods=["GET", "DELETE"])
+@admin_required
+def generate_cache_stats():
+    """Report this worker's generate-spl cache hits, misses and evictions; DELETE clears it."""
+    if request.method == "DELETE":
+        generate_cache.clear()
+    return jsonify(generate_cache.get_stats(app.config))
+
+
+@app.route("/admin/db-maintenance", methods=["POST"])
+@admin_required
+def db_maintenance_run():
+    """Run database maintenance now unless another worker already is."""
+    entry = db_maintenance.run_maintenance(app.config)
+    if entry is None:
+        return jsonify({"error": "Maintenance is already running in another worker"}), 409
+    return jsonify(entry)
+
+
+@app.route("/admin/backups", methods=["GET"])
+@admin_required
+def list_backups():
+    """List mappings database backups and the progress of one running in this worker."""
+    return jsonify({
+        "backups": db_backup.list_backups(app.config),
+        "inProgress": db_backup.current_progress()
+    })
+
+
+@app.route("/admin/backup", methods=["POST"])
+@admin_required
+def backup_db():
+    """Take an online backup of the mappings database."""
+    summary = db_backup.backup(app.config)
+    if summary is None:
+        return jsonify({"error": "Maintenance, a backup or a restore is already running"}), 409
+    return jsonify(summary), 201
+
+
+@app.route("/admin/restore", methods=["POST"])
+@admin_required
+def restore_db():
+    """Atomically restore the mappings database from a named backup."""
+    data = request.get_json(silent=True) or {}
+    name = data.get("name")
+    if not name:
+        return jsonify({"error": "No backup name provided"}), 400
+    if not db_backup.backup_path(app.config, name):
+        return jsonify({"error": f"Backup not found: {name}"}), 404
+    try:
+        summary = db_backup.restore(name, app.config)
+    except db_backup.BackupError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if summary is None:
+        return jsonify({"error": "Maintenance, a backup or a restore is already running"}), 409
+    return jsonify(summary)
+
+
+@app.route("/admin/profiles", methods=["GET"])
+@admin_required
+def list_profiles():
+    """List saved request profiles, newest first."""
     return jsonify({
-        "spl": full_spl,
-        "explanation": " | ".join(explanation_parts) if explanation_parts else "Search all events",
-        "components": {
-            "baseSearch": base_search,
-            "outputShape": output_spl
-        }
+        "enabled": app.config["PROFILING_ENABLED"],
+        "profiles": profiling.list_profiles(app.config)
     })
 
 
+@app.route("/admin/profiles/<profile_id>.<extension>", methods=["GET"])
+@admin_required
+def download_profile(profile_id, extension):
+    """Download a saved profile as pstats (.prof), collapsed stacks or its JSON summary."""
+    path = profiling.profile_path(app.config, profile_id, extension)
+    if not path:
+        return jsonify({"error": f"Profile not found: {profile_id}.{extension}"}), 404
+    return send_file(
+        path,
+        mimetype=profiling.PROFILE_EXTENSIONS[extension],
+        as_attachment=extension != "json"
+    )
+
+
 # Error handlers
+@app.errorhandler(write_queue.WriteQueueFull)
+@app.errorhandler(write_queue.WriteUnavailable)
+def write_backpressure(e):
+    """Ask clients to retry mapping edits when the writer is saturated or locked out."""
+    response = jsonify({"error": str(e), "retryAfter": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+@app.errorhandler(storage.MappingConflict)
+def mapping_conflict(e):
+    """Report a mapping create that collided with an existing id."""
+    return jsonify({"error": str(e)}), 409
+
+
+@app.errorhandler(rate_limit.RateLimited)
+def rate_limit_exceeded(e):
+    """Turn away clients that are over their rate or concurrency limit."""
+    response = jsonify({"error": str(e), "retryAfter": e.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
 @app.errorhandler(404)
 def page_not_found(e):
     """Handle 404 errors."""
@@ -0,0 +1,5 @@
+"""
+Deterministic micro-benchmarks for SPLUNKed's Python hot paths.
+Run with `python -m benchmarks run`; `python -m benchmarks compare` fails when a result
+is slower than the stored baseline by more than the tolerance.
+"""
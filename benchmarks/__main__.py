@@ -0,0 +1,124 @@
+"""
+Command line for the benchmark suite.
+
+    python -m benchmarks list
+    python -m benchmarks run [-k compose] [--save]
+    python -m benchmarks compare [--tolerance 0.25] [--attempts 3]
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks import runner
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def print_result(name, result):
+    print(f"  {name:<45} {format_seconds(result['seconds']):>10}  (median {format_seconds(result['median'])}, {result['loops']} loops)")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="SPLUNKed micro-benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List benchmark names")
+
+    for command, description in (
+        ("run", "Run benchmarks and print per-call times"),
+        ("compare", "Run benchmarks and fail if any is slower than the baseline past the tolerance")
+    ):
+        sub = commands.add_parser(command, help=description)
+        sub.add_argument("-k", dest="pattern", help="Only benchmarks whose name contains this text")
+        sub.add_argument("--min-time", type=float, default=runner.DEFAULT_MIN_TIME, help="Minimum seconds per sample")
+        sub.add_argument("--repeat", type=int, default=runner.DEFAULT_REPEAT, help="Samples per benchmark")
+        sub.add_argument("--baseline", default=runner.BASELINE_PATH, help="Baseline JSON file")
+        sub.add_argument("--output", help="Also write the results to this JSON file")
+        if command == "run":
+            sub.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+        else:
+            sub.add_argument(
+                "--tolerance",
+                type=float,
+                default=runner.DEFAULT_TOLERANCE,
+                help="Allowed slowdown as a fraction (0.25 = 25%% slower)"
+            )
+            sub.add_argument(
+                "--attempts",
+                type=int,
+                default=runner.DEFAULT_ATTEMPTS,
+                help="Runs a benchmark gets before it counts as regressed (best one kept)"
+            )
+            sub.add_argument("--results", help="Compare a saved --output file instead of running the benchmarks")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in runner.select():
+            print(name)
+        return
+
+    names = runner.select(args.pattern)
+    if not names:
+        print(f"No benchmarks match {args.pattern!r}.", file=sys.stderr)
+        sys.exit(2)
+
+    if args.command == "compare":
+        baseline = runner.load(args.baseline)
+        if baseline is None:
+            print(f"No baseline at {args.baseline}; create one with `python -m benchmarks run --save`.", file=sys.stderr)
+            sys.exit(2)
+
+    if getattr(args, "results", None):
+        with open(args.results, "r", encoding="utf-8") as handle:
+            results = {name: result for name, result in json.load(handle)["results"].items() if name in names}
+    else:
+        print(f"Running {len(names)} benchmarks:")
+        results = runner.run(names, args.min_time, args.repeat, report=print_result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"environment": runner.environment(), "results": results}, handle, indent=2, sort_keys=True)
+
+    if args.command == "run":
+        if args.save:
+            runner.save(results, args.baseline)
+            print(f"Saved baseline to {args.baseline}.")
+        return
+
+    if baseline.get("environment") != runner.environment():
+        print("Note: the baseline was recorded on a different machine or Python; expect noise.")
+
+    rows = runner.compare(results, baseline, args.tolerance)
+    if not args.results:
+        # A single slow run is usually noise; only a benchmark slow every time fails
+        for attempt in range(2, args.attempts + 1):
+            regressed = [row["name"] for row in rows if row["regressed"]]
+            if not regressed:
+                break
+            print(f"\nRe-running {len(regressed)} slower benchmark(s), attempt {attempt} of {args.attempts}:")
+            results = runner.best(results, runner.run(regressed, args.min_time, args.repeat, report=print_result))
+            rows = runner.compare(results, baseline, args.tolerance)
+    print(f"\n  {'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in rows:
+        change = "new" if row["change"] is None else f"{row['change']:+.1%}"
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"  {row['name']:<45} {format_seconds(row['baseline']):>10} {format_seconds(row['current']):>10} {change:>8}{flag}")
+
+    regressed = [row["name"] for row in rows if row["regressed"]]
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) regressed by more than {args.tolerance:.0%}.")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+The benchmark cases. Each setup is a context manager that prepares its data once and
+yields the operation to time; anything it creates is removed when the block exits.
+"""
+
+import importlib.util
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import generate_cache
+import similarity
+import spl_composer
+import spl_snippets
+import storage
+import training_storage
+from benchmarks import generators
+
+BENCHMARKS = {}
+
+# Catalog sizes for the composition benchmarks
+MAPPING_COUNTS = (10, 1000, 100000)
+# Modules in the synthetic curricula for get_training_index
+CURRICULUM_SIZES = (500, 5000)
+ROW_COUNT = 1000
+REBUILD_MODULES = 300
+# Items in the similar-searches index
+SIMILARITY_SIZES = (500, 5000)
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+
+def benchmark(name, params=(None,)):
+    """Register a setup under name, or under name[param] for each param."""
+    def decorator(setup):
+        for param in params:
+            key = name if param is None else f"{name}[{param}]"
+            BENCHMARKS[key] = (contextmanager(setup), param)
+        return setup
+    return decorator
+
+
+def _load_rebuild_script():
+    spec = importlib.util.spec_from_file_location(
+        "rebuild_training_db", os.path.join(SCRIPTS_DIR, "rebuild-training-db.py")
+    )
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    return script
+
+
+@benchmark("compose.build_catalog", MAPPING_COUNTS)
+def build_catalog(count):
+    data = generators.mappings(count)
+    yield lambda: spl_composer.build_catalog(data)
+
+
+@benchmark("compose.generate_spl", MAPPING_COUNTS)
+def generate_spl(count):
+    data = generators.mappings(count)
+    catalog = spl_composer.build_catalog(data)
+    body = generators.selection(data)
+    yield lambda: spl_composer.compose_spl(body, catalog)
+
+
+@benchmark("compose.generate_spl_optimized", MAPPING_COUNTS)
+def generate_spl_optimized(count):
+    data = generators.mappings(count)
+    catalog = spl_composer.build_catalog(data)
+    body = {**generators.selection(data), "optimize": True}
+    yield lambda: spl_composer.compose_spl(body, catalog)
+
+
+@benchmark("compose.generate_spl_cached", MAPPING_COUNTS)
+def generate_spl_cached(count):
+    data = generators.mappings(count)
+    catalog = spl_composer.build_catalog(data)
+    body = generators.selection(data)
+    config = generate_cache.DEFAULT_CONFIG
+    generate_cache.clear()
+    try:
+        yield lambda: generate_cache.get_or_compose(
+            config, None, body, 1, catalog, lambda b: spl_composer.compose_spl(b, catalog)
+        )
+    finally:
+        generate_cache.clear()
+
+
+@benchmark("storage.row_to_object")
+def row_to_object(_):
+    with generators.isolated_data_dir():
+        storage.init_db()
+        conn = storage._connect()
+        try:
+            with conn:
+                for type_key, items in generators.mappings(ROW_COUNT).items():
+                    for item in items:
+                        storage._insert_mapping(conn, type_key, item)
+            rows = conn.execute(storage.MAPPING_SELECT).fetchall()
+        finally:
+            conn.close()
+        yield lambda: [storage._row_to_object(row) for row in rows]
+
+
+@contextmanager
+def _training_db(module_count):
+    """A training.db in an isolated data directory holding a synthetic curriculum."""
+    with generators.isolated_data_dir():
+        modules = generators.curriculum(module_count)
+        with training_storage.build():
+            for item in modules:
+                training_storage.upsert_module(item)
+            for pipeline in generators.pipelines(modules, max(1, module_count // 100)):
+                training_storage.upsert_pipeline(pipeline)
+        yield
+
+
+@benchmark("training.row_to_module")
+def row_to_module(_):
+    with _training_db(ROW_COUNT):
+        with training_storage.snapshot() as conn:
+            rows = conn.execute(
+                f"SELECT {training_storage.MODULE_INDEX_COLUMNS} FROM training_modules"
+            ).fetchall()
+        yield lambda: [training_storage._row_to_module(row) for row in rows]
+
+
+@benchmark("training.row_to_module_content")
+def row_to_module_content(_):
+    with _training_db(ROW_COUNT):
+        with training_storage.snapshot() as conn:
+            rows = conn.execute("SELECT * FROM training_modules").fetchall()
+        yield lambda: [training_storage._row_to_module(row, include_content=True) for row in rows]
+
+
+@benchmark("training.get_training_index", CURRICULUM_SIZES)
+def get_training_index(count):
+    with _training_db(count):
+        training_storage.get_training_index()
+        yield training_storage.get_training_index
+
+
+@benchmark("rebuild.parse_and_upsert")
+def parse_and_upsert(_):
+    script = _load_rebuild_script()
+    with generators.isolated_data_dir() as directory:
+        content_dir = os.path.join(directory, "content")
+        generators.write_content_dir(content_dir, REBUILD_MODULES)
+
+        def rebuild():
+            # A cold rebuild every time; an unchanged rebuild skips the writes by content hash
+            if os.path.exists(training_storage.DB_PATH):
+                os.remove(training_storage.DB_PATH)
+            script.WARNINGS.clear()
+            entries = []
+            with training_storage.build():
+                for item in script.iter_modules(Path(content_dir)):
+                    training_storage.upsert_module(script.externalize_spl(item, entries))
+                training_storage.store_snippets(entries)
+
+        yield rebuild
+
+
+@benchmark("similarity.nearest_neighbours", SIMILARITY_SIZES)
+def nearest_neighbours(count):
+    items = []
+    for item in generators.curriculum(count):
+        content = json.loads(item["content"]) if item["content_format"] == "json" else {}
+        spl = [text for _, text in spl_snippets.iter_content_snippets(content, item["id"])]
+        feature_set = similarity.features(
+            title=item["title"], tags=item["tags"], category=item["category"], spl=spl
+        )
+        items.append((item["id"], feature_set))
+    yield lambda: similarity.nearest_neighbours(items)
@@ -0,0 +1,199 @@
+"""
+Synthetic data for the benchmarks.
+Every generator takes a seed, so the same size always produces the same data.
+"""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import storage
+import training_storage
+
+FIELDS = ("user", "src", "dest", "host", "process", "action", "signature", "EventCode")
+TAGS = ("authentication", "network", "endpoint", "windows", "linux", "identity", "cloud", "web")
+CATEGORIES = ("authentication", "network", "endpoint", "incident-response", "basics")
+DIFFICULTIES = ("foundations", "core", "intermediate", "advanced", "expert")
+OUTPUT_SHAPES = (
+    "| stats count by {field} | sort -count | head 10",
+    "| timechart span=1h count by {field}",
+    "| table _time {field}",
+    "| stats dc({field}) AS distinct"
+)
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(FIELDS + TAGS) for _ in range(count))
+
+
+def _tags(rng):
+    return rng.sample(TAGS, rng.randint(0, 3))
+
+
+def mapping(rng, type_key, index):
+    """One search object shaped like the seed mappings in data/prompt-builder-mappings.json."""
+    prefix = storage.ID_PREFIX_MAP[type_key]
+    obj = {
+        "id": f"{prefix}_{index:06d}",
+        "type": storage.singularize_type_name(type_key),
+        "name": f"{type_key} {index} {_words(rng, 2)}",
+        "tags": _tags(rng),
+        "description": _words(rng, 8)
+    }
+    if type_key == "dataSources":
+        obj["spl"] = f"index={rng.choice(TAGS)} sourcetype={rng.choice(FIELDS)}_{index}"
+    elif type_key == "outputShapes":
+        obj["spl"] = rng.choice(OUTPUT_SHAPES)
+        obj["requiresField"] = True
+        obj["fieldPlaceholder"] = "{field}"
+    elif type_key == "timeRangePresets":
+        obj["spl"] = f"earliest=-{index % 90 + 1}d latest=now"
+    else:
+        values = [f'{rng.choice(FIELDS)}="{rng.choice(TAGS)}{index}"' for _ in range(rng.randint(1, 3))]
+        obj["spl"] = " OR ".join(values)
+    obj["friendlyName"] = obj["name"].upper()
+    return obj
+
+
+def mappings(count, seed=1):
+    """get_all_mappings()-shaped dict holding count search objects spread over every type."""
+    rng = random.Random(seed)
+    type_keys = list(storage.DEFAULT_MAPPINGS)
+    data = {type_key: [] for type_key in type_keys}
+    for index in range(count):
+        type_key = type_keys[index % len(type_keys)]
+        data[type_key].append(mapping(rng, type_key, index))
+    return data
+
+
+def selection(data, seed=1):
+    """A /api/generate-spl body that picks a few objects of every kind from data."""
+    rng = random.Random(seed)
+    filters = data["patterns"] + data["fieldValues"]
+    shape = rng.choice(data["outputShapes"])
+    return {
+        "dataSources": [item["id"] for item in rng.sample(data["dataSources"], min(2, len(data["dataSources"])))],
+        "includes": [item["id"] for item in rng.sample(filters, min(3, len(filters)))],
+        "excludes": [item["id"] for item in rng.sample(filters, min(1, len(filters)))],
+        "timeRange": rng.choice(data["timeRangePresets"])["id"],
+        "outputShape": shape["id"],
+        "outputField": "user"
+    }
+
+
+def module(rng, index):
+    """One training module as the rebuild script hands it to upsert_module."""
+    module_type = ("lesson", "tutorial", "scenario", "challenge")[index % 4]
+    category = rng.choice(CATEGORIES)
+    if module_type == "lesson":
+        content_format = "html"
+        content = "".join(f"<p>{_words(rng, 30)}</p>" for _ in range(6))
+    else:
+        content_format = "json"
+        steps = [
+            {"title": f"Step {step}", "description": _words(rng, 20), "spl": f"index={category} | stats count by {rng.choice(FIELDS)}"}
+            for step in range(rng.randint(3, 8))
+        ]
+        if module_type == "tutorial":
+            body = {"sections": steps}
+        elif module_type == "scenario":
+            body = {"situation": {"title": f"Scenario {index}", "description": _words(rng, 25)}, "steps": steps}
+        else:
+            body = {"problem": _words(rng, 25), "solution": {"spl": steps[-1]["spl"]}, "hints": [step["description"] for step in steps]}
+        content = json.dumps(body)
+    return {
+        "id": f"{module_type}-{index:06d}",
+        "type": module_type,
+        "title": f"{category.title()} {module_type} {index}",
+        "description": _words(rng, 12),
+        "category": category,
+        "difficulty": rng.choice(DIFFICULTIES),
+        "duration": f"{rng.randint(5, 60)} min",
+        "tags": _tags(rng),
+        "objectives": [_words(rng, 6) for _ in range(3)],
+        "keywords": _tags(rng),
+        "sortOrder": index % 50,
+        "content_format": content_format,
+        "content": content
+    }
+
+
+def curriculum(count, seed=1):
+    rng = random.Random(seed)
+    return [module(rng, index) for index in range(count)]
+
+
+def pipelines(modules, count, seed=1):
+    """Learning paths whose steps point at modules from curriculum()."""
+    rng = random.Random(seed)
+    result = []
+    for index in range(count):
+        steps = [
+            {
+                "id": f"step-{position + 1}",
+                "title": item["title"],
+                "type": item["type"],
+                "source": "lessons" if item["type"] == "lesson" else "training",
+                "sourceId": item["id"],
+                "description": item["description"],
+                "duration": item["duration"]
+            }
+            for position, item in enumerate(rng.sample(modules, min(12, len(modules))))
+        ]
+        result.append({
+            "id": f"pipeline-{index:04d}",
+            "title": f"Pipeline {index}",
+            "description": _words(rng, 20),
+            "level": rng.choice(DIFFICULTIES),
+            "duration": f"{rng.randint(1, 8)} hours",
+            "track": rng.choice(CATEGORIES),
+            "objectives": [_words(rng, 6) for _ in range(4)],
+            "sortOrder": index,
+            "steps": steps
+        })
+    return result
+
+
+def write_content_dir(directory, count, seed=1):
+    """Write count JSON modules in the layout scripts/rebuild-training-db.py reads."""
+    for item in curriculum(count, seed):
+        payload = dict(item)
+        payload.pop("content_format")
+        content = payload.pop("content")
+        if payload["type"] == "lesson":
+            payload["body"] = content
+            payload["content_format"] = "html"
+        else:
+            payload["content"] = json.loads(content)
+        path = os.path.join(directory, payload["category"], f"{payload['id']}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+
+
+@contextmanager
+def isolated_data_dir():
+    """Point storage and training_storage at an empty temporary data directory."""
+    directory = tempfile.mkdtemp(prefix="splunked-bench-")
+    saved = [
+        (module_, name, getattr(module_, name))
+        for module_, names in (
+            (storage, ("DATA_DIR", "DB_PATH", "SEED_PATH")),
+            (training_storage, ("DATA_DIR", "DB_PATH", "LEGACY_DB_PATH", "PIPELINES_SEED_PATH"))
+        )
+        for name in names
+    ]
+    storage.DATA_DIR = training_storage.DATA_DIR = directory
+    storage.DB_PATH = training_storage.LEGACY_DB_PATH = os.path.join(directory, "splunked.db")
+    storage.SEED_PATH = os.path.join(directory, "no-seed.json")
+    training_storage.DB_PATH = os.path.join(directory, "training.db")
+    training_storage.PIPELINES_SEED_PATH = os.path.join(directory, "no-pipelines.json")
+    try:
+        yield directory
+    finally:
+        for module_, name, value in saved:
+            setattr(module_, name, value)
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,168 @@
+"""
+Timing and baseline comparison for the benchmark cases.
+Each operation is looped until one sample takes at least min_time, and the fastest of
+several samples is kept; the minimum is the figure least disturbed by other load.
+Every sample is paired with a fixed calibration workload, and comparisons use the ratio
+between the two, so a slower or busier machine does not read as a regression.
+"""
+
+import json
+import os
+import platform
+import statistics
+import timeit
+from datetime import datetime
+
+from benchmarks.cases import BENCHMARKS
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEAT = 7
+# Allowed slowdown against the baseline before compare fails (0.25 = 25% slower)
+DEFAULT_TOLERANCE = 0.25
+# Runs a benchmark gets in compare before it counts as regressed; the best one is kept
+DEFAULT_ATTEMPTS = 3
+# Share of min_time spent on each calibration sample
+CALIBRATION_SHARE = 0.25
+
+_CALIBRATION_DATA = [(index * 7919) % 1009 for index in range(2000)]
+
+
+def _calibration():
+    """Fixed interpreter workload (sorting, dicts, strings) that machine speed scales like the cases."""
+    counts = {}
+    for value in sorted(_CALIBRATION_DATA):
+        key = f"k{value % 97}"
+        counts[key] = counts.get(key, 0) + value
+    return ",".join(sorted(counts))
+
+
+def select(pattern=None):
+    """Benchmark names containing pattern, in registration order."""
+    return [name for name in BENCHMARKS if not pattern or pattern in name]
+
+
+def _loops(timer, min_time):
+    """Calls per sample so that one sample takes at least min_time."""
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            return number
+        # Aim a little past min_time so the next sample is long enough
+        number = max(number * 2, int(number * min_time * 1.2 / max(elapsed, 1e-9)))
+
+
+def measure(operation, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """
+    Seconds per call of operation: fastest and median of repeat samples (gc off, like timeit).
+    "relative" is the fastest sample over the fastest calibration sample taken alongside it.
+    """
+    timer = timeit.Timer(operation)
+    calibration = timeit.Timer(_calibration)
+    # Warm caches (compiled regexes, SQLite pages) before anything is measured
+    operation()
+    _calibration()
+    number = _loops(timer, min_time)
+    calibration_number = _loops(calibration, min_time * CALIBRATION_SHARE)
+
+    samples = []
+    calibration_samples = []
+    # Interleaved, so both see the same load and clock speed
+    for _ in range(repeat):
+        calibration_samples.append(calibration.timeit(calibration_number) / calibration_number)
+        samples.append(timer.timeit(number) / number)
+    return {
+        "seconds": min(samples),
+        "median": statistics.median(samples),
+        "calibration": min(calibration_samples),
+        "relative": min(samples) / min(calibration_samples),
+        "loops": number,
+        "repeat": repeat
+    }
+
+
+def run(names, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT, report=None):
+    """Set up and time each named benchmark; report(name, result) is called as each finishes."""
+    results = {}
+    for name in names:
+        setup, param = BENCHMARKS[name]
+        with setup(param) as operation:
+            results[name] = measure(operation, min_time, repeat)
+        if report:
+            report(name, results[name])
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "processor": platform.processor() or None
+    }
+
+
+def save(results, path=BASELINE_PATH):
+    """Write results as a baseline, keeping stored entries for benchmarks that were not run."""
+    stored = load(path) or {"results": {}}
+    document = {
+        "createdAt": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "environment": environment(),
+        "results": {**stored["results"], **results}
+    }
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+    return document
+
+
+def load(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def best(results, retry):
+    """Per benchmark, whichever of results and retry has the lower calibrated time."""
+    merged = dict(results)
+    for name, result in retry.items():
+        if name not in merged or _score(result) < _score(merged[name]):
+            merged[name] = result
+    return merged
+
+
+def _score(result):
+    return result.get("relative", result["seconds"])
+
+
+def change(result, stored):
+    """Slowdown of result against stored: calibrated when both have it, else in raw seconds."""
+    if "relative" in result and "relative" in stored:
+        return result["relative"] / stored["relative"] - 1
+    return result["seconds"] / stored["seconds"] - 1
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    One row per result: its change against the baseline and whether it regressed.
+    A benchmark without a baseline entry is reported but never fails the comparison.
+    """
+    rows = []
+    for name, result in results.items():
+        stored = baseline["results"].get(name)
+        if not stored:
+            rows.append({"name": name, "baseline": None, "current": result["seconds"], "change": None, "regressed": False})
+            continue
+        slowdown = change(result, stored)
+        rows.append({
+            "name": name,
+            "baseline": stored["seconds"],
+            "current": result["seconds"],
+            "change": slowdown,
+            "regressed": slowdown > tolerance
+        })
+    return rows
@@ -0,0 +1,253 @@
+"""
+Online backup and restore of the mappings database.
+Copies pages with SQLite's backup API in small steps so live readers and writers are only
+paused briefly; backups land via temp file + rename and restores replace the data in one commit.
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import db_maintenance
+import storage
+
+DEFAULT_CONFIG = {
+    "BACKUP_DIR": os.path.join(storage.DATA_DIR, "backups"),
+    # Pages copied per backup step; the source is only read-locked during a step
+    "BACKUP_PAGES_PER_STEP": 256,
+    # Pause between steps so queued writers get the database
+    "BACKUP_STEP_SLEEP": 0.005,
+    # Restarts tolerated (the source changed mid-copy) before copying in one step
+    "BACKUP_MAX_RESTARTS": 3,
+    # Backups kept in BACKUP_DIR; older ones are deleted after each backup
+    "BACKUP_KEEP": 14
+}
+
+BACKUP_NAME_PATTERN = re.compile(r"^splunked-\d{8}T\d{6}Z(-[\w\-]+)?\.db$")
+
+# Progress of the backup or restore running in this process, for /admin/backups
+_current = None
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _config(config):
+    config = config or {}
+    return {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+
+
+class _Progress:
+    """Backup API progress callback: counts steps and restarts, reports throughput, paces the copy."""
+
+    def __init__(self, operation, config, report=None):
+        self.operation = operation
+        self.sleep = config["BACKUP_STEP_SLEEP"]
+        self.max_restarts = config["BACKUP_MAX_RESTARTS"]
+        self.report = report
+        self.started = time.perf_counter()
+        self.page_size = 0
+        self.steps = 0
+        self.restarts = 0
+        self.remaining = None
+        self.total = None
+        self.single_step = False
+
+    def __call__(self, status, remaining, total):
+        if self.remaining is not None and remaining > self.remaining:
+            # Another connection wrote to the source, so SQLite started the copy over
+            self.restarts += 1
+        self.steps += 1
+        self.remaining, self.total = remaining, total
+        if self.report:
+            self.report(self.snapshot())
+        if not self.single_step and self.restarts > self.max_restarts:
+            raise _TooManyRestarts()
+        if remaining and self.sleep:
+            time.sleep(self.sleep)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        copied = (self.total or 0) - (self.remaining or 0)
+        return {
+            "operation": self.operation,
+            "pagesCopied": copied,
+            "pagesTotal": self.total,
+            "percent": round(100 * copied / self.total, 1) if self.total else 0,
+            "steps": self.steps,
+            "restarts": self.restarts,
+            "elapsedSeconds": round(elapsed, 3),
+            "bytesPerSecond": int(copied * self.page_size / elapsed) if elapsed else None
+        }
+
+
+def _copy(source, target, progress, config):
+    """Copy source into target with the backup API, falling back to one step if the source churns."""
+    global _current
+    _current = progress
+    progress.page_size = source.execute("PRAGMA page_size;").fetchone()[0]
+    try:
+        source.backup(target, pages=max(1, int(config["BACKUP_PAGES_PER_STEP"])), progress=progress)
+    except _TooManyRestarts:
+        # Writes keep restarting the stepped copy. A single step copies from one read
+        # snapshot, which in WAL mode still does not block writers.
+        progress.single_step = True
+        source.backup(target, pages=-1, progress=progress)
+    finally:
+        _current = None
+
+
+def _check(conn):
+    result = conn.execute("PRAGMA quick_check;").fetchone()[0]
+    if result != "ok":
+        raise BackupError(f"Integrity check failed: {result}")
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mappings'").fetchone():
+        raise BackupError("Not a SPLUNKed mappings database (no mappings table)")
+
+
+def _fsync(path):
+    with open(path, "rb") as handle:
+        os.fsync(handle.fileno())
+
+
+def current_progress():
+    return _current.snapshot() if _current else None
+
+
+def backup(config=None, label=None, report=None):
+    """
+    Write a consistent copy of splunked.db to BACKUP_DIR and return its summary.
+    report(progress) is called after every step. Returns None when maintenance,
+    another backup or a restore holds the lock.
+    """
+    config = _config(config)
+    directory = config["BACKUP_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    suffix = f"-{re.sub(r'[^A-Za-z0-9_-]+', '-', label).strip('-')}" if label else ""
+    name = f"splunked-{stamp}{suffix}.db"
+    counter = 1
+    while os.path.exists(os.path.join(directory, name)):
+        counter += 1
+        name = f"splunked-{stamp}{suffix}-{counter}.db"
+
+    with db_maintenance.MaintenanceLock() as lock:
+        if not lock.acquired:
+            return None
+        progress = _Progress("backup", config, report)
+        fd, temp_path = tempfile.mkstemp(prefix=".backup-", suffix=".db.tmp", dir=directory)
+        os.close(fd)
+        try:
+            source = sqlite3.connect(storage.DB_PATH)
+            target = sqlite3.connect(temp_path)
+            try:
+                _copy(source, target, progress, config)
+                _check(target)
+                # The copy inherits WAL mode; store it as a single self-contained file
+                target.execute("PRAGMA journal_mode=DELETE;")
+            finally:
+                target.close()
+                source.close()
+            _fsync(temp_path)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, os.path.join(directory, name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    _prune(directory, config["BACKUP_KEEP"])
+    return {
+        **progress.snapshot(),
+        "name": name,
+        "bytes": os.path.getsize(os.path.join(directory, name)),
+        "singleStepFallback": progress.single_step
+    }
+
+
+def restore(name, config=None, report=None):
+    """
+    Replace the contents of splunked.db with the named backup in one transaction.
+    A pre-restore backup is taken first. Returns None when the lock is held elsewhere.
+    """
+    config = _config(config)
+    path = backup_path(config, name)
+    if not path:
+        raise BackupError(f"Backup not found: {name}")
+
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        _check(source)
+    finally:
+        source.close()
+
+    safety = backup(config, label="pre-restore", report=report)
+    if safety is None:
+        return None
+
+    with db_maintenance.MaintenanceLock() as lock:
+        if not lock.acquired:
+            return None
+        progress = _Progress("restore", config, report)
+        latest_seq = storage.get_latest_change_seq()
+        latest_generation = storage.get_latest_generation()
+        # The backup API holds the destination's write lock from the first step until the
+        # last page is copied, so readers see either the old or the restored database.
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        target = sqlite3.connect(storage.DB_PATH, timeout=30)
+        try:
+            _copy(source, target, progress, config)
+            _check(target)
+        finally:
+            target.close()
+            source.close()
+
+    # Older backups may predate schema changes; every worker must drop its cached mappings
+    storage.init_db()
+    storage.mark_all_changed(after_seq=latest_seq, after_generation=latest_generation)
+    return {**progress.snapshot(), "name": name, "preRestoreBackup": safety["name"]}
+
+
+def backup_path(config, name):
+    """Path of a backup in BACKUP_DIR, or None for unknown or unsafe names."""
+    if not name or not BACKUP_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(_config(config)["BACKUP_DIR"], name)
+    return path if os.path.isfile(path) else None
+
+
+def _backup_names(directory):
+    """Backup file names, oldest first (several can share a timestamp second)."""
+    names = [name for name in os.listdir(directory) if BACKUP_NAME_PATTERN.match(name)]
+    return sorted(names, key=lambda name: (os.path.getmtime(os.path.join(directory, name)), name))
+
+
+def list_backups(config=None):
+    """Backups in BACKUP_DIR, newest first."""
+    directory = _config(config)["BACKUP_DIR"]
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for name in reversed(_backup_names(directory)):
+        stat = os.stat(os.path.join(directory, name))
+        backups.append({
+            "name": name,
+            "bytes": stat.st_size,
+            "createdAt": datetime.utcfromtimestamp(stat.st_mtime).isoformat(timespec="seconds") + "Z"
+        })
+    return backups
+
+
+def _prune(directory, keep):
+    # Pre-restore backups are kept; only scheduled/manual ones rotate
+    names = [name for name in _backup_names(directory) if "-pre-restore" not in name]
+    for name in names[:max(0, len(names) - keep)]:
+        os.remove(os.path.join(directory, name))
@@ -0,0 +1,272 @@
+"""
+Background SQLite maintenance for the mappings database.
+Checkpoints the WAL, refreshes planner statistics and returns free pages on a schedule
+or once the WAL grows past a threshold; a file lock keeps it to one worker at a time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process may run maintenance
+    fcntl = None
+
+LOCK_PATH = os.path.join(storage.DATA_DIR, ".maintenance.lock")
+
+DEFAULT_CONFIG = {
+    # Seconds between scheduled runs
+    "DB_MAINTENANCE_INTERVAL": 6 * 60 * 60,
+    # Run early once the -wal file is larger than this many bytes
+    "DB_MAINTENANCE_WAL_BYTES": 16 * 1024 * 1024,
+    # How often each worker checks whether maintenance is due
+    "DB_MAINTENANCE_POLL_SECONDS": 60,
+    # Pages returned to the filesystem per incremental_vacuum call
+    "DB_MAINTENANCE_VACUUM_PAGES": 2000,
+    "DB_MAINTENANCE_ENABLED": True
+}
+
+_thread = None
+_stop = threading.Event()
+
+
+def _connect():
+    conn = sqlite3.connect(storage.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ensure_log_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trigger TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            duration_ms INTEGER,
+            wal_bytes_before INTEGER,
+            wal_bytes_after INTEGER,
+            pages_freed INTEGER,
+            error TEXT
+        )
+        """
+    )
+
+
+def _now():
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def wal_size():
+    try:
+        return os.path.getsize(storage.DB_PATH + "-wal")
+    except OSError:
+        return 0
+
+
+def _last_run(conn):
+    _ensure_log_table(conn)
+    row = conn.execute(
+        "SELECT * FROM maintenance_log ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def _seconds_since(timestamp):
+    started = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+    return (datetime.utcnow() - started).total_seconds()
+
+
+def due_trigger(config):
+    """Return why maintenance should run now ("wal" or "schedule"), or None."""
+    if wal_size() >= config["DB_MAINTENANCE_WAL_BYTES"]:
+        return "wal"
+    with _connect() as conn:
+        last = _last_run(conn)
+    if last is None or _seconds_since(last["started_at"]) >= config["DB_MAINTENANCE_INTERVAL"]:
+        return "schedule"
+    return None
+
+
+class MaintenanceLock:
+    """Non-blocking exclusive flock shared by maintenance and backups; acquired is False when held elsewhere."""
+
+    def __init__(self):
+        self.handle = None
+        self.acquired = False
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+        self.handle = open(LOCK_PATH, "a")
+        if fcntl is None:
+            self.acquired = True
+            return self
+        try:
+            fcntl.flock(self.handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.acquired = True
+        except OSError:
+            self.acquired = False
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.acquired and fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+
+def run_maintenance(config=None, trigger="manual"):
+    """
+    Checkpoint, optimize and vacuum the mappings database.
+    Returns the maintenance_log entry, or None when another worker holds the lock.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    with MaintenanceLock() as lock:
+        if not lock.acquired:
+            return None
+        # Another worker may have finished a run while this one waited to poll
+        if trigger != "manual" and due_trigger(config) is None:
+            return None
+
+        started = time.perf_counter()
+        entry = {
+            "trigger": trigger,
+            "started_at": _now(),
+            "wal_bytes_before": wal_size(),
+            "pages_freed": 0,
+            "error": None
+        }
+        conn = _connect()
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            if not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone():
+                conn.execute("ANALYZE;")
+            conn.execute("PRAGMA optimize;")
+
+            free_before = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+                # incremental_vacuum needs auto_vacuum=INCREMENTAL, which only a full VACUUM applies
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+                conn.execute("VACUUM;")
+            elif free_before:
+                conn.execute(f"PRAGMA incremental_vacuum({int(config['DB_MAINTENANCE_VACUUM_PAGES'])});")
+            free_after = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+            entry["pages_freed"] = max(0, free_before - free_after)
+
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        except sqlite3.Error as exc:
+            entry["error"] = str(exc)
+        finally:
+            entry["wal_bytes_after"] = wal_size()
+            entry["duration_ms"] = int((time.perf_counter() - started) * 1000)
+            with conn:
+                _ensure_log_table(conn)
+                cursor = conn.execute(
+                    """
+                    INSERT INTO maintenance_log (
+                        trigger, started_at, duration_ms, wal_bytes_before,
+                        wal_bytes_after, pages_freed, error
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        entry["trigger"], entry["started_at"], entry["duration_ms"],
+                        entry["wal_bytes_before"], entry["wal_bytes_after"],
+                        entry["pages_freed"], entry["error"]
+                    )
+                )
+                entry["id"] = cursor.lastrowid
+            conn.close()
+    return entry
+
+
+def _loop(config):
+    while not _stop.wait(config["DB_MAINTENANCE_POLL_SECONDS"]):
+        try:
+            trigger = due_trigger(config)
+            if trigger:
+                run_maintenance(config, trigger)
+        except (sqlite3.Error, OSError):
+            # Maintenance is best effort; try again on the next poll
+            continue
+
+
+def start(config):
+    """Start the maintenance thread for this process (once) if enabled in config."""
+    global _thread
+    config = {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+    if not config["DB_MAINTENANCE_ENABLED"] or (_thread and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(config,), name="db-maintenance", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def get_db_stats():
+    """Sizes and health of the mappings database, plus the last maintenance run."""
+    with _connect() as conn:
+        pragmas = {
+            name: conn.execute(f"PRAGMA {name};").fetchone()[0]
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum", "journal_mode")
+        }
+        objects = conn.execute(
+            """
+            SELECT name, type, tbl_name FROM sqlite_master
+            WHERE type IN ('table', 'index')
+            ORDER BY type DESC, name
+            """
+        ).fetchall()
+
+        sizes = {}
+        try:
+            for row in conn.execute(
+                "SELECT name, COUNT(*) AS pages, SUM(pgsize) AS bytes FROM dbstat GROUP BY name"
+            ):
+                sizes[row["name"]] = {"pages": row["pages"], "bytes": row["bytes"]}
+            size_source = "dbstat"
+        except sqlite3.OperationalError:
+            # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB: report row counts only
+            size_source = "unavailable"
+
+        tables = []
+        indexes = []
+        for row in objects:
+            entry = {"name": row["name"], **sizes.get(row["name"], {"pages": None, "bytes": None})}
+            if row["type"] == "table":
+                entry["rows"] = conn.execute(f'SELECT COUNT(*) FROM "{row["name"]}"').fetchone()[0]
+                tables.append(entry)
+            else:
+                entry["table"] = row["tbl_name"]
+                indexes.append(entry)
+
+        last = _last_run(conn)
+
+    try:
+        shm_bytes = os.path.getsize(storage.DB_PATH + "-shm")
+    except OSError:
+        shm_bytes = 0
+
+    return {
+        "path": os.path.relpath(storage.DB_PATH, storage.BASE_DIR),
+        "fileBytes": os.path.getsize(storage.DB_PATH),
+        "walBytes": wal_size(),
+        "shmBytes": shm_bytes,
+        "pageSize": pragmas["page_size"],
+        "pageCount": pragmas["page_count"],
+        "freelistCount": pragmas["freelist_count"],
+        "autoVacuum": {0: "none", 1: "full", 2: "incremental"}.get(pragmas["auto_vacuum"]),
+        "journalMode": pragmas["journal_mode"],
+        "sizeSource": size_source,
+        "tables": tables,
+        "indexes": indexes,
+        "lastMaintenance": last
+    }
@@ -0,0 +1,107 @@
+"""
+Per-worker LRU cache of /api/generate-spl results.
+Entries are keyed on the tenant and canonical composition and tagged with the mapping generation;
+after any mapping change an entry is reused only if the objects it references are unchanged.
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_CONFIG = {
+    # Compositions remembered per worker; 0 turns the cache off
+    "GENERATE_CACHE_SIZE": 1024
+}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "revalidations": 0, "invalidations": 0}
+
+
+def _id_list(value):
+    if not value:
+        return ()
+    return tuple(str(item) for item in (value if isinstance(value, list) else [value]))
+
+
+def composition_key(data):
+    """
+    Canonical form of the inputs compose_spl reads. Id order is kept: the composed SPL
+    follows selection order and the first generating data source wins.
+    """
+    return (
+        data.get("mode") or "search",
+        bool(data.get("optimize")),
+        _id_list(data.get("dataSources")),
+        _id_list(data.get("includes")),
+        _id_list(data.get("excludes")),
+        str(data.get("timeRange") or ""),
+        str(data.get("outputShape") or ""),
+        str(data.get("outputField") or "")
+    )
+
+
+def references(key, catalog):
+    """The catalog objects a composition uses (None for ids it does not resolve), in key order."""
+    _, _, data_sources, includes, excludes, time_range, output_shape, _ = key
+    filters = catalog["filters"]
+    return (
+        tuple(catalog["dataSources"].get(item) for item in data_sources),
+        tuple(filters.get(item) for item in includes + excludes),
+        catalog["timeRangePresets"].get(time_range),
+        catalog["outputShapes"].get(output_shape)
+    )
+
+
+def get_or_compose(config, tenant, data, generation, catalog, compose):
+    """
+    compose(data) memoized for tenant at this mapping generation. An entry from an older
+    generation is still served when its referenced mapping objects compare equal.
+    """
+    size = config["GENERATE_CACHE_SIZE"]
+    if size <= 0:
+        return compose(data)
+
+    key = (tenant, composition_key(data))
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry["generation"] != generation:
+            if entry["references"] == references(key[1], catalog):
+                entry["generation"] = generation
+                _stats["revalidations"] += 1
+            else:
+                del _cache[key]
+                _stats["invalidations"] += 1
+                entry = None
+        if entry:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["result"]
+        _stats["misses"] += 1
+
+    result = compose(data)
+    with _lock:
+        _cache[key] = {"generation": generation, "references": references(key[1], catalog), "result": result}
+        _cache.move_to_end(key)
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+            _stats["evictions"] += 1
+    return result
+
+
+def get_stats(config):
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "size": len(_cache),
+            "maxSize": config["GENERATE_CACHE_SIZE"],
+            "hitRate": round(_stats["hits"] / lookups, 4) if lookups else None
+        }
+
+
+def clear():
+    """Drop every entry and reset the counters."""
+    with _lock:
+        _cache.clear()
+        for name in _stats:
+            _stats[name] = 0
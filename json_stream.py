@@ -0,0 +1,92 @@
+"""
+Incremental JSON and NDJSON encoding for large list responses.
+Generators here turn database cursors into response chunks with the same document shape jsonify
+produces (sorted keys, compact separators), so per-request memory stays bounded.
+"""
+
+import json
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Chunks are coalesced up to this size before being handed to the WSGI server
+CHUNK_CHARS = 16 * 1024
+
+
+def dumps(value):
+    """Encode one value the way Flask's jsonify does (sorted keys, compact, ASCII-safe)."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def buffered(chunks, size=CHUNK_CHARS):
+    """Coalesce small string chunks; the first chunk is sent right away for a fast first byte."""
+    buffer = []
+    length = 0
+    first = True
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if first or length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+            first = False
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_array(items):
+    yield "["
+    for index, item in enumerate(items):
+        yield ("," if index else "") + dumps(item)
+    yield "]"
+
+
+def iter_grouped(pairs, groups=()):
+    """
+    Encode (group, item) pairs, already sorted by group, as {group: [items]}.
+    Every name in groups appears even when it has no items, as jsonify would emit it.
+    """
+    pending = sorted(groups)
+    current = None
+    empty = True
+    yield "{"
+    for group, item in pairs:
+        if group == current:
+            yield "," + dumps(item)
+            continue
+        if current is not None:
+            yield "]"
+        while pending and pending[0] < group:
+            yield ("" if empty else ",") + dumps(pending.pop(0)) + ":[]"
+            empty = False
+        if pending and pending[0] == group:
+            pending.pop(0)
+        yield ("" if empty else ",") + dumps(group) + ":[" + dumps(item)
+        empty = False
+        current = group
+    if current is not None:
+        yield "]"
+    for group in pending:
+        yield ("" if empty else ",") + dumps(group) + ":[]"
+        empty = False
+    yield "}"
+
+
+def iter_object(fields):
+    """
+    Encode (key, value) fields, given in sorted key order, as one JSON object.
+    A value may be a generator of already-encoded chunks (e.g. from iter_array).
+    """
+    yield "{"
+    for index, (key, value) in enumerate(fields):
+        yield ("," if index else "") + dumps(key) + ":"
+        if hasattr(value, "__next__"):
+            yield from value
+        else:
+            yield dumps(value)
+    yield "}"
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield dumps(record) + "\n"
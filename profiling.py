@@ -0,0 +1,163 @@
+"""
+On-demand request profiling for admins.
+Runs a single request under cProfile plus a stack sampler and saves pstats, collapsed stacks
+(for flamegraph.pl or speedscope) and a small JSON summary tagged with the route and timing.
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import storage
+
+DEFAULT_CONFIG = {
+    # Profiling is off unless enabled; even then only admins can trigger it
+    "PROFILING_ENABLED": False,
+    "PROFILING_DIR": os.path.join(storage.DATA_DIR, "profiles"),
+    # Seconds between stack samples for the collapsed-stack output
+    "PROFILING_SAMPLE_INTERVAL": 0.001,
+    # Oldest profiles are deleted once more than this many are kept
+    "PROFILING_KEEP": 200
+}
+
+# Request header or query parameter that asks for a profile
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "_profile"
+
+PROFILE_ID_PATTERN = re.compile(r"^[\w\-]+$")
+PROFILE_EXTENSIONS = {
+    "prof": "application/octet-stream",
+    "collapsed": "text/plain",
+    "json": "application/json"
+}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Periodically captures one thread's stack and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+
+class RequestProfile:
+    """cProfile and a stack sampler running together for one request."""
+
+    def __init__(self, config):
+        self.config = {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), self.config["PROFILING_SAMPLE_INTERVAL"])
+        self.started = None
+        self.stamp = None
+        self.duration_ms = None
+
+    def start(self):
+        self.sampler.start()
+        self.stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def profile_id(self, endpoint):
+        """Id the profile is saved under; known from the start so streamed responses can send it."""
+        route = re.sub(r"[^\w\-]+", "_", endpoint or "unknown")
+        return f"{self.stamp}-{route}"
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self.sampler.stop()
+
+    def save(self, endpoint, method, path, status):
+        """Write <id>.prof, <id>.collapsed and <id>.json; returns the profile id."""
+        directory = self.config["PROFILING_DIR"]
+        os.makedirs(directory, exist_ok=True)
+        profile_id = self.profile_id(endpoint)
+        base = os.path.join(directory, profile_id)
+
+        self.profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as handle:
+            for stack, count in self.sampler.counts.most_common():
+                handle.write(f"{stack} {count}\n")
+        summary = {
+            "id": profile_id,
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "status": status,
+            "durationMs": self.duration_ms,
+            "samples": self.sampler.samples,
+            "sampleIntervalMs": self.config["PROFILING_SAMPLE_INTERVAL"] * 1000,
+            "createdAt": datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        }
+        with open(f"{base}.json", "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2)
+
+        _prune(directory, self.config["PROFILING_KEEP"])
+        return profile_id
+
+
+def _prune(directory, keep):
+    profile_ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+    for profile_id in profile_ids[:max(0, len(profile_ids) - keep)]:
+        for extension in PROFILE_EXTENSIONS:
+            try:
+                os.remove(os.path.join(directory, f"{profile_id}.{extension}"))
+            except OSError:
+                pass
+
+
+def list_profiles(config):
+    """Saved profile summaries, newest first."""
+    directory = config.get("PROFILING_DIR", DEFAULT_CONFIG["PROFILING_DIR"])
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as handle:
+                    profiles.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def profile_path(config, profile_id, extension):
+    """Path of a saved profile file, or None for unknown ids and extensions."""
+    if extension not in PROFILE_EXTENSIONS or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(config.get("PROFILING_DIR", DEFAULT_CONFIG["PROFILING_DIR"]), f"{profile_id}.{extension}")
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,186 @@
+"""
+Admission control for expensive routes, shared by every worker process.
+Token buckets per client and route group live in a small SQLite file; concurrency caps use
+flock'd slot files. Rejections raise RateLimited, which the app answers with 429 and Retry-After.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrency caps fall back to per-process semaphores
+    fcntl = None
+
+DEFAULT_CONFIG = {
+    "RATE_LIMIT_ENABLED": True,
+    "RATE_LIMIT_PATH": os.path.join(storage.DATA_DIR, "ratelimit.db"),
+    # Route group -> [requests per second, burst] for each client
+    "RATE_LIMITS": {
+        "generate": [5, 20],
+        "write": [2, 20],
+        "index": [10, 40],
+        "export": [0.1, 2],
+        "changes": [1, 10],
+        # A classroom behind one address checks answers at once
+        "check": [20, 100]
+    },
+    # Route group -> requests allowed to run at once across all workers
+    "RATE_LIMIT_CONCURRENCY": {
+        "generate": 4,
+        "export": 2,
+        # Open /api/mappings/changes event streams
+        "changes": 32
+    },
+    # Requests carrying the admin token skip the limits; loopback clients without it do not
+    "RATE_LIMIT_EXEMPT_ADMIN": True,
+    # Reverse proxies in front of the app; when set, the client key comes from X-Forwarded-For
+    "TRUSTED_PROXIES": 0
+}
+
+# Buckets idle this long are full again and can be dropped
+IDLE_SECONDS = 3600
+PRUNE_PROBABILITY = 0.01
+
+_local = threading.local()
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+class RateLimited(Exception):
+    """The client or route is over its limit; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _connect(path):
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == path:
+        return conn
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=0.25, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    # Losing a few bucket updates on a crash is harmless
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def take_token(path, key, rate, burst):
+    """
+    Spend one token from the bucket for key; returns seconds to wait when empty, else 0.
+    Fails open: if the store is locked or unavailable the request is admitted.
+    """
+    try:
+        conn = _connect(path)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate if rate > 0 else IDLE_SECONDS
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            if random.random() < PRUNE_PROBABILITY:
+                conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - IDLE_SECONDS,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+    except sqlite3.Error:
+        return 0
+
+
+class ConcurrencySlot:
+    """One of limit slots for a route group, held until release()."""
+
+    def __init__(self, path, group, limit):
+        self.group = group
+        self.limit = limit
+        self.slot_dir = os.path.join(os.path.dirname(path), ".concurrency")
+        self.handle = None
+        self.semaphore = None
+
+    def acquire(self):
+        if fcntl is None:
+            with _semaphores_lock:
+                self.semaphore = _semaphores.setdefault(self.group, threading.BoundedSemaphore(self.limit))
+            if not self.semaphore.acquire(blocking=False):
+                self.semaphore = None
+                return False
+            return True
+
+        os.makedirs(self.slot_dir, exist_ok=True)
+        # Start at a random slot so waiting workers do not all contend for slot 0
+        offset = random.randrange(self.limit)
+        for index in range(self.limit):
+            slot = (offset + index) % self.limit
+            handle = open(os.path.join(self.slot_dir, f"{self.group}.{slot}.lock"), "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            self.handle = handle
+            return True
+        return False
+
+    def release(self):
+        if self.semaphore is not None:
+            self.semaphore.release()
+            self.semaphore = None
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+def admit(config, group, client):
+    """
+    Check the client's token bucket and the group's concurrency cap.
+    Returns a ConcurrencySlot to release when the request finishes (or None when uncapped);
+    raises RateLimited when the request should be turned away.
+    """
+    config = {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+    if not config["RATE_LIMIT_ENABLED"]:
+        return None
+
+    # Overrides such as SPLUNKED_RATE_LIMITS='{"generate": [1, 5]}' keep the other groups' defaults
+    limits = {**DEFAULT_CONFIG["RATE_LIMITS"], **config["RATE_LIMITS"]}.get(group)
+    if limits:
+        rate, burst = limits
+        wait = take_token(config["RATE_LIMIT_PATH"], f"{group}:{client}", float(rate), float(burst))
+        if wait:
+            raise RateLimited(f"Rate limit exceeded for {group} requests", max(1, math.ceil(wait)))
+
+    limit = {**DEFAULT_CONFIG["RATE_LIMIT_CONCURRENCY"], **config["RATE_LIMIT_CONCURRENCY"]}.get(group)
+    if not limit:
+        return None
+    slot = ConcurrencySlot(config["RATE_LIMIT_PATH"], group, int(limit))
+    if not slot.acquire():
+        raise RateLimited(f"Too many {group} requests in progress", 1)
+    return slot
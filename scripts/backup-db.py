@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Back up or restore the prompt builder mappings database while the app is running.
+
+Uses SQLite's online backup API in small page steps; progress and throughput
+are printed as the copy runs.
+"""
+
+import argparse
+import sys
+
+import db_backup
+
+
+_last_operation = None
+
+
+def print_progress(progress):
+    global _last_operation
+    if _last_operation not in (None, progress["operation"]):
+        print(file=sys.stderr)
+    _last_operation = progress["operation"]
+    rate = (progress["bytesPerSecond"] or 0) / (1024 * 1024)
+    print(
+        f"\r  {progress['operation']}: {progress['pagesCopied']}/{progress['pagesTotal']} pages "
+        f"({progress['percent']}%), {rate:.1f} MB/s, {progress['restarts']} restarts",
+        end="",
+        file=sys.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup and restore of splunked.db.")
+    parser.add_argument("--dir", default=db_backup.DEFAULT_CONFIG["BACKUP_DIR"], help="Backup directory")
+    parser.add_argument(
+        "--pages-per-step",
+        type=int,
+        default=db_backup.DEFAULT_CONFIG["BACKUP_PAGES_PER_STEP"],
+        help="Pages copied per backup step"
+    )
+    parser.add_argument(
+        "--keep",
+        type=int,
+        default=db_backup.DEFAULT_CONFIG["BACKUP_KEEP"],
+        help="Backups to keep after a new one is written"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backup", help="Write a new backup")
+    commands.add_parser("list", help="List backups, newest first")
+    restore_parser = commands.add_parser("restore", help="Restore a backup by name (a pre-restore backup is taken first)")
+    restore_parser.add_argument("name")
+    args = parser.parse_args()
+
+    config = {
+        "BACKUP_DIR": args.dir,
+        "BACKUP_PAGES_PER_STEP": args.pages_per_step,
+        "BACKUP_KEEP": args.keep
+    }
+
+    if args.command == "list":
+        for entry in db_backup.list_backups(config):
+            print(f"{entry['name']}  {entry['bytes']:>12} bytes  {entry['createdAt']}")
+        return
+
+    try:
+        if args.command == "backup":
+            summary = db_backup.backup(config, report=print_progress)
+        else:
+            summary = db_backup.restore(args.name, config, report=print_progress)
+    except db_backup.BackupError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    print(file=sys.stderr)
+
+    if summary is None:
+        print("Maintenance, a backup or a restore is already running; try again later.", file=sys.stderr)
+        sys.exit(2)
+
+    rate = (summary["bytesPerSecond"] or 0) / (1024 * 1024)
+    if args.command == "backup":
+        print(f"Backed up to {summary['name']} ({summary['bytes']} bytes, {summary['elapsedSeconds']}s, {rate:.1f} MB/s).")
+    else:
+        print(
+            f"Restored {summary['name']} ({summary['elapsedSeconds']}s, {rate:.1f} MB/s); "
+            f"previous data saved as {summary['preRestoreBackup']}."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Export the query library and prompt builder search objects as a Splunk app.
+
+Writes a tar.gz with savedsearches.conf, macros.conf and lookup stubs, streamed
+to disk (or stdout with -o -) so large exports run in constant memory.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import spl_composer
+import splunk_app
+import storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Splunk app package.")
+    parser.add_argument(
+        "-o", "--output",
+        default=None,
+        help="Output path, or - for stdout (default: splunked_detections-YYYYMMDD.tar.gz)"
+    )
+    parser.add_argument("--category", action="append", default=[], help="Only this category (repeatable)")
+    parser.add_argument("--mitre", action="append", default=[], help="Only this MITRE technique (repeatable)")
+    parser.add_argument("--tag", action="append", default=[], help="Require this tag (repeatable)")
+    parser.add_argument("--tenant", default=None, help="Export this tenant's search objects plus the shared set")
+    parser.add_argument(
+        "--queries",
+        default=splunk_app.QUERIES_PATH,
+        help="Path to the query library JSON"
+    )
+    parser.add_argument(
+        "--no-library",
+        action="store_true",
+        help="Leave the query library out (export compositions and macros only)"
+    )
+    parser.add_argument(
+        "--compositions",
+        default=None,
+        help="JSON file with a list of prompt builder selections to export as saved searches"
+    )
+    args = parser.parse_args()
+
+    storage.init_db()
+    compositions = []
+    catalog = None
+    if args.compositions:
+        compositions = json.loads(Path(args.compositions).read_text(encoding="utf-8"))
+        if not isinstance(compositions, list):
+            parser.error("--compositions must contain a JSON list")
+        catalog = spl_composer.build_catalog(storage.get_all_mappings(tenant=args.tenant))
+
+    queries = [] if args.no_library else splunk_app.load_queries(args.queries)
+    package = splunk_app.iter_app_package(
+        queries=splunk_app.iter_queries(queries, args.category, args.mitre, args.tag),
+        compositions=compositions,
+        mappings=storage.iter_mappings(args.tag, args.tenant),
+        catalog=catalog
+    )
+
+    if args.output == "-":
+        for chunk in package:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return
+
+    output = Path(args.output or splunk_app.export_filename())
+    size = 0
+    with output.open("wb") as handle:
+        for chunk in package:
+            handle.write(chunk)
+            size += len(chunk)
+    print(f"Wrote {output} ({size} bytes).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Freeze SPLUNKed into a static site.
+
+Renders every page and writes every read-only API response (training index, items,
+pipelines, snippets, similar searches) as precompressed, content-hashed files that any
+static file server can host. Only the prompt builder API still needs the Python app.
+"""
+
+import argparse
+import os
+import sys
+
+# Importing the app must not start background maintenance or count against rate limits
+os.environ.setdefault("SPLUNKED_DB_MAINTENANCE_ENABLED", "false")
+os.environ.setdefault("SPLUNKED_RATE_LIMIT_ENABLED", "false")
+
+import static_export  # noqa: E402
+from app import app  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SPLUNKed as a static site.")
+    parser.add_argument("-o", "--output", default="dist", help="Output directory (default: dist)")
+    parser.add_argument("--clean", action="store_true", help="Remove the output directory first")
+    parser.add_argument("--no-gzip", action="store_true", help="Skip the precompressed .gz copies")
+    args = parser.parse_args()
+
+    if args.clean:
+        static_export.clean(args.output)
+
+    summary = static_export.freeze(
+        app,
+        args.output,
+        compress=not args.no_gzip,
+        report=lambda message: print(message, file=sys.stderr)
+    )
+    print(
+        f"Wrote {summary['files']} files ({summary['bytes']} bytes, {summary['compressedBytes']} gzipped) "
+        f"to {args.output}; manifest version {summary['version']}, "
+        f"{summary['removed']} stale API files removed.",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ import json
 import sys
 from pathlib import Path
 
+import similarity
+import spl_snippets
 import training_storage
 
 
@@ -190,6 +192,72 @@ def iter_modules(content_dir):
             yield load_json_module(path)
 
 
+def externalize_spl(module, snippet_entries):
+    """Swap each SPL string in a JSON module for a snippet reference, recording where it was used."""
+    if module.get("content_format") != "json":
+        return module
+    content = json.loads(module["content"])
+    for location, spl in spl_snippets.iter_content_snippets(content, module.get("id")):
+        snippet_entries.append(("training", module.get("id"), location, spl))
+    return {**module, "content": json.dumps(spl_snippets.externalize(content, spl_snippets.snippet_hash))}
+
+
+def report_spl_analysis(stats):
+    """Summarize the stored analyzer results over every snippet reference and warn on high-cost SPL."""
+    rule_counts = {}
+    for location, analysis in training_storage.iter_snippet_analyses():
+        high = []
+        for finding in analysis["findings"]:
+            rule_counts[finding["rule"]] = rule_counts.get(finding["rule"], 0) + 1
+            if finding["severity"] == "high":
+                high.append(f"{finding['rule']} {finding['span']['text']}")
+        if high:
+            warn(f"High-cost SPL: {'; '.join(high)}", location)
+
+    print(
+        f"Analyzed {stats['references']} SPL snippets for performance antipatterns "
+        f"({stats['unique']} unique, {stats['analyzed']} newly analyzed, {stats['removed']} unused removed)."
+    )
+    for rule, count in sorted(rule_counts.items(), key=lambda item: -item[1]):
+        print(f"  {rule}: {count}")
+
+
+def build_similarity_index(queries_path):
+    """Store the top similar queries and training modules for every query and module."""
+    items = []
+    titles = {}
+    if queries_path.exists():
+        for query in json.loads(read_text(queries_path)).get("library", []):
+            if not query.get("id"):
+                continue
+            key = ("query", query["id"])
+            titles[key] = query.get("title")
+            items.append((key, similarity.features(
+                title=query.get("title"),
+                tags=query.get("tags"),
+                mitre=query.get("mitre"),
+                data_source=query.get("dataSource"),
+                category=query.get("category"),
+                spl=[query["spl"]] if query.get("spl") else []
+            )))
+    for module, spl in training_storage.iter_modules_with_spl():
+        key = ("training", module["id"])
+        titles[key] = module["title"]
+        items.append((key, similarity.features(
+            title=module["title"],
+            tags=module["tags"] + module["keywords"],
+            category=module["category"],
+            spl=spl
+        )))
+
+    rows = []
+    for (kind, item_id), found in similarity.nearest_neighbours(items).items():
+        for rank, (neighbour, score) in enumerate(found):
+            rows.append((kind, item_id, rank, neighbour[0], neighbour[1], titles[neighbour], score))
+    training_storage.replace_similar_items(rows)
+    print(f"Indexed {len(items)} queries and training modules for similar searches ({len(rows)} links).")
+
+
 def load_pipelines(path):
     if not path.exists():
         return []
@@ -208,27 +276,70 @@ def main():
         default="data/training-pipelines.json",
         help="Path to pipeline definition JSON"
     )
+    parser.add_argument(
+        "--queries",
+        default="static/data/queries.json",
+        help="Path to the query library JSON analyzed for SPL antipatterns"
+    )
+    parser.add_argument(
+        "--glossary",
+        default="static/data/glossary.json",
+        help="Path to the glossary JSON whose examples join the snippet store"
+    )
     parser.add_argument(
         "--reset",
         action="store_true",
-        help="Clear existing training data before importing"
+        help="Remove modules and pipelines that are no longer in the content set"
     )
     args = parser.parse_args()
 
     training_storage.init_db()
-    if args.reset:
-        training_storage.reset_training_data()
-
-    content_dir = Path(args.content_dir)
-    if content_dir.exists():
-        for module in iter_modules(content_dir):
-            training_storage.upsert_module(module)
-
-    pipelines = load_pipelines(Path(args.pipelines))
-    for pipeline in pipelines:
-        training_storage.upsert_pipeline(pipeline)
+    start_revision = training_storage.get_training_revision()
+
+    # Everything is written to a copy of training.db that replaces the live file
+    # only once the whole rebuild succeeds; serving workers never see a partial build.
+    with training_storage.build():
+        module_ids = []
+        snippet_entries = []
+        content_dir = Path(args.content_dir)
+        if content_dir.exists():
+            for module in iter_modules(content_dir):
+                module_ids.append(training_storage.upsert_module(externalize_spl(module, snippet_entries)))
+
+        pipelines = load_pipelines(Path(args.pipelines))
+        pipeline_ids = [training_storage.upsert_pipeline(pipeline) for pipeline in pipelines]
+
+        # Unchanged rows keep their revision; stale rows become tombstones so
+        # clients syncing with ?since= learn about the deletion.
+        if args.reset:
+            removed = training_storage.prune_training_data(module_ids, pipeline_ids)
+            for kind, ids in removed.items():
+                for item_id in ids:
+                    print(f"  Removed {kind[:-1]}: {item_id}")
+
+        for step in training_storage.find_dangling_pipeline_steps():
+            warn(
+                f"Step {step['stepIndex'] + 1} points at missing {step['source'] or 'module'} "
+                f"'{step['sourceId']}'",
+                f"pipeline {step['pipelineId']}"
+            )
 
-    print("Training database rebuild complete.")
+        # Library and glossary SPL is served from static/data as authored; recording it here
+        # shares one analysis per unique snippet with the training content.
+        for item_id, location, spl in spl_snippets.iter_library_snippets(args.queries):
+            snippet_entries.append(("library", item_id, location, spl))
+        for item_id, location, spl in spl_snippets.iter_glossary_snippets(args.glossary):
+            snippet_entries.append(("glossary", item_id, location, spl))
+        stats = training_storage.store_snippets(
+            snippet_entries,
+            replace_datasets=("library", "glossary"),
+            replace_items=[("training", module_id) for module_id in module_ids]
+        )
+        report_spl_analysis(stats)
+        build_similarity_index(Path(args.queries))
+
+    end_revision = training_storage.get_training_revision()
+    print(f"Training database rebuild complete (revision {start_revision} -> {end_revision}).")
 
     # Display validation warnings
     if WARNINGS:
@@ -0,0 +1,163 @@
+"""
+"Similar searches" for the query library and training modules, computed at rebuild time.
+Items become weighted feature sets (SPL token shingles plus title, tags, MITRE, data source);
+MinHash/LSH finds candidate pairs without comparing every pair, and candidates are ranked by Jaccard.
+"""
+
+import hashlib
+import random
+import re
+from collections import Counter
+
+import spl_analyzer
+
+# Neighbours stored per item
+TOP_K = 8
+# Pairs scoring below this are not worth recommending
+MIN_SCORE = 0.08
+
+NUM_PERM = 128
+# 64 bands of 2 rows: pairs with Jaccard around 0.15 and up usually share a bucket
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+# Buckets this large (e.g. a shingle every item shares) add no signal, only comparisons
+MAX_BUCKET = 200
+# Candidates per item, by shared LSH buckets, that get an exact Jaccard score
+CANDIDATES_PER_NEIGHBOUR = 4
+
+SHINGLE_SIZE = 3
+# Metadata features are repeated so a shared tag or technique counts as much as several shingles
+METADATA_WEIGHT = 3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(47)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+STOP_WORDS = {"the", "and", "for", "with", "from", "into", "via", "using", "all", "any", "of", "to", "in", "on", "by", "a", "an"}
+
+
+def _spl_terms(spl):
+    """Analyzer tokens with literal values generalized, so searches differing only in values match."""
+    terms = []
+    for token in spl_analyzer.tokenize(spl):
+        if token.kind == "string":
+            terms.append("<str>")
+        elif token.kind == "word" and NUMBER_PATTERN.match(token.value):
+            terms.append("<num>")
+        else:
+            terms.append(token.value.lower())
+    return terms
+
+
+def _words(text):
+    return [word for word in WORD_PATTERN.findall((text or "").lower()) if len(word) > 2 and word not in STOP_WORDS]
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def features(title="", tags=(), mitre=(), data_source="", category="", spl=()):
+    """Weighted feature set for one item; spl is a list of SPL strings."""
+    result = set()
+    for text in spl:
+        terms = _spl_terms(text)
+        result.update(f"cmd:{command.name}" for command in spl_analyzer.split_commands(spl_analyzer.tokenize(text)) if command.name)
+        if len(terms) < SHINGLE_SIZE:
+            result.update(f"spl:{term}" for term in terms)
+        for index in range(len(terms) - SHINGLE_SIZE + 1):
+            result.add("spl:" + " ".join(terms[index:index + SHINGLE_SIZE]))
+
+    metadata = [f"title:{word}" for word in _words(title)]
+    metadata += [f"tag:{tag.lower()}" for tag in _as_list(tags)]
+    for technique in _as_list(mitre):
+        technique = technique.upper()
+        metadata.append(f"mitre:{technique}")
+        # Sub-techniques also match their parent technique
+        metadata.append(f"mitre:{technique.split('.')[0]}")
+    if data_source:
+        metadata.append(f"ds:{data_source.lower()}")
+    if category:
+        metadata.append(f"cat:{category.lower()}")
+    for feature in metadata:
+        result.update(f"{feature}#{copy}" for copy in range(METADATA_WEIGHT))
+    return result
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permuted(feature):
+    h = _feature_hash(feature)
+    return [(a * h + b) % _PRIME for a, b in _PERMUTATIONS]
+
+
+def signature(feature_set, vectors=None):
+    """
+    MinHash signature: the minimum of each permutation over the feature hashes.
+    vectors caches each feature's permuted hashes; features recur across most items.
+    """
+    if not feature_set:
+        return None
+    if vectors is None:
+        vectors = {}
+    rows = []
+    for feature in feature_set:
+        vector = vectors.get(feature)
+        if vector is None:
+            vector = vectors[feature] = _permuted(feature)
+        rows.append(vector)
+    return list(map(min, zip(*rows)))
+
+
+def jaccard(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _shared_buckets(signatures):
+    """For each item, the LSH band buckets (lists of item indexes) it shares with other items."""
+    buckets = {}
+    for index, sig in enumerate(signatures):
+        if sig is None:
+            continue
+        for band in range(BANDS):
+            start = band * ROWS
+            buckets.setdefault((band, *sig[start:start + ROWS]), []).append(index)
+    shared = [[] for _ in signatures]
+    for members in buckets.values():
+        if 1 < len(members) <= MAX_BUCKET:
+            for index in members:
+                shared[index].append(members)
+    return shared
+
+
+def nearest_neighbours(items, top_k=TOP_K, min_score=MIN_SCORE):
+    """
+    items: list of (key, feature_set). Returns {key: [(neighbour_key, score), ...]} with up to
+    top_k neighbours each, best first; ties are broken by key so builds are reproducible.
+    Only the items sharing the most LSH buckets with an item are scored, so the work per
+    item stays bounded as the library grows.
+    """
+    vectors = {}
+    signatures = [signature(feature_set, vectors) for _, feature_set in items]
+    shared = _shared_buckets(signatures)
+    neighbours = {}
+    for index, (key, feature_set) in enumerate(items):
+        collisions = Counter()
+        for members in shared[index]:
+            collisions.update(members)
+        collisions.pop(index, None)
+        found = []
+        for other, _ in collisions.most_common(top_k * CANDIDATES_PER_NEIGHBOUR):
+            score = jaccard(feature_set, items[other][1])
+            if score >= min_score:
+                found.append((items[other][0], score))
+        neighbours[key] = sorted(found, key=lambda entry: (-entry[1], entry[0]))[:top_k]
+    return neighbours
@@ -0,0 +1,396 @@
+"""
+Static performance analysis for SPL searches.
+Flags the costly antipatterns documented in references.json and suggests cheaper rewrites.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(__file__)
+REFERENCES_PATH = os.path.join(BASE_DIR, "static", "data", "references.json")
+
+Token = namedtuple("Token", "kind value start end")
+Command = namedtuple("Command", "name tokens start end leading_pipe")
+
+TOKEN_PATTERN = re.compile(
+    r"""
+      (?P<string>"(?:[^"\\]|\\.)*"?)
+    | (?P<quoted>'[^']*'?)
+    | (?P<pipe>\|)
+    | (?P<lbracket>\[)
+    | (?P<rbracket>\])
+    | (?P<lparen>\()
+    | (?P<rparen>\))
+    | (?P<op>!=|<=|>=|==|=|<|>|,)
+    | (?P<word>[^\s"'|\[\]()=!<>,]+|!)
+    | (?P<space>\s+)
+    """,
+    re.VERBOSE
+)
+
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+# Where each rule's explanation lives on the Knowledge page
+RULE_REFERENCES = {
+    "leading_wildcard": "antipattern_wildcards",
+    "all_time": "antipattern_alltime",
+    "no_time_bounds": "antipattern_alltime",
+    "all_indexes": "concept_index",
+    "no_index": "concept_index",
+    "subsearch": "antipattern_subsearch",
+    "join": "antipattern_subsearch",
+    "unnecessary_fields": "antipattern_fields",
+    "wildcard_fields": "antipattern_fields",
+    "transaction": "antipattern_transaction",
+    "late_filter": "concept_pipeline"
+}
+
+TIME_MODIFIERS = {
+    "earliest", "latest", "_index_earliest", "_index_latest",
+    "starttime", "endtime", "starttimeu", "endtimeu"
+}
+
+# Generating commands whose cost scales with the searched time range
+TIME_SCOPED_GENERATORS = {"tstats", "mstats", "datamodel", "from", "pivot", "metadata", "search"}
+
+# Commands that reduce events to a summary, so later field selection is implicit
+REDUCING_COMMANDS = {
+    "stats", "chart", "timechart", "top", "rare", "tstats", "mstats",
+    "geostats", "xyseries", "table", "fields", "sistats", "sitimechart"
+}
+
+# Commands inside a subsearch that keep its output small
+LIMITING_COMMANDS = {"head", "return", "stats", "top", "rare", "dedup", "tstats", "format"}
+
+_reference_titles = None
+
+
+def tokenize(spl):
+    """Split SPL into tokens with character offsets; whitespace is dropped."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(spl or ""):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        if kind == "quoted":
+            kind = "word"
+        tokens.append(Token(kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def split_commands(tokens):
+    """Group top-level tokens into pipeline commands; subsearch tokens stay inside their command."""
+    commands = []
+    current = []
+    leading_pipe = False
+    depth = 0
+
+    def flush():
+        if current:
+            first = current[0]
+            name = first.value.lower() if first.kind == "word" else ""
+            if not commands and not leading_pipe:
+                name = "search"
+            commands.append(Command(name, list(current), first.start, current[-1].end, leading_pipe))
+
+    for token in tokens:
+        if token.kind == "lbracket":
+            depth += 1
+        elif token.kind == "rbracket":
+            depth = max(0, depth - 1)
+        if token.kind == "pipe" and depth == 0:
+            flush()
+            current = []
+            leading_pipe = True
+            continue
+        current.append(token)
+    flush()
+    return commands
+
+
+def iter_subsearches(tokens):
+    """Yield the token list inside each outermost [ ... ] subsearch."""
+    depth = 0
+    start = None
+    for index, token in enumerate(tokens):
+        if token.kind == "lbracket":
+            if depth == 0:
+                start = index
+            depth += 1
+        elif token.kind == "rbracket" and depth:
+            depth -= 1
+            if depth == 0:
+                yield tokens[start + 1:index], tokens[start], token
+
+
+def is_search_command(command, index):
+    if command.name != "search":
+        return False
+    return index == 0 or command.leading_pipe
+
+
+def _search_terms(command):
+    """Return the command's top-level tokens, skipping the command keyword and any subsearches."""
+    tokens = command.tokens
+    if command.leading_pipe or (tokens and tokens[0].kind == "word" and tokens[0].value.lower() == "search"):
+        tokens = tokens[1:]
+    depth = 0
+    terms = []
+    for token in tokens:
+        if token.kind == "lbracket":
+            depth += 1
+            continue
+        if token.kind == "rbracket":
+            depth = max(0, depth - 1)
+            continue
+        if depth == 0:
+            terms.append(token)
+    return terms
+
+
+def _field_assignments(terms):
+    """Yield (field_token, op_token, value_token) triples such as index=main."""
+    for index in range(len(terms) - 2):
+        field, op, value = terms[index:index + 3]
+        if field.kind == "word" and op.kind == "op" and op.value != "," and value.kind in ("word", "string"):
+            yield field, op, value
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value.strip("\"")
+
+
+def _load_reference_titles():
+    global _reference_titles
+    if _reference_titles is None:
+        _reference_titles = {}
+        try:
+            with open(REFERENCES_PATH, "r", encoding="utf-8") as handle:
+                references = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            references = {}
+        for category, entries in references.items():
+            if not isinstance(entries, list):
+                continue
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("id"):
+                    _reference_titles[entry["id"]] = (category, entry.get("name") or entry["id"])
+    return _reference_titles
+
+
+def _reference(rule):
+    reference_id = RULE_REFERENCES.get(rule)
+    if not reference_id:
+        return None
+    category, title = _load_reference_titles().get(reference_id, ("antipatterns", reference_id))
+    tab = "antipatterns" if category == "antipatterns" else "fundamentals"
+    return {
+        "id": reference_id,
+        "title": title,
+        "url": f"/references?tab={tab}&open={reference_id}"
+    }
+
+
+def _finding(spl, rule, severity, message, start, end, suggestion, rewrite=None):
+    finding = {
+        "rule": rule,
+        "severity": severity,
+        "message": message,
+        "span": {"start": start, "end": end, "text": spl[start:end]},
+        "suggestion": suggestion,
+        "reference": _reference(rule)
+    }
+    if rewrite:
+        finding["rewrite"] = rewrite
+    return finding
+
+
+def _check_leading_wildcards(spl, terms, findings):
+    for token in terms:
+        if token.kind not in ("word", "string"):
+            continue
+        value = _unquote(token.value)
+        if value.startswith("*") and value.strip("*"):
+            findings.append(_finding(
+                spl, "leading_wildcard", "high",
+                f"Leading wildcard in '{token.value}' cannot use the index's term lookup and scans every event.",
+                token.start, token.end,
+                "Match an exact value or use a trailing wildcard. If a suffix match is unavoidable, "
+                "narrow by index and sourcetype first and filter later with where/like.",
+                rewrite=value.lstrip("*") + "*" if not value.endswith("*") else None
+            ))
+
+
+def _check_time_bounds(spl, command, terms, findings):
+    bounded = False
+    for field, op, value in _field_assignments(terms):
+        name = field.value.lower()
+        if name not in TIME_MODIFIERS:
+            continue
+        bounded = True
+        if name in ("earliest", "_index_earliest", "starttime") and _unquote(value.value) in ("0", "1"):
+            findings.append(_finding(
+                spl, "all_time", "high",
+                "Search explicitly covers all time and will touch every bucket in the index.",
+                field.start, value.end,
+                "Bound the search to the window you need, e.g. earliest=-24h latest=now.",
+                rewrite="earliest=-24h latest=now"
+            ))
+    if not bounded:
+        findings.append(_finding(
+            spl, "no_time_bounds", "medium",
+            "No earliest/latest in the search; run with an All time picker it scans every bucket.",
+            command.start, command.end,
+            "Add earliest/latest to the base search so the cost does not depend on the time picker.",
+            rewrite="earliest=-24h latest=now"
+        ))
+
+
+def _check_index(spl, command, terms, findings):
+    indexes = [(field, value) for field, op, value in _field_assignments(terms) if field.value.lower() == "index"]
+    if not indexes:
+        findings.append(_finding(
+            spl, "no_index", "medium",
+            "Base search does not name an index, so it searches every default index.",
+            command.start, command.end,
+            "Start the search with index=<name> (and sourcetype=<name> when known)."
+        ))
+        return
+    for field, value in indexes:
+        if _unquote(value.value) == "*":
+            findings.append(_finding(
+                spl, "all_indexes", "high",
+                "index=* searches every index you can read.",
+                field.start, value.end,
+                "Name the specific index or indexes that hold this data."
+            ))
+
+
+def _check_subsearches(spl, command, findings):
+    for inner, open_token, close_token in iter_subsearches(command.tokens):
+        inner_commands = split_commands(inner)
+        limited = any(c.name in LIMITING_COMMANDS for c in inner_commands)
+        if command.name == "join":
+            findings.append(_finding(
+                spl, "join", "medium",
+                "join runs its subsearch first and silently truncates it at the subsearch row limit.",
+                command.start, close_token.end,
+                "Search both datasets together and correlate with stats ... by <shared field>, or use a lookup."
+            ))
+        elif not limited:
+            findings.append(_finding(
+                spl, "subsearch", "medium",
+                "Subsearch has no limiting command and may hit the 10K result / 60s limits without warning.",
+                open_token.start, close_token.end,
+                "Replace it with a lookup or a stats-based correlation, or cap it with head/dedup/return."
+            ))
+        for inner_index, inner_command in enumerate(inner_commands):
+            if is_search_command(inner_command, inner_index):
+                _check_leading_wildcards(spl, _search_terms(inner_command), findings)
+
+
+def _check_transaction(spl, command, findings):
+    fields = []
+    for token in command.tokens[1:]:
+        if token.kind == "op" and token.value == "=":
+            if fields:
+                fields.pop()
+            break
+        if token.kind == "word":
+            fields.extend(part for part in token.value.split(",") if part)
+    by_clause = f" by {', '.join(fields)}" if fields else ""
+    findings.append(_finding(
+        spl, "transaction", "medium",
+        "transaction holds events in memory and is much slower than stats for grouping.",
+        command.start, command.end,
+        "Group with stats and derive the duration from min/max _time.",
+        rewrite=(
+            f"| stats min(_time) AS start_time max(_time) AS end_time count{by_clause}"
+            " | eval duration=end_time-start_time"
+        )
+    ))
+
+
+def _check_fields(spl, commands, findings):
+    for command in commands:
+        if command.name in ("fields", "table"):
+            args = [token.value for token in command.tokens[1:] if token.kind == "word"]
+            if "*" in args:
+                findings.append(_finding(
+                    spl, "wildcard_fields", "medium",
+                    f"{command.name} * keeps every extracted field.",
+                    command.start, command.end,
+                    "List only the fields you need."
+                ))
+    if not any(command.name in REDUCING_COMMANDS for command in commands):
+        last = commands[-1]
+        findings.append(_finding(
+            spl, "unnecessary_fields", "low",
+            "Search returns raw events with every field extracted.",
+            last.start, last.end,
+            "Add | fields <needed fields> early, or summarize with stats/table."
+        ))
+
+
+def _check_late_filter(spl, commands, findings):
+    if len(commands) < 2 or commands[0].leading_pipe:
+        return
+    command = commands[1]
+    if command.name != "search":
+        return
+    terms = _search_terms(command)
+    if not terms or any(token.kind == "lbracket" for token in command.tokens):
+        return
+    base = spl[commands[0].start:commands[0].end]
+    moved = spl[terms[0].start:terms[-1].end]
+    remainder = spl[command.end:].strip()
+    rewrite = f"{base} {moved}" + (f" {remainder}" if remainder else "")
+    findings.append(_finding(
+        spl, "late_filter", "low",
+        "Filter applied with | search after the base search; events are retrieved before they are discarded.",
+        command.start, command.end,
+        "Move these terms into the base search so the indexers filter them.",
+        rewrite=rewrite
+    ))
+
+
+def analyze_spl(spl):
+    """Return performance findings for one SPL string, most severe first."""
+    spl = spl or ""
+    findings = []
+    commands = split_commands(tokenize(spl))
+    if not commands:
+        return {"spl": spl, "findings": [], "summary": _summarize([])}
+
+    first = commands[0]
+    if not first.leading_pipe:
+        terms = _search_terms(first)
+        _check_index(spl, first, terms, findings)
+        _check_time_bounds(spl, first, terms, findings)
+    elif first.name in TIME_SCOPED_GENERATORS:
+        _check_time_bounds(spl, first, _search_terms(first), findings)
+
+    for index, command in enumerate(commands):
+        if is_search_command(command, index):
+            _check_leading_wildcards(spl, _search_terms(command), findings)
+        if command.name == "transaction":
+            _check_transaction(spl, command, findings)
+        _check_subsearches(spl, command, findings)
+
+    _check_fields(spl, commands, findings)
+    _check_late_filter(spl, commands, findings)
+
+    findings.sort(key=lambda f: (SEVERITY_ORDER[f["severity"]], f["span"]["start"]))
+    return {"spl": spl, "findings": findings, "summary": _summarize(findings)}
+
+
+def _summarize(findings):
+    counts = {severity: 0 for severity in SEVERITY_ORDER}
+    for finding in findings:
+        counts[finding["severity"]] += 1
+    worst = next((severity for severity in SEVERITY_ORDER if counts[severity]), None)
+    return {"counts": counts, "worst": worst}
@@ -0,0 +1,252 @@
+"""
+SPL composition for the prompt builder.
+Turns a selection of search object ids into SPL plus a plain-language explanation.
+"""
+
+import re
+
+import spl_optimizer
+import spl_tstats
+
+# Output modes for /api/generate-spl: raw event search or accelerated data model search
+MODES = ("search", "tstats")
+
+
+def index_by_id(items):
+    """Build an id->object lookup for fast access."""
+    return {item.get("id"): item for item in items if item.get("id")}
+
+
+def normalize_spl_part(spl):
+    return " ".join(spl.split()) if spl else ""
+
+
+def is_generating_spl(spl):
+    return normalize_spl_part(spl).startswith("|")
+
+
+def is_wrapped(spl):
+    return spl.startswith("(") and spl.endswith(")")
+
+
+def is_negated(spl):
+    return bool(re.match(r"^NOT\b", normalize_spl_part(spl), flags=re.IGNORECASE))
+
+
+def wrap_spl(spl):
+    trimmed = normalize_spl_part(spl)
+    if not trimmed:
+        return ""
+    return trimmed if is_wrapped(trimmed) else f"({trimmed})"
+
+
+def wrap_if_or(spl):
+    trimmed = normalize_spl_part(spl)
+    if not trimmed:
+        return ""
+    if is_negated(trimmed):
+        remainder = re.sub(r"^NOT\b\s*", "", trimmed, flags=re.IGNORECASE)
+        if not remainder:
+            return trimmed
+        if re.search(r"\bOR\b", remainder, flags=re.IGNORECASE) and not is_wrapped(remainder):
+            return f"NOT {wrap_spl(remainder)}"
+        return trimmed
+    return wrap_spl(trimmed) if re.search(r"\bOR\b", trimmed, flags=re.IGNORECASE) else trimmed
+
+
+def build_catalog(mappings):
+    """Index a get_all_mappings() result by id for composition lookups."""
+    patterns_by_id = index_by_id(mappings.get("patterns", []))
+    field_values_by_id = index_by_id(mappings.get("fieldValues", []))
+    return {
+        "dataSources": index_by_id(mappings.get("dataSources", [])),
+        "filters": {**patterns_by_id, **field_values_by_id},
+        "outputShapes": index_by_id(mappings.get("outputShapes", [])),
+        "timeRangePresets": index_by_id(mappings.get("timeRangePresets", []))
+    }
+
+
+def compose_spl(data, catalog):
+    """
+    Compose SPL for a prompt builder selection.
+    data["optimize"] runs the optimizer pass; data["mode"] == "tstats" targets a CIM data model.
+    """
+    data_sources_by_id = catalog["dataSources"]
+    filter_objects_by_id = catalog["filters"]
+    output_shapes_by_id = catalog["outputShapes"]
+    time_presets_by_id = catalog["timeRangePresets"]
+
+    # Extract selections from request
+    data_sources = data.get("dataSources", [])
+    includes = data.get("includes", [])  # Patterns and field values to include
+    excludes = data.get("excludes", [])  # Patterns and field values to exclude
+    time_range = data.get("timeRange", "")
+    output_shape = data.get("outputShape", None)
+    output_field = data.get("outputField", "")
+
+    filter_parts = []
+    explanation_parts = []
+    base_search = ""
+
+    # Build data sources (OR together)
+    data_source_entries = []
+    generating_sources = []
+    event_sources = []
+    if data_sources:
+        for ds_id in data_sources:
+            ds = data_sources_by_id.get(ds_id)
+            if ds:
+                spl = normalize_spl_part(ds.get("spl", ""))
+                if spl:
+                    data_source_entries.append({
+                        "name": ds.get("name"),
+                        "spl": spl
+                    })
+
+        generating_sources = [e for e in data_source_entries if is_generating_spl(e["spl"])]
+        event_sources = [e for e in data_source_entries if not is_generating_spl(e["spl"])]
+
+        if generating_sources:
+            base_search = generating_sources[0]["spl"]
+            explanation_parts.append(f"Search in: {generating_sources[0]['name']}")
+        elif event_sources:
+            ds_names = [e["name"] for e in event_sources if e["name"]]
+            ds_spls = [e["spl"] for e in event_sources]
+            or_group = " OR ".join(ds_spls)
+            base_search = or_group if len(ds_spls) > 1 else ds_spls[0]
+            if ds_names:
+                explanation_parts.append(f"Search in: {', '.join(ds_names)}")
+
+    # Build includes (AND together)
+    if includes:
+        include_spls = []
+        include_names = []
+        for inc_id in includes:
+            obj = filter_objects_by_id.get(inc_id)
+            if obj:
+                normalized = normalize_spl_part(obj.get("spl", ""))
+                if not normalized:
+                    continue
+                include_spls.append(wrap_if_or(normalized))
+                include_names.append(obj.get("name"))
+        if include_spls:
+            filter_parts.extend(include_spls)
+            explanation_parts.append(f"Filter for: {', '.join(include_names)}")
+
+    # Build excludes (NOT each)
+    if excludes:
+        exclude_spls = []
+        exclude_names = []
+        for exc_id in excludes:
+            obj = filter_objects_by_id.get(exc_id)
+            if obj:
+                normalized = normalize_spl_part(obj.get("spl", ""))
+                if not normalized:
+                    continue
+                if is_negated(normalized):
+                    exclude_spls.append(wrap_if_or(normalized))
+                else:
+                    exclude_spls.append(f"NOT {wrap_spl(normalized)}")
+                exclude_names.append(obj.get("name"))
+        if exclude_spls:
+            filter_parts.extend(exclude_spls)
+            explanation_parts.append(f"Excluding: {', '.join(exclude_names)}")
+
+    # Add time range
+    time_spl = ""
+    if time_range:
+        # Check if it's a preset ID
+        preset = time_presets_by_id.get(time_range)
+        if preset:
+            time_spl = normalize_spl_part(preset.get("spl", ""))
+            explanation_parts.append(f"Time range: {preset.get('name')}")
+        else:
+            # Assume it's custom SPL
+            time_spl = normalize_spl_part(time_range)
+            explanation_parts.append(f"Time range: {time_range}")
+
+    # Build base search
+    if not base_search and not filter_parts:
+        base_search = "*"
+
+    if base_search and not is_generating_spl(base_search):
+        if len(event_sources) > 1 and (filter_parts or time_spl):
+            base_search = wrap_spl(base_search)
+        combined = [base_search]
+        if time_spl:
+            combined.append(time_spl)
+        combined.extend(filter_parts)
+        base_search = " ".join([c for c in combined if c])
+    elif base_search:
+        if time_spl:
+            base_search = f"{base_search} {time_spl}"
+        if filter_parts:
+            base_search = f"{base_search} | search {' '.join(filter_parts)}"
+    else:
+        combined = []
+        if filter_parts:
+            combined.append(" ".join(filter_parts))
+        if time_spl:
+            combined.append(time_spl)
+        base_search = " ".join([c for c in combined if c]) or "*"
+
+    # Add output shape
+    output_spl = ""
+    os_obj = None
+    if output_shape:
+        os_obj = output_shapes_by_id.get(output_shape)
+        if os_obj:
+            output_spl = os_obj.get("spl", "")
+            # Replace field placeholder if needed
+            if os_obj.get("requiresField") and output_field:
+                output_spl = output_spl.replace(os_obj.get("fieldPlaceholder", "{field}"), output_field)
+                output_spl = output_spl.replace("{field1}", output_field)
+                output_spl = output_spl.replace("{field2}", output_field)
+            explanation_parts.append(f"Output: {os_obj.get('name')}")
+
+    # Combine everything
+    full_spl = base_search
+    if output_spl:
+        full_spl = f"{base_search} {output_spl}"
+
+    result = {
+        "spl": full_spl,
+        "explanation": " | ".join(explanation_parts) if explanation_parts else "Search all events",
+        "components": {
+            "baseSearch": base_search,
+            "outputShape": output_spl
+        }
+    }
+
+    if data.get("mode") == "tstats":
+        tstats = spl_tstats.compose_tstats(
+            [data_sources_by_id[i] for i in data_sources if i in data_sources_by_id],
+            [filter_objects_by_id[i] for i in includes if i in filter_objects_by_id],
+            [filter_objects_by_id[i] for i in excludes if i in filter_objects_by_id],
+            time_spl,
+            output_spl,
+            os_obj.get("name") if os_obj else None
+        )
+        result["tstats"] = tstats
+        if tstats["applied"]:
+            result["spl"] = tstats.pop("spl")
+            result["mode"] = "tstats"
+            result["explanation"] += f" | Accelerated: {tstats['dataModel']} data model"
+            return result
+        result["mode"] = "search"
+
+    if data.get("optimize"):
+        optimized_base, changes = spl_optimizer.optimize_base_search(
+            event_sources=[e["spl"] for e in event_sources] if not generating_sources else [],
+            generating_source=generating_sources[0]["spl"] if generating_sources else "",
+            time_spl=time_spl,
+            filter_parts=filter_parts
+        )
+        if optimized_base is None:
+            optimized_base = base_search
+        optimized_spl = f"{optimized_base} {output_spl}" if output_spl else optimized_base
+        result["optimization"] = spl_optimizer.describe(full_spl, optimized_spl, changes)
+        result["spl"] = optimized_spl
+        result["components"]["baseSearch"] = optimized_base
+
+    return result
@@ -0,0 +1,463 @@
+"""
+Cost-aware rewrites for composed SPL.
+Moves indexed fields and time bounds to the front, folds same-field OR chains into IN,
+drops duplicate terms and filters before the first pipe where the result is unchanged.
+"""
+
+import difflib
+import re
+from collections import namedtuple
+
+import spl_analyzer
+
+Term = namedtuple("Term", "text")
+Compare = namedtuple("Compare", "field op value")
+In = namedtuple("In", "field values")
+Not = namedtuple("Not", "child")
+And = namedtuple("And", "children")
+Or = namedtuple("Or", "children")
+
+# Fields resolved from index metadata before any event is read
+INDEXED_FIELDS = {"index", "sourcetype", "source", "host", "splunk_server"}
+
+# Commands a search filter can move ahead of when it references none of their output fields
+PASSTHROUGH_COMMANDS = {"search", "where"}
+
+# Commands a search filter can move ahead of when it only references their group-by fields
+GROUPING_COMMANDS = {"stats", "eventstats"}
+
+REX_GROUP_PATTERN = re.compile(r"\(\?P?<([A-Za-z_][A-Za-z0-9_]*)>")
+
+# TERM() and CASE() operands match case-sensitively, so they are never case-folded
+CASE_SENSITIVE_PATTERN = re.compile(r"^(TERM|CASE)\(.*\)$", re.IGNORECASE | re.DOTALL)
+
+
+# ============================================
+# Parsing
+# ============================================
+
+class _Parser:
+    """Recursive descent over search terms: NOT binds tightest, then OR, then implicit AND."""
+
+    def __init__(self, spl):
+        self.spl = spl
+        self.tokens = spl_analyzer.tokenize(spl)
+        self.pos = 0
+        for token in self.tokens:
+            if token.kind in ("pipe", "lbracket", "rbracket"):
+                raise ValueError(f"Unsupported token {token.value!r}")
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("Unexpected end of search")
+        self.pos += 1
+        return token
+
+    def is_keyword(self, token, keyword):
+        return token is not None and token.kind == "word" and token.value == keyword
+
+    def parse(self):
+        node = self.parse_and()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected {self.peek().value!r}")
+        return node
+
+    def parse_and(self):
+        children = []
+        while self.peek() is not None and self.peek().kind != "rparen":
+            if self.is_keyword(self.peek(), "AND"):
+                self.take()
+                continue
+            children.append(self.parse_or())
+        if not children:
+            raise ValueError("Empty search expression")
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def parse_or(self):
+        children = [self.parse_not()]
+        while self.is_keyword(self.peek(), "OR"):
+            self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def parse_not(self):
+        if self.is_keyword(self.peek(), "NOT"):
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.take()
+        if token.kind == "lparen":
+            node = self.parse_and()
+            if self.take().kind != "rparen":
+                raise ValueError("Unbalanced parentheses")
+            return node
+        if token.kind not in ("word", "string") or token.value in ("AND", "OR", "NOT"):
+            raise ValueError(f"Unexpected {token.value!r}")
+
+        following = self.peek()
+        if token.kind == "word" and following is not None:
+            after = self.peek(1)
+            if following.kind == "word" and following.value.upper() == "IN" and after and after.kind == "lparen":
+                self.pos += 2
+                return In(token.value, self.parse_values())
+            if following.kind == "lparen" and following.start == token.end:
+                return Term(self.spl[token.start:self.skip_group().end])
+            if following.kind == "op" and following.value != ",":
+                self.take()
+                value = self.take()
+                if value.kind not in ("word", "string"):
+                    raise ValueError(f"Missing value for {token.value}")
+                return Compare(token.value, following.value, value.value)
+        return Term(token.value)
+
+    def parse_values(self):
+        values = []
+        while True:
+            token = self.take()
+            if token.kind == "rparen":
+                break
+            if token.kind == "op" and token.value == ",":
+                continue
+            if token.kind not in ("word", "string"):
+                raise ValueError(f"Unexpected {token.value!r} in IN list")
+            values.append(token.value)
+        if not values:
+            raise ValueError("Empty IN list")
+        return tuple(values)
+
+    def skip_group(self):
+        """Consume a balanced ( ... ) group such as TERM(...) and return its closing token."""
+        depth = 0
+        while True:
+            token = self.take()
+            if token.kind == "lparen":
+                depth += 1
+            elif token.kind == "rparen":
+                depth -= 1
+                if depth == 0:
+                    return token
+
+
+def parse_search(spl):
+    """Parse a pipe-free search expression; raises ValueError for anything else."""
+    return _Parser(spl).parse()
+
+
+# ============================================
+# Rendering and Keys
+# ============================================
+
+def render(node, nested=False):
+    if isinstance(node, Term):
+        return node.text
+    if isinstance(node, Compare):
+        return f"{node.field}{node.op}{node.value}"
+    if isinstance(node, In):
+        return f"{node.field} IN ({', '.join(node.values)})"
+    if isinstance(node, Not):
+        inner = render(node.child)
+        return f"NOT ({inner})" if isinstance(node.child, And) else f"NOT {inner}"
+    if isinstance(node, Or):
+        return f"({' OR '.join(render(child, nested=True) for child in node.children)})"
+    text = " ".join(render(child, nested=True) for child in node.children)
+    return f"({text})" if nested else text
+
+
+def _value_key(value):
+    # Search values match case-insensitively and quoting does not change them
+    if CASE_SENSITIVE_PATTERN.match(value):
+        return value
+    return spl_analyzer._unquote(value).lower()
+
+
+def node_key(node):
+    """Identity of a node for duplicate detection; field names stay case-sensitive."""
+    if isinstance(node, Term):
+        return ("term", _value_key(node.text))
+    if isinstance(node, Compare):
+        return ("compare", node.field, node.op, _value_key(node.value))
+    if isinstance(node, In):
+        return ("in", node.field, frozenset(_value_key(value) for value in node.values))
+    if isinstance(node, Not):
+        return ("not", node_key(node.child))
+    return (type(node).__name__.lower(), tuple(node_key(child) for child in node.children))
+
+
+def node_fields(node):
+    """Fields a filter reads; bare terms match against _raw."""
+    if isinstance(node, Term):
+        return {"_raw"}
+    if isinstance(node, (Compare, In)):
+        return {node.field}
+    if isinstance(node, Not):
+        return node_fields(node.child)
+    fields = set()
+    for child in node.children:
+        fields |= node_fields(child)
+    return fields
+
+
+# ============================================
+# Rewrites
+# ============================================
+
+def _dedupe(children, changes):
+    seen = set()
+    kept = []
+    for child in children:
+        key = node_key(child)
+        if key in seen:
+            changes.append(f"Removed duplicate term {render(child)}")
+            continue
+        seen.add(key)
+        kept.append(child)
+    return kept
+
+
+def _fold_in(children, changes):
+    """Merge field=value and field IN (...) operands of one OR into a single IN per field."""
+    groups = {}
+    for child in children:
+        if isinstance(child, In) or (isinstance(child, Compare) and child.op == "="):
+            groups.setdefault(child.field, []).append(child)
+
+    folded = []
+    emitted = set()
+    for child in children:
+        field = child.field if isinstance(child, (Compare, In)) else None
+        members = groups.get(field) if field is not None else None
+        if not members or len(members) < 2 or child not in members:
+            folded.append(child)
+            continue
+        if field in emitted:
+            continue
+        emitted.add(field)
+
+        values = []
+        seen = set()
+        for member in members:
+            for value in (member.values if isinstance(member, In) else (member.value,)):
+                if _value_key(value) in seen:
+                    changes.append(f"Dropped repeated value {value} for {field}")
+                    continue
+                seen.add(_value_key(value))
+                values.append(value)
+        node = In(field, tuple(values)) if len(values) > 1 else Compare(field, "=", values[0])
+        changes.append(f"Folded {len(members)} {field} comparisons into {render(node)}")
+        folded.append(node)
+    return folded
+
+
+def simplify(node, changes):
+    """Flatten nested groups, fold same-field OR chains and drop duplicate operands."""
+    if isinstance(node, Not):
+        return Not(simplify(node.child, changes))
+    if not isinstance(node, (And, Or)):
+        return node
+
+    kind = type(node)
+    children = []
+    for child in node.children:
+        child = simplify(child, changes)
+        if isinstance(child, kind):
+            children.extend(child.children)
+        else:
+            children.append(child)
+
+    if kind is Or:
+        children = _fold_in(children, changes)
+    children = _dedupe(children, changes)
+    return children[0] if len(children) == 1 else kind(tuple(children))
+
+
+def _rank(node):
+    """Order for top-level terms: indexed fields, then time bounds, then everything else."""
+    if isinstance(node, (Compare, In)):
+        if node.field in INDEXED_FIELDS:
+            return 0
+        if node.field in spl_analyzer.TIME_MODIFIERS:
+            return 1
+    if isinstance(node, (And, Or)) and node_fields(node) <= INDEXED_FIELDS:
+        return 0
+    return 2
+
+
+def reorder(node, changes):
+    if not isinstance(node, And):
+        return node
+    ordered = sorted(node.children, key=_rank)
+    if ordered != list(node.children):
+        changes.append("Moved index/sourcetype and time bounds to the front of the search")
+    return And(tuple(ordered))
+
+
+# ============================================
+# Pipeline Handling
+# ============================================
+
+def _command_args(command):
+    return [token for token in command.tokens[1:] if token.kind != "op" or token.value != ","]
+
+
+def _produced_fields(command):
+    """Fields a command creates or overwrites, or None when they cannot be determined."""
+    name = command.name
+    args = _command_args(command)
+    if name == "lookup":
+        keywords = [i for i, token in enumerate(args) if token.value.upper() in ("OUTPUT", "OUTPUTNEW")]
+        if not keywords:
+            return None
+        return {token.value for token in args[keywords[0] + 1:] if token.value.upper() != "AS"}
+    if name == "eval":
+        return {field.value for field, op, _ in spl_analyzer._field_assignments(command.tokens[1:]) if op.value == "="}
+    if name == "rex":
+        if any(token.value.lower() == "mode" for token in args):
+            return None
+        fields = set()
+        for token in args:
+            if token.kind == "string":
+                fields.update(REX_GROUP_PATTERN.findall(token.value))
+        return fields
+    if name == "rename":
+        return {spl_analyzer._unquote(token.value) for token in args if token.value.upper() != "AS"}
+    return None
+
+
+def _group_by_fields(command):
+    values = [token.value for token in _command_args(command)]
+    lowered = [value.lower() for value in values]
+    if "by" not in lowered:
+        return set()
+    return set(values[lowered.index("by") + 1:])
+
+
+def can_move_before(node, command):
+    """True when filtering with node before command gives the same results as after it."""
+    fields = node_fields(node)
+    if command.name in PASSTHROUGH_COMMANDS:
+        return True
+    if command.name in GROUPING_COMMANDS:
+        return fields <= _group_by_fields(command)
+    produced = _produced_fields(command)
+    return produced is not None and not fields & produced
+
+
+def _split_pipeline(spl):
+    """Split piped SPL into (Command, text) pairs; text omits the leading pipe."""
+    commands = spl_analyzer.split_commands(spl_analyzer.tokenize(spl))
+    return [(command, spl[command.start:command.end]) for command in commands]
+
+
+def _search_node(command, text):
+    """Parse a search command's expression, or None when it is not plain filtering."""
+    if command.name != "search":
+        return None
+    expression = text[len(command.tokens[0].value):] if command.leading_pipe else text
+    try:
+        return parse_search(expression)
+    except ValueError:
+        return None
+
+
+# ============================================
+# Entry Points
+# ============================================
+
+def optimize_base_search(event_sources, generating_source, time_spl, filter_parts):
+    """
+    Rebuild the base search from its composed parts.
+    Returns (spl, changes); unparseable input comes back as None with the reason in changes.
+    """
+    changes = []
+    try:
+        sources = [parse_search(source) for source in event_sources]
+        time_node = parse_search(time_spl) if time_spl else None
+    except ValueError as exc:
+        return None, [f"Skipped optimization: {exc}"]
+
+    if len(sources) > 1 and any(isinstance(source, And) for source in sources):
+        changes.append("Grouped each data source's terms so OR applies between whole sources")
+
+    # Walk the filters in order; each plain filter moves ahead of the piped commands it commutes with
+    hoisted = []
+    pipeline = []
+    for part in filter_parts:
+        if part.startswith("|"):
+            entries = _split_pipeline(part)
+        else:
+            try:
+                node = parse_search(part)
+            except ValueError as exc:
+                return None, [f"Skipped optimization: {exc}"]
+            entries = [(None, node)]
+
+        for command, value in entries:
+            node = value if command is None else _search_node(command, value)
+            if node is None:
+                pipeline.append((command, value))
+                continue
+            blocking = [cmd for cmd, _ in pipeline if cmd is not None and not can_move_before(node, cmd)]
+            if not blocking:
+                passed = [cmd.name for cmd, _ in pipeline if cmd is not None]
+                if passed:
+                    changes.append(f"Moved {render(node)} ahead of | {passed[0]}")
+                hoisted.append(node)
+            elif pipeline and pipeline[-1][0] is None:
+                pipeline[-1] = (None, And((pipeline[-1][1], node)))
+            else:
+                if command is None and pipeline:
+                    changes.append(f"Placed {render(node)} in its own | search after | {pipeline[-1][0].name}")
+                pipeline.append((None, node))
+
+    terms = []
+    if sources:
+        terms.append(sources[0] if len(sources) == 1 else Or(tuple(sources)))
+    if time_node is not None:
+        terms.append(time_node)
+    terms.extend(hoisted)
+
+    segments = []
+    if generating_source:
+        base = " ".join([generating_source, time_spl]) if time_spl else generating_source
+        if hoisted:
+            segments.append("search " + render(simplify(And(tuple(hoisted)), changes)))
+    else:
+        base_node = reorder(simplify(And(tuple(terms)), changes), changes) if terms else Term("*")
+        base = render(base_node)
+
+    for command, value in pipeline:
+        if command is None:
+            segments.append("search " + render(simplify(value, changes)))
+        else:
+            segments.append(value)
+
+    spl = " | ".join([base] + segments)
+    return spl, list(dict.fromkeys(changes))
+
+
+def pipeline_lines(spl):
+    """One line per top-level command, for diffing."""
+    return [
+        ("| " if command.leading_pipe else "") + text
+        for command, text in _split_pipeline(spl)
+    ]
+
+
+def describe(before, after, changes):
+    """Summarize an optimization as the before/after SPL, change notes and a unified diff."""
+    return {
+        "before": before,
+        "after": after,
+        "changed": before != after,
+        "changes": changes,
+        "diff": list(difflib.unified_diff(
+            pipeline_lines(before), pipeline_lines(after), "before", "after", lineterm=""
+        ))
+    }
@@ -0,0 +1,160 @@
+"""
+Content-addressed SPL snippets shared by the query library, glossary and training content.
+Each snippet is canonicalized and hashed so analysis and token metadata are computed once
+per unique SPL; training content stores {"$snippet": hash} references in place of the text.
+"""
+
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+import spl_analyzer
+
+# Content keys whose string values hold SPL
+SPL_KEYS = ("spl", "solution")
+
+# Key of the object that replaces an SPL string in stored training content
+REF_KEY = "$snippet"
+
+HASH_LENGTH = 16
+
+# Analysis results and structural forms depend on the analyzer and checker rules and the
+# reference titles they link to
+ANALYZER_SOURCES = (
+    os.path.join(spl_analyzer.BASE_DIR, "spl_analyzer.py"),
+    os.path.join(spl_analyzer.BASE_DIR, "spl_structure.py"),
+    spl_analyzer.REFERENCES_PATH
+)
+
+# Content locations (relative to the module) holding reference answers learners can check against
+ANSWER_LOCATION_PATTERN = re.compile(
+    r"^(requirements\[\d+\]\.solution"
+    r"|steps\[\d+\]\.(spl|solution)"
+    r"|sections\[\d+\]\.exercises\[\d+\]\.solution"
+    r"|solution(\.spl|\.panels\[\d+\]\.spl)?)$"
+)
+
+
+def canonicalize(spl):
+    """
+    Normalize line endings and trailing whitespace only, so the stored text still reads
+    (and highlights) exactly as authored and analyzer spans stay valid.
+    """
+    lines = (spl or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def snippet_hash(spl):
+    return hashlib.sha256(canonicalize(spl).encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def is_snippet_hash(value):
+    return isinstance(value, str) and len(value) == HASH_LENGTH and all(c in "0123456789abcdef" for c in value)
+
+
+@lru_cache(maxsize=1)
+def analyzer_version():
+    """Fingerprint of the analyzer inputs; cached analyses are recomputed when it changes."""
+    digest = hashlib.sha256()
+    for path in ANALYZER_SOURCES:
+        if os.path.exists(path):
+            with open(path, "rb") as handle:
+                digest.update(handle.read())
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def token_metadata(spl):
+    """Pipeline commands and token counts for one snippet."""
+    tokens = spl_analyzer.tokenize(spl)
+    return {
+        "commands": [command.name for command in spl_analyzer.split_commands(tokens) if command.name],
+        "tokenCount": len(tokens),
+        "subsearchCount": sum(1 for _ in spl_analyzer.iter_subsearches(tokens))
+    }
+
+
+def location_sort_key(location):
+    """Order locations as they appear in content: steps[2] before steps[10]."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", location)]
+
+
+def iter_content_snippets(value, location, keys=SPL_KEYS):
+    """Yield (location, spl) for every SPL string nested in module content."""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            child_location = f"{location}.{key}"
+            if key in keys and isinstance(child, str):
+                yield child_location, child
+            else:
+                yield from iter_content_snippets(child, child_location, keys)
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from iter_content_snippets(child, f"{location}[{index}]", keys)
+
+
+def externalize(value, store, keys=SPL_KEYS):
+    """Copy of content with each SPL string replaced by {REF_KEY: store(spl)}."""
+    if isinstance(value, dict):
+        return {
+            key: {REF_KEY: store(child)} if key in keys and isinstance(child, str) and child.strip()
+            else externalize(child, store, keys)
+            for key, child in value.items()
+        }
+    if isinstance(value, list):
+        return [externalize(child, store, keys) for child in value]
+    return value
+
+
+def is_reference(value):
+    return isinstance(value, dict) and len(value) == 1 and REF_KEY in value
+
+
+def iter_references(value):
+    """Yield every snippet hash referenced in content."""
+    if is_reference(value):
+        yield value[REF_KEY]
+    elif isinstance(value, dict):
+        for child in value.values():
+            yield from iter_references(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from iter_references(child)
+
+
+def resolve(value, snippets):
+    """Copy of content with references replaced by their SPL from snippets (hash -> text)."""
+    if is_reference(value):
+        return snippets.get(value[REF_KEY], value)
+    if isinstance(value, dict):
+        return {key: resolve(child, snippets) for key, child in value.items()}
+    if isinstance(value, list):
+        return [resolve(child, snippets) for child in value]
+    return value
+
+
+def iter_library_snippets(path):
+    """Yield (item_id, location, spl) for the query library in static/data/queries.json."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as handle:
+        library = json.load(handle).get("library", [])
+    for query in library:
+        if query.get("spl"):
+            yield query.get("id"), f"query {query.get('id')}", query["spl"]
+
+
+def iter_glossary_snippets(path):
+    """Yield (entry_id, location, spl) for every example in static/data/glossary.json."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as handle:
+        glossary = json.load(handle)
+    for section, entries in glossary.items():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            entry_id = entry.get("id") or entry.get("name")
+            for location, spl in iter_content_snippets(entry, f"glossary {section}/{entry_id}", ("spl",)):
+                yield entry_id, location, spl
@@ -0,0 +1,378 @@
+"""
+Structural form of SPL for checking learner answers against reference solutions.
+Two searches share a form when they differ only in whitespace, the case of command names and
+clause keywords, quoting and case of search values, optional commas, or the order of AND/OR terms.
+"""
+
+import json
+import re
+from functools import lru_cache
+
+import spl_analyzer
+
+# Clause keywords Splunk accepts in any case
+CLAUSE_KEYWORDS = {"by", "as", "over", "output", "outputnew"}
+
+COMMAND_ALIASES = {"bucket": "bin"}
+
+# Commands whose top-level field lists may be separated by commas or spaces
+COMMA_OPTIONAL = {
+    "table", "fields", "dedup", "sort", "top", "rare", "stats", "eventstats", "streamstats",
+    "chart", "timechart", "rename", "values", "transaction"
+}
+
+# Commands whose key=value options may come in any order
+OPTION_COMMANDS = {
+    "stats", "eventstats", "streamstats", "chart", "timechart", "top", "rare", "dedup",
+    "transaction", "bin", "tstats", "fillnull", "head", "tail"
+}
+
+# Boolean expressions whose operands can be reordered; search terms are also case-insensitive
+BOOLEAN_COMMANDS = {"search", "where"}
+
+COMPARISON_OPS = {"=", "==", "!=", "<", ">", "<=", ">="}
+
+# Commands taking eval expressions, where "a+b" and "a + b" are the same
+EXPRESSION_COMMANDS = {"eval", "where", "fieldformat"}
+ARITHMETIC_PATTERN = re.compile(r"([+*/%])")
+
+# Stages compared per request are cached, so a class submitting the same answers parses once
+CACHE_SIZE = 4096
+
+
+class _Unstructured(Exception):
+    """The expression is not a plain boolean combination of comparisons; compare it as tokens."""
+
+
+def _is_keyword(token, word, search_mode):
+    if token.kind != "word":
+        return False
+    # Search only treats upper-case AND/OR/NOT as operators; where accepts any case
+    return token.value == word if search_mode else token.value.upper() == word
+
+
+def _matching(tokens, index, open_kind, close_kind):
+    """Index of the token closing the bracket at tokens[index]."""
+    depth = 0
+    for position in range(index, len(tokens)):
+        if tokens[position].kind == open_kind:
+            depth += 1
+        elif tokens[position].kind == close_kind:
+            depth -= 1
+            if depth == 0:
+                return position
+    return len(tokens)
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _subsearch(tokens, index):
+    end = _matching(tokens, index, "lbracket", "rbracket")
+    return "[" + " | ".join(_stages(tokens[index + 1:end])) + "]", end + 1
+
+
+def _operand(tokens, index, search_mode, lower=True):
+    """One value, quoted string, function call or subsearch, as (text, next index)."""
+    token = tokens[index]
+    if token.kind == "lbracket":
+        return _subsearch(tokens, index)
+    if token.kind == "word" and index + 1 < len(tokens) and tokens[index + 1].kind == "lparen" \
+            and tokens[index + 1].start == token.end:
+        end = _matching(tokens, index + 1, "lparen", "rparen")
+        return token.value + "(" + " ".join(_plain(tokens[index + 2:end])) + ")", end + 1
+    if token.kind in ("word", "string"):
+        if search_mode:
+            value = _unquote(token.value)
+            return (value.lower() if lower else value), index + 1
+        return token.value, index + 1
+    raise _Unstructured()
+
+
+def _term(tokens, index, search_mode):
+    start = index
+    # Field names are case-sensitive; search values and bare terms are not
+    left, index = _operand(tokens, index, search_mode, lower=False)
+    if search_mode and index == start + 1 and tokens[start].kind in ("word", "string") and not (
+        index < len(tokens) and tokens[index].kind == "op" and tokens[index].value in COMPARISON_OPS
+    ):
+        left = left.lower()
+    if index < len(tokens) and tokens[index].kind == "op" and tokens[index].value in COMPARISON_OPS:
+        op = tokens[index].value
+        right, index = _operand(tokens, index + 1, search_mode)
+        return f"{left}{op}{right}", index
+    if index < len(tokens) and _is_keyword(tokens[index], "IN", search_mode) \
+            and index + 1 < len(tokens) and tokens[index + 1].kind == "lparen":
+        end = _matching(tokens, index + 1, "lparen", "rparen")
+        values = sorted({
+            _unquote(token.value).lower() if search_mode else token.value
+            for token in tokens[index + 2:end] if token.kind != "op"
+        })
+        return f"{left} IN ({','.join(values)})", end + 1
+    if not search_mode and index < len(tokens) and not (
+        _is_keyword(tokens[index], "AND", False) or _is_keyword(tokens[index], "OR", False)
+        or tokens[index].kind == "rparen"
+    ):
+        # e.g. arithmetic: operand order may matter, so keep the whole expression as written
+        raise _Unstructured()
+    return left, index
+
+
+def _combine(op, children):
+    flattened = []
+    for child in children:
+        if isinstance(child, list) and child[0] == op:
+            flattened.extend(child[1:])
+        else:
+            flattened.append(child)
+    unique = {json.dumps(child): child for child in flattened}
+    if len(unique) == 1:
+        return next(iter(unique.values()))
+    return [op] + [unique[key] for key in sorted(unique)]
+
+
+def _parse_expression(tokens, index, search_mode):
+    """
+    Splunk's search binds OR tighter than AND, as spl_optimizer parses it; where uses AND over OR.
+
+    >>> structure("index=web status=500 OR status=404 host=a") == structure("host=a index=web status=404 OR status=500")
+    True
+    >>> structure("index=web status=500 OR status=404 host=a") == structure("status=404 host=a OR index=web status=500")
+    False
+    >>> structure("| where a=1 AND b=2 OR c=3") == structure("| where c=3 OR b=2 AND a=1")
+    True
+    >>> structure("| where a=1 AND b=2 OR c=3") == structure("| where a=1 AND (b=2 OR c=3)")
+    False
+    """
+    if search_mode:
+        return _parse_search_and(tokens, index)
+    return _parse_where_or(tokens, index)
+
+
+def _parse_search_and(tokens, index):
+    children = []
+    while index < len(tokens):
+        token = tokens[index]
+        if token.kind == "rparen":
+            break
+        if _is_keyword(token, "AND", True):
+            index += 1
+            continue
+        if _is_keyword(token, "OR", True):
+            # A dangling OR has nothing to join; keep it as a term
+            children.append("OR")
+            index += 1
+            continue
+        child, index = _parse_search_or(tokens, index)
+        children.append(child)
+    return _combine("AND", children) if children else "", index
+
+
+def _parse_search_or(tokens, index):
+    children = []
+    child, index = _parse_not(tokens, index, True)
+    children.append(child)
+    while index + 1 < len(tokens) and _is_keyword(tokens[index], "OR", True) \
+            and tokens[index + 1].kind != "rparen" and not _is_keyword(tokens[index + 1], "OR", True):
+        child, index = _parse_not(tokens, index + 1, True)
+        children.append(child)
+    return _combine("OR", children), index
+
+
+def _parse_where_or(tokens, index):
+    children = []
+    child, index = _parse_where_and(tokens, index)
+    children.append(child)
+    while index < len(tokens) and _is_keyword(tokens[index], "OR", False):
+        child, index = _parse_where_and(tokens, index + 1)
+        children.append(child)
+    return _combine("OR", children), index
+
+
+def _parse_where_and(tokens, index):
+    children = []
+    while index < len(tokens):
+        token = tokens[index]
+        if token.kind == "rparen" or _is_keyword(token, "OR", False):
+            break
+        if _is_keyword(token, "AND", False):
+            index += 1
+            continue
+        child, index = _parse_not(tokens, index, False)
+        children.append(child)
+    return _combine("AND", children) if children else "", index
+
+
+def _parse_not(tokens, index, search_mode):
+    token = tokens[index]
+    if _is_keyword(token, "NOT", search_mode):
+        if index + 1 >= len(tokens):
+            return "NOT", index + 1
+        child, index = _parse_not(tokens, index + 1, search_mode)
+        return ["NOT", child], index
+    if token.kind == "lparen":
+        child, index = _parse_expression(tokens, index + 1, search_mode)
+        if index < len(tokens) and tokens[index].kind == "rparen":
+            index += 1
+        return child, index
+    return _term(tokens, index, search_mode)
+
+
+def _boolean(tokens, search_mode):
+    """Canonical tree of a search or where expression; stray closing parens are kept as terms."""
+    parts = []
+    index = 0
+    while index < len(tokens):
+        tree, index = _parse_expression(tokens, index, search_mode)
+        if tree != "":
+            parts.append(tree)
+        if index < len(tokens):
+            parts.append(tokens[index].value)
+            index += 1
+    return json.dumps(_combine("AND", parts) if parts else "", separators=(",", ":"))
+
+
+def _plain(tokens):
+    """Tokens as written, with subsearches canonicalized and clause keywords upper-cased."""
+    result = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.kind == "lbracket":
+            text, index = _subsearch(tokens, index)
+            result.append(text)
+            continue
+        if token.kind == "word" and token.value.lower() in CLAUSE_KEYWORDS:
+            result.append(token.value.upper())
+        else:
+            result.append(token.value)
+        index += 1
+    return result
+
+
+def _command_arguments(name, tokens):
+    if name in COMMA_OPTIONAL:
+        depth = 0
+        kept = []
+        for token in tokens:
+            if token.kind in ("lparen", "lbracket"):
+                depth += 1
+            elif token.kind in ("rparen", "rbracket"):
+                depth -= 1
+            if depth == 0 and token.kind == "op" and token.value == ",":
+                continue
+            kept.append(token)
+        tokens = kept
+
+    words = _plain(tokens)
+    if name == "sort":
+        # "sort - count" and "sort -count" are the same
+        merged = []
+        for word in words:
+            if merged and merged[-1] in ("-", "+"):
+                merged[-1] += word
+            else:
+                merged.append(word)
+        words = merged
+
+    if name in OPTION_COMMANDS:
+        options = []
+        rest = []
+        depth = 0
+        index = 0
+        while index < len(words):
+            word = words[index]
+            if depth == 0 and index + 2 < len(words) and words[index + 1] == "=" and word.lower() not in CLAUSE_KEYWORDS:
+                options.append(f"{word}={words[index + 2]}")
+                index += 3
+                continue
+            if word == "(":
+                depth += 1
+            elif word == ")":
+                depth -= 1
+            rest.append(word)
+            index += 1
+        words = sorted(options) + rest
+    return words
+
+
+def _split_arithmetic(tokens):
+    """Split words like a+b*2 so spacing around arithmetic operators does not matter."""
+    result = []
+    for token in tokens:
+        if token.kind != "word" or not ARITHMETIC_PATTERN.search(token.value) or len(token.value) == 1:
+            result.append(token)
+            continue
+        offset = token.start
+        for part in ARITHMETIC_PATTERN.split(token.value):
+            if part:
+                result.append(spl_analyzer.Token("word", part, offset, offset + len(part)))
+                offset += len(part)
+    return result
+
+
+def _stage(command, first):
+    tokens = command.tokens
+    name = COMMAND_ALIASES.get(command.name, command.name)
+    if first and not command.leading_pipe:
+        # The implicit leading search, which may also be written out
+        if tokens and tokens[0].kind == "word" and tokens[0].value.lower() == "search":
+            tokens = tokens[1:]
+    else:
+        tokens = tokens[1:]
+
+    if name in EXPRESSION_COMMANDS:
+        tokens = _split_arithmetic(tokens)
+    if name in BOOLEAN_COMMANDS:
+        try:
+            return f"{name} {_boolean(tokens, name == 'search')}"
+        except _Unstructured:
+            pass
+    return " ".join([name] + _command_arguments(name, tokens))
+
+
+def _stages(tokens):
+    commands = spl_analyzer.split_commands(tokens)
+    return [_stage(command, index == 0) for index, command in enumerate(commands)]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def structure(spl):
+    """Canonical form of each pipeline stage of spl, as a tuple of strings."""
+    return tuple(_stages(spl_analyzer.tokenize(spl)))
+
+
+def compare(submitted, expected):
+    """How far two structures agree: the leading stages that match and the command expected next."""
+    matched = 0
+    for left, right in zip(submitted, expected):
+        if left != right:
+            break
+        matched += 1
+    correct = tuple(submitted) == tuple(expected)
+    return {
+        "correct": correct,
+        "matchedStages": matched,
+        "expectedStages": len(expected),
+        "submittedStages": len(submitted),
+        "expectedCommand": None if correct or matched >= len(expected) else expected[matched].split(" ", 1)[0]
+    }
+
+
+def check(spl, answers):
+    """
+    Compare spl with (location, structure) reference answers. Returns the first exact match,
+    or the answer sharing the most leading stages with the submission.
+    """
+    submitted = structure(spl)
+    closest = None
+    for location, expected in answers:
+        result = {"location": location, **compare(submitted, expected)}
+        if result["correct"]:
+            return {"correct": True, "match": result}
+        if closest is None or result["matchedStages"] > closest["matchedStages"]:
+            closest = result
+    return {"correct": False, "closest": closest}
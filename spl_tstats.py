@@ -0,0 +1,338 @@
+"""
+Accelerated data model output for the prompt builder.
+Rewrites a composition into | tstats against a CIM data model when every part maps onto its fields.
+"""
+
+import re
+
+import spl_analyzer
+import spl_optimizer
+from spl_optimizer import And, Compare, In, Not, Or, Term
+
+# CIM data models keyed by the data source tag that selects them
+CIM_DATA_MODELS = {
+    "authentication": {
+        "name": "Authentication",
+        "from": "Authentication",
+        "prefix": "Authentication",
+        "reference": "cim_authentication",
+        "fields": {
+            "action", "app", "authentication_method", "dest", "dest_bunit", "dest_category",
+            "dest_nt_domain", "dest_priority", "duration", "reason", "response_time", "signature",
+            "signature_id", "src", "src_bunit", "src_category", "src_nt_domain", "src_priority",
+            "src_user", "src_user_bunit", "src_user_category", "src_user_priority", "tag", "user",
+            "user_bunit", "user_category", "user_priority", "vendor_account"
+        }
+    },
+    "endpoint": {
+        "name": "Endpoint",
+        "from": "Endpoint.Processes",
+        "prefix": "Processes",
+        "reference": "cim_endpoint",
+        "fields": {
+            "action", "dest", "original_file_name", "os", "parent_process", "parent_process_exec",
+            "parent_process_guid", "parent_process_id", "parent_process_name", "parent_process_path",
+            "process", "process_current_directory", "process_exec", "process_guid", "process_hash",
+            "process_id", "process_integrity_level", "process_name", "process_path", "user",
+            "user_id", "vendor_product"
+        }
+    },
+    "network": {
+        "name": "Network_Traffic",
+        "from": "Network_Traffic",
+        "prefix": "All_Traffic",
+        "reference": "cim_network",
+        "fields": {
+            "action", "app", "bytes", "bytes_in", "bytes_out", "channel", "dest", "dest_interface",
+            "dest_ip", "dest_mac", "dest_port", "dest_translated_ip", "dest_translated_port",
+            "dest_zone", "direction", "duration", "dvc", "icmp_code", "icmp_type", "packets",
+            "packets_in", "packets_out", "protocol", "protocol_version", "rule", "session_id", "src",
+            "src_interface", "src_ip", "src_mac", "src_port", "src_translated_ip",
+            "src_translated_port", "src_zone", "tcp_flag", "transport", "user", "vlan", "wifi"
+        }
+    },
+    "web": {
+        "name": "Web",
+        "from": "Web",
+        "prefix": "Web",
+        "reference": None,
+        "fields": {
+            "action", "app", "bytes", "bytes_in", "bytes_out", "cached", "category", "cookie",
+            "dest", "dest_port", "duration", "http_content_type", "http_method", "http_referrer",
+            "http_user_agent", "site", "src", "status", "uri_path", "uri_query", "url", "url_domain",
+            "url_length", "user", "vendor_product"
+        }
+    }
+}
+
+# Fields every data model inherits from the indexed event
+INHERITED_FIELDS = {"_time"}
+
+# Statistical functions tstats can compute from a summary
+TSTATS_FUNCTIONS = {
+    "count", "dc", "distinct_count", "sum", "avg", "mean", "min", "max", "range", "median",
+    "mode", "stdev", "var", "values", "earliest", "latest", "first", "last"
+}
+
+DATAMODEL_PATTERN = re.compile(r"\bdatamodel\s*=\s*\"?([\w.]+)", re.IGNORECASE)
+AGGREGATION_PATTERN = re.compile(r"(\w+)\(([^()]*)\)")
+BY_PATTERN = re.compile(r"\s+by\s+", re.IGNORECASE)
+
+
+def _model_for_source(source):
+    """Return (tag, constraint_spl) for a data source, or raise ValueError with the reason."""
+    spl = " ".join((source.get("spl") or "").split())
+    name = source.get("name") or source.get("id")
+    if spl.startswith("|"):
+        match = DATAMODEL_PATTERN.search(spl)
+        if not match:
+            raise ValueError(f"{name} is a generating search without a data model")
+        model_name = match.group(1).split(".")[0]
+        for tag, model in CIM_DATA_MODELS.items():
+            if model["name"] == model_name:
+                return tag, None
+        raise ValueError(f"{name} uses the {model_name} data model, which has no CIM field map here")
+
+    for tag in source.get("tags", []):
+        if tag in CIM_DATA_MODELS:
+            return tag, spl
+    raise ValueError(f"{name} is not tagged with a CIM data model ({', '.join(sorted(CIM_DATA_MODELS))})")
+
+
+def _prefix_node(node, model, reasons, label):
+    """Rename CIM fields to their data model paths, noting any field the model does not have."""
+    prefix = model["prefix"] + "."
+    if isinstance(node, Not):
+        return Not(_prefix_node(node.child, model, reasons, label))
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(_prefix_node(child, model, reasons, label) for child in node.children))
+    if isinstance(node, Term):
+        reasons.append(f"{label} searches free text ({node.text}), which data model summaries do not keep")
+        return node
+
+    field = node.field
+    if field in spl_analyzer.TIME_MODIFIERS or field in spl_optimizer.INDEXED_FIELDS:
+        path = field
+    elif field.startswith(prefix):
+        path = field
+    elif field in model["fields"]:
+        path = prefix + field
+    else:
+        reasons.append(f"{label} uses {field}, which is not a field of the {model['name']} data model")
+        return node
+
+    if isinstance(node, In):
+        return In(path, node.values)
+    return Compare(path, node.op, node.value)
+
+
+def _field_path(field, model, reasons, label):
+    field = field.strip()
+    prefix = model["prefix"] + "."
+    if field in INHERITED_FIELDS or field.startswith(prefix):
+        return field
+    if field in model["fields"]:
+        return prefix + field
+    reasons.append(f"{label} uses {field}, which is not a field of the {model['name']} data model")
+    return field
+
+
+def _split_fields(text):
+    return [field for field in re.split(r"[\s,]+", text.strip()) if field]
+
+
+def _prefix_aggregations(text, model, reasons, label):
+    """Rewrite stats-style aggregations such as dc(user) as users onto data model fields."""
+    words = text.replace(",", " ").split()
+    items = []
+    index = 0
+    while index < len(words):
+        word = words[index]
+        match = AGGREGATION_PATTERN.fullmatch(word)
+        if word.lower() == "count":
+            items.append(word)
+        elif match and match.group(1).lower() in TSTATS_FUNCTIONS:
+            items.append(f"{match.group(1)}({_field_path(match.group(2), model, reasons, label)})")
+        else:
+            reasons.append(f"{label} uses {word}, which tstats cannot compute")
+            items.append(word)
+        index += 1
+        if index + 1 < len(words) and words[index].lower() == "as":
+            items[-1] = f"{items[-1]} as {words[index + 1]}"
+            index += 2
+    return " ".join(items)
+
+
+def _split_output(output_spl, model, reasons, label):
+    """Return (aggregations, by_fields, prestats_command, trailing_spl) for an output shape."""
+    if not output_spl:
+        return "count", [], None, ""
+
+    commands = spl_analyzer.split_commands(spl_analyzer.tokenize(output_spl))
+    first = commands[0]
+    trailing = " ".join("| " + output_spl[command.start:command.end] for command in commands[1:])
+    args = output_spl[first.tokens[1].start:first.end] if len(first.tokens) > 1 else ""
+
+    if first.name == "stats":
+        parts = BY_PATTERN.split(args, maxsplit=1)
+        aggregations = _prefix_aggregations(parts[0], model, reasons, label)
+        by_fields = [_field_path(field, model, reasons, label) for field in _split_fields(parts[1])] if len(parts) > 1 else []
+        return aggregations, by_fields, None, trailing
+
+    if first.name == "timechart":
+        options = [word for word in args.split() if "=" in word and "(" not in word]
+        remainder = " ".join(word for word in args.split() if word not in options)
+        parts = BY_PATTERN.split(remainder, maxsplit=1)
+        aggregations = _prefix_aggregations(parts[0], model, reasons, label)
+        by_fields = [_field_path(field, model, reasons, label) for field in _split_fields(parts[1])] if len(parts) > 1 else []
+        span = next((option for option in options if option.lower().startswith("span=")), None)
+        timechart = " ".join(["timechart"] + options + [aggregations] + (["by"] + by_fields if by_fields else []))
+        by_time = ["_time"] + by_fields + ([span] if span else [])
+        return aggregations, by_time, timechart, trailing
+
+    reasons.append(f"{label} (| {first.name}) needs raw events; tstats only returns aggregates")
+    return "count", [], None, ""
+
+
+def compose_tstats(data_sources, includes, excludes, time_spl, output_spl, output_name):
+    """
+    Build | tstats SPL for a resolved selection.
+    Returns {"applied": True, "spl", "dataModel", ...} or {"applied": False, "reasons": [...]}.
+    """
+    reasons = []
+    if not data_sources:
+        return {"applied": False, "reasons": ["Select a data source tagged with a CIM data model"]}
+
+    tags = []
+    constraints = []
+    for source in data_sources:
+        try:
+            tag, constraint = _model_for_source(source)
+        except ValueError as exc:
+            reasons.append(str(exc))
+            continue
+        tags.append(tag)
+        constraints.append(constraint)
+
+    if reasons:
+        return {"applied": False, "reasons": reasons}
+    if len(set(tags)) > 1:
+        names = ", ".join(dict.fromkeys(CIM_DATA_MODELS[tag]["name"] for tag in tags))
+        return {"applied": False, "reasons": [f"A tstats search reads one data model; the selection spans {names}"]}
+
+    model = CIM_DATA_MODELS[tags[0]]
+    terms = []
+
+    # An unconstrained data model source already covers every index, so only scope when all sources do
+    if all(constraints):
+        scoped = []
+        for source, constraint in zip(data_sources, constraints):
+            label = source.get("name") or source.get("id")
+            try:
+                node = spl_optimizer.parse_search(constraint)
+            except ValueError as exc:
+                reasons.append(f"{label} could not be parsed: {exc}")
+                continue
+            if not spl_optimizer.node_fields(node) <= spl_optimizer.INDEXED_FIELDS:
+                reasons.append(f"{label} filters on event fields that a data model summary does not keep")
+                continue
+            scoped.append(node)
+        if scoped:
+            terms.append(scoped[0] if len(scoped) == 1 else Or(tuple(scoped)))
+
+    if time_spl:
+        try:
+            time_node = spl_optimizer.parse_search(time_spl)
+        except ValueError as exc:
+            time_node = None
+            reasons.append(f"Time range could not be parsed: {exc}")
+        if time_node is not None:
+            if spl_optimizer.node_fields(time_node) <= spl_analyzer.TIME_MODIFIERS:
+                terms.append(time_node)
+            else:
+                reasons.append(f"Time range {time_spl} is not a plain earliest/latest range")
+
+    by_fields = []
+    for negate, objects in ((False, includes), (True, excludes)):
+        for obj in objects:
+            label = obj.get("name") or obj.get("id")
+            spl = " ".join((obj.get("spl") or "").split())
+            if spl.startswith("|"):
+                reasons.append(f"{label} runs a pipeline command that tstats cannot include")
+                continue
+            # Patterns written for tstats carry their own where/by clause
+            if spl.lower().startswith("where "):
+                if negate:
+                    reasons.append(f"{label} is a tstats where clause and cannot be excluded")
+                    continue
+                parts = BY_PATTERN.split(spl[len("where "):], maxsplit=1)
+                spl = parts[0]
+                if len(parts) > 1:
+                    by_fields.extend(_field_path(field, model, reasons, label) for field in _split_fields(parts[1]))
+            try:
+                node = spl_optimizer.parse_search(spl)
+            except ValueError as exc:
+                reasons.append(f"{label} could not be parsed: {exc}")
+                continue
+            node = _prefix_node(node, model, reasons, label)
+            terms.append(Not(node) if negate else node)
+
+    aggregations, output_by, timechart, trailing = _split_output(output_spl, model, reasons, output_name or "Output shape")
+    if reasons:
+        return {"applied": False, "reasons": list(dict.fromkeys(reasons))}
+
+    by_fields = list(dict.fromkeys(by_fields + output_by))
+    changes = []
+    where = ""
+    if terms:
+        where_node = spl_optimizer.reorder(spl_optimizer.simplify(And(tuple(terms)), changes), changes)
+        where = spl_optimizer.render(_expand_in(where_node))
+
+    parts = ["| tstats"]
+    if timechart:
+        parts.append("prestats=true")
+    parts.extend([aggregations, "from", f"datamodel={model['from']}"])
+    if where:
+        parts.extend(["where", where])
+    if by_fields:
+        span = [field for field in by_fields if field.lower().startswith("span=")]
+        fields = [field for field in by_fields if field not in span]
+        parts.extend(["by", ", ".join(fields)] + span)
+    spl = " ".join(parts)
+
+    if timechart:
+        spl = f"{spl} | {timechart}"
+    elif by_fields:
+        spl = f"{spl} | rename {model['prefix']}.* as *"
+    if trailing:
+        spl = f"{spl} {trailing}"
+
+    return {
+        "applied": True,
+        "spl": spl,
+        "dataModel": model["name"],
+        "reference": _cim_reference(model)
+    }
+
+
+def _expand_in(node):
+    """simplify() folds OR chains into IN; the tstats where clause keeps them as OR."""
+    if isinstance(node, In):
+        return Or(tuple(Compare(node.field, "=", value) for value in node.values))
+    if isinstance(node, Not):
+        return Not(_expand_in(node.child))
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(_expand_in(child) for child in node.children))
+    return node
+
+
+def _cim_reference(model):
+    if not model["reference"]:
+        return None
+    titles = spl_analyzer._load_reference_titles()
+    _, title = titles.get(model["reference"], ("cim", model["name"]))
+    return {
+        "id": model["reference"],
+        "title": title,
+        "url": f"/references?tab=cim&open={model['reference']}"
+    }
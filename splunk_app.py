@@ -0,0 +1,299 @@
+"""
+Splunk app export for the query library and prompt builder mappings.
+Streams a tar.gz app package (savedsearches.conf, macros.conf, lookup stubs) from generators,
+so memory use stays flat no matter how many searches are exported.
+"""
+
+import json
+import os
+import re
+import tarfile
+import tempfile
+import time
+import zlib
+
+import spl_composer
+import storage
+
+QUERIES_PATH = os.path.join(storage.BASE_DIR, "static", "data", "queries.json")
+
+APP_NAME = "splunked_detections"
+APP_LABEL = "SPLUNKed Detections"
+APP_VERSION = "1.0.0"
+
+# Prefix for generated saved search names and macro stanzas
+SEARCH_PREFIX = "SPLUNKed"
+MACRO_PREFIX = "splunked"
+
+# Rendered conf files stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_BYTES = 1024 * 1024
+CHUNK_BYTES = 64 * 1024
+
+DEFAULT_EARLIEST = "-24h@h"
+DEFAULT_LATEST = "now"
+
+LOOKUP_PATTERN = re.compile(
+    r"(?:^|\|)\s*(?:input|output)?lookup\s+(?:\w+=\S+\s+)*([A-Za-z0-9_.\-]+)([^|]*)",
+    flags=re.IGNORECASE
+)
+STANZA_UNSAFE = re.compile(r"[\[\]\r\n]+")
+
+
+def load_queries(path=QUERIES_PATH):
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle).get("library", [])
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def query_matches(query, categories=None, techniques=None, tags=None):
+    """Any of categories, any of techniques (sub-techniques included), and every tag."""
+    if categories and (query.get("category") or "").lower() not in {c.lower() for c in categories}:
+        return False
+    if techniques:
+        query_techniques = [t.upper() for t in _as_list(query.get("mitre"))]
+        wanted = [t.upper() for t in techniques]
+        if not any(qt == t or qt.startswith(t + ".") for qt in query_techniques for t in wanted):
+            return False
+    if tags:
+        query_tags = {t.lower() for t in query.get("tags", [])}
+        if not all(t.lower() in query_tags for t in tags):
+            return False
+    return True
+
+
+def iter_queries(queries, categories=None, techniques=None, tags=None):
+    for query in queries:
+        if query.get("spl") and query_matches(query, categories, techniques, tags):
+            yield query
+
+
+def iter_compositions(compositions, catalog):
+    """Compose prompt builder selections into saved search entries."""
+    for index, composition in enumerate(compositions, start=1):
+        result = spl_composer.compose_spl(composition, catalog)
+        yield {
+            "id": composition.get("id") or f"composition-{index}",
+            "title": composition.get("name") or composition.get("title") or f"Composition {index}",
+            "description": composition.get("description") or result["explanation"],
+            "spl": result["spl"],
+            "tags": composition.get("tags", [])
+        }
+
+
+def _stanza_name(name):
+    return STANZA_UNSAFE.sub(" ", name).strip()
+
+
+def _conf_value(value):
+    """Render a possibly multi-line value with .conf line continuations."""
+    lines = [line.rstrip() for line in str(value).strip().splitlines()] or [""]
+    return " \\\n".join(lines)
+
+
+def _conf_stanza(name, settings, comments=()):
+    lines = [f"# {comment}" for comment in comments if comment]
+    lines.append(f"[{_stanza_name(name)}]")
+    for key, value in settings:
+        if value is not None:
+            lines.append(f"{key} = {_conf_value(value)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def lookup_references(spl):
+    """Yield (lookup_name, fields) for each lookup/inputlookup/outputlookup in the SPL."""
+    for match in LOOKUP_PATTERN.finditer(spl or ""):
+        name, rest = match.group(1), match.group(2)
+        fields = []
+        skip_next = False
+        for token in re.split(r"[\s,]+", rest.strip()):
+            if not token or skip_next:
+                skip_next = False
+                continue
+            if token.lower() == "as":
+                skip_next = True
+                continue
+            if token.upper() in ("OUTPUT", "OUTPUTNEW") or "=" in token:
+                continue
+            if re.fullmatch(r"[A-Za-z_][\w.]*", token) and token not in fields:
+                fields.append(token)
+        yield name, fields
+
+
+def iter_savedsearches(entries, lookups):
+    """Yield savedsearches.conf stanzas, collecting lookup references into lookups."""
+    yield f"# Generated by SPLUNKed on {time.strftime('%Y-%m-%d')}\n\n"
+    seen = set()
+    for entry in entries:
+        name = _stanza_name(f"{SEARCH_PREFIX} - {entry['title']}")
+        if name in seen:
+            name = _stanza_name(f"{name} ({entry['id']})")
+        seen.add(name)
+
+        for lookup, fields in lookup_references(entry["spl"]):
+            known = lookups.setdefault(lookup, [])
+            known.extend(f for f in fields if f not in known)
+
+        mitre = ", ".join(_as_list(entry.get("mitre")))
+        yield _conf_stanza(
+            name,
+            [
+                ("description", entry.get("description") or None),
+                ("search", entry["spl"]),
+                ("dispatch.earliest_time", DEFAULT_EARLIEST),
+                ("dispatch.latest_time", DEFAULT_LATEST),
+                ("enableSched", 0),
+                ("disabled", 0)
+            ],
+            comments=(
+                f"id: {entry['id']}",
+                f"category: {entry['category']}" if entry.get("category") else None,
+                f"mitre: {mitre}" if mitre else None,
+                f"tags: {', '.join(entry['tags'])}" if entry.get("tags") else None
+            )
+        )
+
+
+def iter_macros(mappings, lookups):
+    """Yield macros.conf stanzas, one per prompt builder search object."""
+    yield f"# Generated by SPLUNKed on {time.strftime('%Y-%m-%d')}\n\n"
+    for type_key, obj in mappings:
+        spl = " ".join((obj.get("spl") or "").split())
+        if not spl:
+            continue
+        for lookup, fields in lookup_references(spl):
+            known = lookups.setdefault(lookup, [])
+            known.extend(f for f in fields if f not in known)
+
+        name = f"{MACRO_PREFIX}_{re.sub(r'[^A-Za-z0-9_]', '_', obj['id'])}"
+        args = None
+        if obj.get("requiresField"):
+            # Field placeholders become a single macro argument: `splunked_os_001(user)`
+            for placeholder in (obj.get("fieldPlaceholder") or "{field}", "{field1}", "{field2}"):
+                spl = spl.replace(placeholder, "$field$")
+            if "$field$" in spl:
+                name, args = f"{name}(1)", "field"
+        yield _conf_stanza(
+            name,
+            [
+                ("definition", spl),
+                ("args", args),
+                ("iseval", 0),
+                ("description", obj.get("description") or obj.get("name"))
+            ],
+            comments=(f"{storage.singularize_type_name(type_key)}: {obj.get('name')}",)
+        )
+
+
+def iter_transforms(lookups):
+    for lookup in sorted(lookups):
+        if not lookup.lower().endswith(".csv"):
+            yield _conf_stanza(lookup, [("filename", f"{lookup}.csv")])
+
+
+def _lookup_filename(lookup):
+    return lookup if lookup.lower().endswith(".csv") else f"{lookup}.csv"
+
+
+def _iter_app_conf():
+    yield _conf_stanza("install", [("is_configured", 0)])
+    yield _conf_stanza("ui", [("is_visible", 0), ("label", APP_LABEL)])
+    yield _conf_stanza("launcher", [
+        ("author", "SPLUNKed"),
+        ("description", "Detections and search macros exported from SPLUNKed"),
+        ("version", APP_VERSION)
+    ])
+    yield _conf_stanza("package", [("id", APP_NAME)])
+
+
+def _iter_default_meta():
+    yield _conf_stanza("", [("access", "read : [ * ], write : [ admin, power ]"), ("export", "system")])
+
+
+def _spool(chunks):
+    """Write text chunks to a spooled temp file; returns (file positioned at 0, size in bytes)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        spool.write(data)
+        size += len(data)
+    spool.seek(0)
+    return spool, size
+
+
+def _tar_member(path, spool, size, mtime):
+    """Yield the raw tar bytes (header, data, padding) for one regular file."""
+    info = tarfile.TarInfo(path)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o644
+    yield info.tobuf(format=tarfile.USTAR_FORMAT)
+    with spool:
+        for chunk in iter(lambda: spool.read(CHUNK_BYTES), b""):
+            yield chunk
+    remainder = size % tarfile.BLOCKSIZE
+    if remainder:
+        yield tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+
+
+def _tar_stream(members):
+    """Raw tar bytes for (path, text chunk iterator) pairs, each spooled just long enough to size it."""
+    mtime = int(time.time())
+    written = 0
+    for path, chunks in members:
+        spool, size = _spool(chunks)
+        for block in _tar_member(f"{APP_NAME}/{path}", spool, size, mtime):
+            written += len(block)
+            yield block
+    # End-of-archive marker, padded to a whole record like tarfile does
+    end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+    written += len(end)
+    yield end
+    remainder = written % tarfile.RECORDSIZE
+    if remainder:
+        yield tarfile.NUL * (tarfile.RECORDSIZE - remainder)
+
+
+def _gzip(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_app_package(queries=(), compositions=(), mappings=(), catalog=None):
+    """
+    Stream a Splunk app as tar.gz bytes.
+    queries are query library entries, compositions are prompt builder selections
+    (composed against catalog) and mappings are (type_key, object) pairs for macros.conf.
+    """
+    lookups = {}
+
+    def searches():
+        yield from queries
+        if compositions:
+            yield from iter_compositions(compositions, catalog)
+
+    def members():
+        yield "default/app.conf", _iter_app_conf()
+        yield "metadata/default.meta", _iter_default_meta()
+        yield "default/savedsearches.conf", iter_savedsearches(searches(), lookups)
+        yield "default/macros.conf", iter_macros(mappings, lookups)
+        # Lookups are only known once the searches and macros have been written
+        yield "default/transforms.conf", iter_transforms(lookups)
+        for lookup in sorted(lookups):
+            header = ",".join(lookups[lookup])
+            yield f"lookups/{_lookup_filename(lookup)}", iter([header + "\n" if header else ""])
+
+    return _gzip(_tar_stream(members()))
+
+
+def export_filename():
+    return f"{APP_NAME}-{time.strftime('%Y%m%d')}.tar.gz"
@@ -10,8 +10,21 @@ document.addEventListener('DOMContentLoaded', () => {
     initCopyButtons();
     applySPLHighlighting();
     initGlobalSearch();
+    registerOfflineCache();
 });
 
+/**
+ * Offline Cache
+ * Registers the root-scoped service worker that precaches pages, fonts, and data.
+ */
+function registerOfflineCache() {
+    if (!('serviceWorker' in navigator)) return;
+
+    navigator.serviceWorker.register('/sw.js').catch((error) => {
+        console.warn('Offline cache unavailable:', error);
+    });
+}
+
 /**
  * Sidebar Management
  */
@@ -465,10 +478,27 @@ const SPL_SYNTAX = window.SPL_SYNTAX || {
 
 window.SPL_SYNTAX = SPL_SYNTAX;
 
+// Highlighted HTML per unique snippet; the same SPL recurs across the library, glossary and training
+const HIGHLIGHT_CACHE = new Map();
+const HIGHLIGHT_CACHE_SIZE = 1000;
+
 function highlightSPL(code, options = {}) {
     if (!code) return code;
 
     const { formatPipelines = true } = options;
+    const cacheKey = `${formatPipelines ? 1 : 0}:${code}`;
+    const cached = HIGHLIGHT_CACHE.get(cacheKey);
+    if (cached !== undefined) return cached;
+
+    const highlighted = renderHighlightedSPL(code, formatPipelines);
+    if (HIGHLIGHT_CACHE.size >= HIGHLIGHT_CACHE_SIZE) {
+        HIGHLIGHT_CACHE.delete(HIGHLIGHT_CACHE.keys().next().value);
+    }
+    HIGHLIGHT_CACHE.set(cacheKey, highlighted);
+    return highlighted;
+}
+
+function renderHighlightedSPL(code, formatPipelines) {
 
     // Escape HTML to prevent XSS
     // After this: < becomes &lt;, > becomes &gt;
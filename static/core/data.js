@@ -72,6 +72,193 @@
         }
     }
 
+    // ============================================
+    // Training Index Store (IndexedDB)
+    // ============================================
+
+    const TRAINING_DB_NAME = 'splunked-training';
+    const TRAINING_DB_VERSION = 1;
+    const TRAINING_STORES = ['modules', 'pipelines', 'meta'];
+
+    function requestToPromise(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function transactionToPromise(tx) {
+        return new Promise((resolve, reject) => {
+            tx.oncomplete = () => resolve();
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    /**
+     * Open the training index database
+     * @returns {Promise<IDBDatabase|null>} - Database, or null when IndexedDB is unavailable
+     */
+    function openTrainingStore() {
+        if (!window.indexedDB) {
+            return Promise.resolve(null);
+        }
+
+        const request = indexedDB.open(TRAINING_DB_NAME, TRAINING_DB_VERSION);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            if (!db.objectStoreNames.contains('modules')) {
+                db.createObjectStore('modules', { keyPath: 'id' });
+            }
+            if (!db.objectStoreNames.contains('pipelines')) {
+                db.createObjectStore('pipelines', { keyPath: 'id' });
+            }
+            if (!db.objectStoreNames.contains('meta')) {
+                db.createObjectStore('meta');
+            }
+        };
+
+        return requestToPromise(request).catch((error) => {
+            console.warn('Training index store unavailable:', error);
+            return null;
+        });
+    }
+
+    async function readTrainingSnapshot(db) {
+        const tx = db.transaction(TRAINING_STORES, 'readonly');
+        const [modules, pipelines, revision, epoch] = await Promise.all([
+            requestToPromise(tx.objectStore('modules').getAll()),
+            requestToPromise(tx.objectStore('pipelines').getAll()),
+            requestToPromise(tx.objectStore('meta').get('revision')),
+            requestToPromise(tx.objectStore('meta').get('epoch'))
+        ]);
+        return { revision: revision || 0, epoch: epoch || '', modules, pipelines };
+    }
+
+    /**
+     * Persist index entries and deletions in one transaction
+     * @param {IDBDatabase} db - Training index database
+     * @param {Object} changes - { revision, epoch, modules, pipelines, deleted, replace }
+     */
+    function writeTrainingChanges(db, changes) {
+        const tx = db.transaction(TRAINING_STORES, 'readwrite');
+        const moduleStore = tx.objectStore('modules');
+        const pipelineStore = tx.objectStore('pipelines');
+
+        if (changes.replace) {
+            moduleStore.clear();
+            pipelineStore.clear();
+        }
+        changes.modules.forEach(module => moduleStore.put(module));
+        changes.pipelines.forEach(pipeline => pipelineStore.put(pipeline));
+        (changes.deleted?.modules || []).forEach(id => moduleStore.delete(id));
+        (changes.deleted?.pipelines || []).forEach(id => pipelineStore.delete(id));
+        tx.objectStore('meta').put(changes.revision || 0, 'revision');
+        tx.objectStore('meta').put(changes.epoch || '', 'epoch');
+
+        return transactionToPromise(tx);
+    }
+
+    // Mirrors the server ordering: sort_order ASC, title ASC (binary collation)
+    function compareTrainingEntries(a, b) {
+        const order = (a.sortOrder || 0) - (b.sortOrder || 0);
+        if (order) return order;
+        const titleA = a.title || '';
+        const titleB = b.title || '';
+        return titleA < titleB ? -1 : titleA > titleB ? 1 : 0;
+    }
+
+    /**
+     * Group flat module and pipeline lists into the /api/training/index shape
+     */
+    function buildTrainingIndex(modules, pipelines, revision) {
+        const lessons = {};
+        const training = {};
+
+        [...modules].sort(compareTrainingEntries).forEach((module) => {
+            const category = module.category || 'general';
+            const target = module.type === 'lesson' ? lessons : training;
+            (target[category] = target[category] || []).push(module);
+        });
+
+        return {
+            revision,
+            lessons,
+            training,
+            pipelines: [...pipelines].sort(compareTrainingEntries)
+        };
+    }
+
+    function flattenTrainingIndex(data) {
+        return [
+            ...Object.values(data.lessons || {}),
+            ...Object.values(data.training || {})
+        ].flat();
+    }
+
+    /**
+     * Refresh the stored training index, downloading only changes since the stored revision
+     * @returns {Promise<Object>} - Training index in the /api/training/index shape
+     */
+    async function syncTrainingIndex() {
+        const db = await openTrainingStore();
+        const snapshot = db ? await readTrainingSnapshot(db).catch(() => null) : null;
+        // Revisions only mean something within one epoch (a from-scratch rebuild starts a new one)
+        const since = snapshot?.epoch ? snapshot.revision : 0;
+        const url = since
+            ? `/api/training/index?since=${since}&epoch=${encodeURIComponent(snapshot.epoch)}`
+            : '/api/training/index';
+
+        let payload;
+        try {
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`Failed to load ${url}`);
+            }
+            payload = await response.json();
+        } catch (error) {
+            if (since) {
+                console.warn('Using stored training index:', error);
+                return buildTrainingIndex(snapshot.modules, snapshot.pipelines, since);
+            }
+            throw error;
+        }
+
+        if (payload.delta && payload.epoch !== snapshot.epoch) {
+            // A delta from another database cannot be applied; replace the stored copy with a full index
+            const response = await fetch('/api/training/index');
+            if (!response.ok) {
+                throw new Error('Failed to load /api/training/index');
+            }
+            payload = await response.json();
+        }
+
+        if (!payload.delta) {
+            if (db) {
+                await writeTrainingChanges(db, {
+                    replace: true,
+                    revision: payload.revision,
+                    epoch: payload.epoch,
+                    modules: flattenTrainingIndex(payload),
+                    pipelines: payload.pipelines || []
+                }).catch(error => console.warn('Failed to store training index:', error));
+            }
+            return payload;
+        }
+
+        const modules = new Map(snapshot.modules.map(module => [module.id, module]));
+        const pipelines = new Map(snapshot.pipelines.map(pipeline => [pipeline.id, pipeline]));
+        payload.modules.forEach(module => modules.set(module.id, module));
+        payload.pipelines.forEach(pipeline => pipelines.set(pipeline.id, pipeline));
+        payload.deleted.modules.forEach(id => modules.delete(id));
+        payload.deleted.pipelines.forEach(id => pipelines.delete(id));
+
+        await writeTrainingChanges(db, payload)
+            .catch(error => console.warn('Failed to store training index:', error));
+
+        return buildTrainingIndex(modules.values(), pipelines.values(), payload.revision);
+    }
+
     // ============================================
     // Feature-specific Data Loaders
     // ============================================
@@ -108,10 +295,24 @@
     }
 
     /**
-     * Load training index data (metadata only; content fetched on demand)
+     * Load training index data (metadata only; content fetched on demand).
+     * The index is kept in IndexedDB and refreshed with ?since= deltas.
      */
     function loadTrainingData() {
-        return loadJsonOnce('training', '/api/training/index')
+        if (!DATA_PROMISES.training) {
+            DATA_PROMISES.training = syncTrainingIndex()
+                .then((data) => {
+                    DATA_CACHE.training = data;
+                    return data;
+                })
+                .catch((error) => {
+                    console.error(error);
+                    delete DATA_PROMISES.training;
+                    return null;
+                });
+        }
+
+        return DATA_PROMISES.training
             .then((data) => {
                 if (data) {
                     window.LESSONS_DATA = data.lessons || {};
@@ -0,0 +1,109 @@
+/**
+ * SPLUNKed Core - Static Export API Shim
+ * Loaded only in pages rendered by scripts/freeze-site.py. Read-only API requests are
+ * answered from the content-hashed files listed in static-manifest.json; everything else
+ * (prompt builder mappings, generate-spl) still goes to the server.
+ */
+
+(function() {
+    'use strict';
+
+    const script = document.currentScript;
+    const MANIFEST_URL = script?.dataset.manifest || '/static-manifest.json';
+    const nativeFetch = window.fetch.bind(window);
+
+    let manifestPromise = null;
+
+    function loadManifest() {
+        if (!manifestPromise) {
+            manifestPromise = nativeFetch(MANIFEST_URL, { cache: 'no-cache' })
+                .then((response) => {
+                    if (!response.ok) {
+                        throw new Error(`Failed to load ${MANIFEST_URL}`);
+                    }
+                    return response.json();
+                })
+                .catch((error) => {
+                    console.warn('Static API manifest unavailable:', error);
+                    // Try again on the next request
+                    manifestPromise = null;
+                    return { api: {} };
+                });
+        }
+        return manifestPromise;
+    }
+
+    function jsonResponse(body, status = 200) {
+        return new Response(JSON.stringify(body), {
+            status,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+
+    async function loadFrozen(manifest, key) {
+        const file = manifest.api[key];
+        if (!file) return null;
+        const response = await nativeFetch(file);
+        return response.ok ? response.json() : null;
+    }
+
+    /**
+     * /api/training/items?ids=a,b&pipeline=p assembled from the per-item and per-pipeline files
+     */
+    async function trainingItems(manifest, url) {
+        const ids = (url.searchParams.get('ids') || '').split(',').map(id => id.trim()).filter(Boolean);
+        const pipeline = url.searchParams.get('pipeline');
+
+        const items = new Map();
+        const snippets = {};
+        if (pipeline) {
+            const batch = await loadFrozen(manifest, `/api/training/items?pipeline=${pipeline}`);
+            if (!batch) {
+                return jsonResponse({ error: `Pipeline not found: ${pipeline}` }, 404);
+            }
+            batch.items.forEach(item => items.set(item.id, item));
+            Object.assign(snippets, batch.snippets);
+        }
+
+        const missing = [];
+        await Promise.all(ids.map(async (id) => {
+            const item = await loadFrozen(manifest, `/api/training/items/${id}`);
+            if (!item) {
+                missing.push(id);
+                return;
+            }
+            Object.assign(snippets, item.snippets);
+            delete item.snippets;
+            items.set(id, item);
+        }));
+
+        const order = [...new Set([...ids, ...items.keys()])];
+        return jsonResponse({
+            items: order.filter(id => items.has(id)).map(id => items.get(id)),
+            missing,
+            snippets
+        });
+    }
+
+    async function staticFetch(input, init) {
+        const request = input instanceof Request ? input : null;
+        const method = (init?.method || request?.method || 'GET').toUpperCase();
+        const url = new URL(request ? request.url : String(input), window.location.href);
+        if (method !== 'GET' || url.origin !== window.location.origin || !url.pathname.startsWith('/api/')) {
+            return nativeFetch(input, init);
+        }
+
+        const manifest = await loadManifest();
+        const path = decodeURIComponent(url.pathname);
+        if (path === '/api/training/items') {
+            return trainingItems(manifest, url);
+        }
+
+        // Exact URL first; otherwise the full response (e.g. the whole index for ?since=)
+        const search = url.search ? decodeURIComponent(url.search) : '';
+        const file = manifest.api[path + search] || manifest.api[path];
+        return nativeFetch(file || input, file ? undefined : init);
+    }
+
+    window.fetch = staticFetch;
+})();
@@ -27,12 +27,24 @@
         currentObjectType: 'dataSources',
         currentFilterType: 'patterns',
         currentFilterMode: 'include',
-        editingObject: null
+        editingObject: null,
+        // Change feed position the local mappings reflect (see /api/mappings/changes)
+        changesLatest: null
     };
 
     // DOM Elements
     const elements = {};
 
+    // ?tenant=<name> scopes the builder to that team's search objects plus the shared set
+    const tenant = new URLSearchParams(window.location.search).get('tenant');
+    const apiBase = tenant ? `/api/tenants/${encodeURIComponent(tenant)}` : '/api';
+
+    // Poll interval when server-sent events are unavailable
+    const CHANGE_POLL_MS = 10000;
+
+    // Server-sent events are opt-in on the server (CHANGE_STREAM_ENABLED); otherwise poll
+    const CHANGE_STREAM = document.currentScript?.dataset.changeStream === 'true';
+
     // Initialize on DOM ready
     document.addEventListener('DOMContentLoaded', init);
 
@@ -42,6 +54,7 @@
         setupEventListeners();
         renderBuilder();
         renderObjectsGrid();
+        subscribeToChanges();
     }
 
     function cacheElements() {
@@ -81,6 +94,15 @@
         elements.copySPL = document.getElementById('copySPL');
         elements.splOutput = document.getElementById('splOutput');
         elements.splExplanation = document.getElementById('splExplanation');
+        elements.splAnalysis = document.getElementById('splAnalysis');
+        elements.splAnalysisFindings = document.getElementById('splAnalysisFindings');
+        elements.optimizeSPL = document.getElementById('optimizeSPL');
+        elements.tstatsMode = document.getElementById('tstatsMode');
+        elements.splDataModel = document.getElementById('splDataModel');
+        elements.splDataModelNotes = document.getElementById('splDataModelNotes');
+        elements.splOptimization = document.getElementById('splOptimization');
+        elements.splOptimizationChanges = document.getElementById('splOptimizationChanges');
+        elements.splOptimizationDiff = document.getElementById('splOptimizationDiff');
 
         // Manage tab elements
         elements.objectTabs = document.querySelectorAll('.object-tab');
@@ -113,15 +135,95 @@
 
     async function loadMappings() {
         try {
-            const response = await fetch('/api/mappings');
+            const response = await fetch(`${apiBase}/mappings`);
             if (response.ok) {
+                const latest = response.headers.get('X-Mapping-Changes-Latest');
                 state.mappings = await response.json();
+                if (latest !== null) state.changesLatest = Number(latest);
             }
         } catch (error) {
             console.error('Failed to load mappings:', error);
         }
     }
 
+    // Patch one search object into local state; deletes pass only the id
+    function applyMappingChange(op, typeKey, id, object) {
+        const items = state.mappings[typeKey];
+        if (!items) return;
+        const index = items.findIndex(item => item.id === id);
+        if (index !== -1) items.splice(index, 1);
+        if (op === 'delete' || !object) return;
+        const name = object.name || '';
+        const position = items.findIndex(item => (item.name || '') > name);
+        items.splice(position === -1 ? items.length : position, 0, object);
+    }
+
+    function refreshViews() {
+        renderBuilder();
+        renderObjectsGrid();
+    }
+
+    async function handleChangeReset() {
+        await loadMappings();
+        refreshViews();
+    }
+
+    function handleChangeEvent(change) {
+        if (change.seq <= state.changesLatest) return;
+        state.changesLatest = change.seq;
+        applyMappingChange(change.op, change.typeKey, change.id, change.object);
+        refreshViews();
+    }
+
+    // Follow creates, updates and deletes from other tabs and users without refetching everything
+    function subscribeToChanges() {
+        if (state.changesLatest === null) return;
+        if (!CHANGE_STREAM || !window.EventSource) {
+            setTimeout(pollChanges, CHANGE_POLL_MS);
+            return;
+        }
+        const source = new EventSource(`${apiBase}/mappings/changes?since=${state.changesLatest}`);
+        ['create', 'update', 'delete'].forEach(op => {
+            source.addEventListener(op, event => handleChangeEvent(JSON.parse(event.data)));
+        });
+        source.addEventListener('reset', event => {
+            state.changesLatest = JSON.parse(event.data).latest;
+            handleChangeReset();
+        });
+        source.addEventListener('error', () => {
+            // EventSource retries dropped connections itself; a refused one (e.g. 429) stays closed
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(pollChanges, CHANGE_POLL_MS);
+            }
+        });
+    }
+
+    async function pollChanges() {
+        try {
+            let more = true;
+            while (more) {
+                const response = await fetch(`${apiBase}/mappings/changes?since=${state.changesLatest}`);
+                if (!response.ok) break;
+                const feed = await response.json();
+                if (feed.reset) {
+                    await handleChangeReset();
+                    break;
+                }
+                feed.changes.forEach(change => {
+                    if (change.seq > state.changesLatest) {
+                        applyMappingChange(change.op, change.typeKey, change.id, change.object);
+                    }
+                });
+                state.changesLatest = feed.latest;
+                if (feed.changes.length) refreshViews();
+                more = feed.more;
+            }
+        } catch (error) {
+            console.error('Failed to poll mapping changes:', error);
+        }
+        setTimeout(pollChanges, CHANGE_POLL_MS);
+    }
+
     function setupEventListeners() {
         // Main tab switching
         elements.builderTabs.forEach(tab => {
@@ -1322,7 +1424,7 @@
 
     async function generateSPL() {
         try {
-            const response = await fetch('/api/generate-spl', {
+            const response = await fetch(`${apiBase}/generate-spl`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -1331,7 +1433,9 @@
                     excludes: state.selections.excludes,
                     timeRange: state.selections.timeRange,
                     outputShape: state.selections.outputShape,
-                    outputField: state.selections.outputField
+                    outputField: state.selections.outputField,
+                    optimize: Boolean(elements.optimizeSPL?.checked),
+                    mode: elements.tstatsMode?.checked ? 'tstats' : 'search'
                 })
             });
 
@@ -1339,6 +1443,9 @@
                 const result = await response.json();
                 elements.splOutput.querySelector('.spl-code-display').textContent = result.spl;
                 elements.splExplanation.textContent = result.explanation;
+                renderAnalysis(result.analysis);
+                renderOptimization(result.optimization);
+                renderDataModel(result.tstats);
                 if (window.SPLUNKed?.applySPLHighlighting) {
                     window.SPLUNKed.applySPLHighlighting(elements.splOutput, { force: true });
                 }
@@ -1348,6 +1455,52 @@
         }
     }
 
+    function renderAnalysis(analysis) {
+        if (!elements.splAnalysis) return;
+
+        const findings = analysis?.findings || [];
+        elements.splAnalysis.hidden = findings.length === 0;
+        elements.splAnalysisFindings.innerHTML = findings.map(finding => {
+            const reference = finding.reference
+                ? ` <a href="${finding.reference.url}">${escapeHtml(finding.reference.title)}</a>`
+                : '';
+            return `<li class="analysis-finding ${finding.severity}">` +
+                `${escapeHtml(finding.message)} ${escapeHtml(finding.suggestion)}${reference}` +
+            '</li>';
+        }).join('');
+    }
+
+    function renderOptimization(optimization) {
+        if (!elements.splOptimization) return;
+
+        const changes = optimization?.changes || [];
+        elements.splOptimization.hidden = changes.length === 0;
+        elements.splOptimizationChanges.innerHTML = changes
+            .map(change => `<li class="analysis-finding">${escapeHtml(change)}</li>`)
+            .join('');
+        elements.splOptimizationDiff.textContent = (optimization?.diff || []).join('\n');
+        elements.splOptimizationDiff.hidden = !optimization?.changed;
+    }
+
+    function renderDataModel(tstats) {
+        if (!elements.splDataModel) return;
+
+        elements.splDataModel.hidden = !tstats;
+        if (!tstats) return;
+
+        if (tstats.applied) {
+            const reference = tstats.reference
+                ? ` <a href="${tstats.reference.url}">${escapeHtml(tstats.reference.title)}</a>`
+                : '';
+            elements.splDataModelNotes.innerHTML =
+                `<li class="analysis-finding">Searching the accelerated ${escapeHtml(tstats.dataModel)} data model.${reference}</li>`;
+        } else {
+            elements.splDataModelNotes.innerHTML = (tstats.reasons || [])
+                .map(reason => `<li class="analysis-finding medium">Kept the event search: ${escapeHtml(reason)}</li>`)
+                .join('');
+        }
+    }
+
     function copySPLToClipboard() {
         const spl = elements.splOutput.querySelector('.spl-code-display').textContent;
         if (window.SPLUNKed?.copyToClipboard) {
@@ -1508,14 +1661,14 @@
             let response;
             if (state.editingObject) {
                 // Update existing
-                response = await fetch(`/api/mappings/${state.currentObjectType}/${state.editingObject.id}`, {
+                response = await fetch(`${apiBase}/mappings/${state.currentObjectType}/${state.editingObject.id}`, {
                     method: 'PUT',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify(formData)
                 });
             } else {
                 // Create new
-                response = await fetch(`/api/mappings/${state.currentObjectType}`, {
+                response = await fetch(`${apiBase}/mappings/${state.currentObjectType}`, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify(formData)
@@ -1523,9 +1676,10 @@
             }
 
             if (response.ok) {
-                await loadMappings();
-                renderBuilder();
-                renderObjectsGrid();
+                // The change feed echoes this edit later; patching now keeps the grid current
+                const saved = await response.json();
+                applyMappingChange('update', state.currentObjectType, saved.id, saved);
+                refreshViews();
                 closeObjectModal();
             } else {
                 const error = await response.json();
@@ -1557,14 +1711,13 @@
         if (!state.editingObject) return;
 
         try {
-            const response = await fetch(`/api/mappings/${state.currentObjectType}/${state.editingObject.id}`, {
+            const response = await fetch(`${apiBase}/mappings/${state.currentObjectType}/${state.editingObject.id}`, {
                 method: 'DELETE'
             });
 
             if (response.ok) {
-                await loadMappings();
-                renderBuilder();
-                renderObjectsGrid();
+                applyMappingChange('delete', state.currentObjectType, state.editingObject.id);
+                refreshViews();
                 closeDeleteModal();
                 closeObjectModal();
             } else {
@@ -236,8 +236,15 @@ function showQueryModal(query) {
                 ${query.tags.map(tag => `<span class="query-tag">${tag}</span>`).join('')}
             </div>
         </div>
+
+        <div class="query-modal-section query-similar" id="querySimilar" hidden>
+            <h4>Similar searches</h4>
+            <ul class="query-similar-list"></ul>
+        </div>
     `;
 
+    loadSimilarSearches(query.id);
+
     if (window.SPLUNKed?.openModal) {
         window.SPLUNKed.openModal('queryModal');
     } else {
@@ -246,6 +253,46 @@ function showQueryModal(query) {
     }
 }
 
+async function loadSimilarSearches(queryId) {
+    const section = document.getElementById('querySimilar');
+    if (!section) return;
+
+    let similar = [];
+    try {
+        const response = await fetch(`/api/queries/${encodeURIComponent(queryId)}/similar`);
+        if (!response.ok) return;
+        similar = (await response.json()).similar || [];
+    } catch (error) {
+        return;
+    }
+
+    // The modal is re-rendered when another query opens while the request is in flight
+    if (!similar.length || !section.isConnected) return;
+
+    const list = section.querySelector('.query-similar-list');
+    list.innerHTML = similar.map(item => {
+        const label = item.kind === 'query' ? 'Query' : 'Training';
+        const href = item.kind === 'query' ? '#' : `/training?open=${encodeURIComponent(item.id)}`;
+        return `
+            <li>
+                <a class="query-similar-link" href="${href}" data-kind="${item.kind}" data-id="${SPLUNKed.escapeHtml(item.id)}">
+                    <span class="query-similar-kind ${item.kind}">${label}</span>
+                    <span class="query-similar-title">${SPLUNKed.escapeHtml(item.title || item.id)}</span>
+                </a>
+            </li>
+        `;
+    }).join('');
+
+    list.querySelectorAll('.query-similar-link[data-kind="query"]').forEach(link => {
+        link.addEventListener('click', (e) => {
+            e.preventDefault();
+            const query = QUERY_LIBRARY.find(q => q.id === link.dataset.id);
+            if (query) showQueryModal(query);
+        });
+    });
+    section.hidden = false;
+}
+
 function closeModal() {
     if (window.SPLUNKed?.closeModal) {
         window.SPLUNKed.closeModal('queryModal');
@@ -0,0 +1,187 @@
+/**
+ * SPLUNKed - Offline Service Worker
+ * Precaches the app shell, fonts, and data files listed in the server manifest,
+ * serves them cache-first, and refreshes changed entries when the manifest version moves.
+ */
+
+'use strict';
+
+const MANIFEST_URL = '/offline-manifest.json';
+const SHELL_CACHE_PREFIX = 'splunked-shell-';
+const RUNTIME_CACHE = 'splunked-runtime';
+const META_CACHE = 'splunked-meta';
+const ACTIVE_MANIFEST_KEY = '/__splunked/active-manifest';
+
+// Minimum gap between background manifest checks
+const MANIFEST_CHECK_INTERVAL_MS = 60 * 1000;
+
+let activeManifest = null;
+let lastManifestCheck = 0;
+let refreshPromise = null;
+
+// ============================================
+// Manifest Handling
+// ============================================
+
+async function fetchManifest() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-store' });
+    if (!response.ok) {
+        throw new Error(`Failed to load ${MANIFEST_URL}`);
+    }
+    return response.json();
+}
+
+async function getActiveManifest() {
+    if (activeManifest) return activeManifest;
+
+    const meta = await caches.open(META_CACHE);
+    const stored = await meta.match(ACTIVE_MANIFEST_KEY);
+    activeManifest = stored ? await stored.json() : null;
+    return activeManifest;
+}
+
+async function setActiveManifest(manifest) {
+    const meta = await caches.open(META_CACHE);
+    await meta.put(ACTIVE_MANIFEST_KEY, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    activeManifest = manifest;
+}
+
+/**
+ * Fill a cache for the manifest version, reusing unchanged entries from the
+ * previous version, then switch over and drop stale shell caches.
+ */
+async function installManifest(manifest) {
+    const previous = await getActiveManifest();
+    if (previous && previous.version === manifest.version) return;
+
+    const previousHashes = new Map((previous?.entries || []).map(entry => [entry.url, entry.hash]));
+    const previousCache = previous ? await caches.open(SHELL_CACHE_PREFIX + previous.version) : null;
+    const cache = await caches.open(SHELL_CACHE_PREFIX + manifest.version);
+
+    await Promise.all(manifest.entries.map(async (entry) => {
+        if (previousCache && previousHashes.get(entry.url) === entry.hash) {
+            const cached = await previousCache.match(entry.url);
+            if (cached) {
+                await cache.put(entry.url, cached);
+                return;
+            }
+        }
+
+        const response = await fetch(entry.url, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`Failed to precache ${entry.url}`);
+        }
+        await cache.put(entry.url, response);
+    }));
+
+    await setActiveManifest(manifest);
+
+    const keys = await caches.keys();
+    await Promise.all(keys
+        .filter(key => key.startsWith(SHELL_CACHE_PREFIX) && key !== SHELL_CACHE_PREFIX + manifest.version)
+        .map(key => caches.delete(key)));
+}
+
+function refreshInBackground() {
+    const now = Date.now();
+    if (refreshPromise || now - lastManifestCheck < MANIFEST_CHECK_INTERVAL_MS) {
+        return refreshPromise || Promise.resolve();
+    }
+    lastManifestCheck = now;
+
+    refreshPromise = fetchManifest()
+        .then(installManifest)
+        .catch((error) => console.warn('Offline cache refresh skipped:', error))
+        .finally(() => {
+            refreshPromise = null;
+        });
+    return refreshPromise;
+}
+
+// ============================================
+// Fetch Strategies
+// ============================================
+
+async function cacheFirst(event) {
+    const manifest = await getActiveManifest();
+    if (manifest) {
+        const cache = await caches.open(SHELL_CACHE_PREFIX + manifest.version);
+        const cached = await cache.match(event.request, { ignoreSearch: true });
+        if (cached) {
+            event.waitUntil(refreshInBackground());
+            return cached;
+        }
+    }
+    return fetch(event.request);
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(RUNTIME_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+// Static export API files are named by content hash, so a cached copy never goes stale
+async function cacheImmutable(request) {
+    const cache = await caches.open(RUNTIME_CACHE);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// ============================================
+// Lifecycle
+// ============================================
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        fetchManifest()
+            .then(installManifest)
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+    if (url.pathname === MANIFEST_URL || url.pathname === '/sw.js' || url.pathname === '/static-manifest.json') return;
+
+    if (url.pathname.startsWith('/_api/')) {
+        event.respondWith(cacheImmutable(request));
+        return;
+    }
+
+    // Training content is read-only between rebuilds; fall back to the last copy offline
+    if (url.pathname.startsWith('/api/training/')) {
+        event.respondWith(networkFirst(request));
+        return;
+    }
+
+    // Prompt builder mappings are mutable and always go to the server
+    if (url.pathname.startsWith('/api/')) return;
+
+    event.respondWith(cacheFirst(event));
+});
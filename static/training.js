@@ -40,6 +40,23 @@ function listToText(value) {
     return value || '';
 }
 
+// Training content references shared SPL as {"$snippet": hash}; responses carry the text once in "snippets"
+function resolveSnippets(value, snippets) {
+    if (Array.isArray(value)) {
+        return value.map(child => resolveSnippets(child, snippets));
+    }
+    if (value && typeof value === 'object') {
+        const keys = Object.keys(value);
+        if (keys.length === 1 && keys[0] === '$snippet' && snippets[value.$snippet] !== undefined) {
+            return snippets[value.$snippet];
+        }
+        keys.forEach(key => {
+            value[key] = resolveSnippets(value[key], snippets);
+        });
+    }
+    return value;
+}
+
 async function fetchTrainingItem(itemId) {
     if (!itemId) return null;
     if (TRAINING_ITEM_CACHE.has(itemId)) {
@@ -52,6 +69,9 @@ async function fetchTrainingItem(itemId) {
             throw new Error(`Failed to load training item ${itemId}`);
         }
         const data = await response.json();
+        const snippets = data.snippets || {};
+        delete data.snippets;
+        resolveSnippets(data, snippets);
         TRAINING_ITEM_CACHE.set(itemId, data);
         return data;
     } catch (error) {
@@ -60,6 +80,65 @@ async function fetchTrainingItem(itemId) {
     }
 }
 
+/**
+ * Load several training items in one request and cache them.
+ * Pass { pipeline } to also load every module a pipeline's steps point at.
+ */
+async function fetchTrainingItems(itemIds = [], options = {}) {
+    const missing = itemIds.filter(id => id && !TRAINING_ITEM_CACHE.has(id));
+    if (!missing.length && !options.pipeline) {
+        return itemIds.map(id => TRAINING_ITEM_CACHE.get(id)).filter(Boolean);
+    }
+
+    const params = new URLSearchParams();
+    if (missing.length) params.set('ids', missing.join(','));
+    if (options.pipeline) params.set('pipeline', options.pipeline);
+
+    try {
+        const response = await fetch(`/api/training/items?${params}`);
+        if (!response.ok) {
+            throw new Error('Failed to load training items');
+        }
+        const data = await response.json();
+        (data.items || []).forEach(item => {
+            TRAINING_ITEM_CACHE.set(item.id, resolveSnippets(item, data.snippets || {}));
+        });
+    } catch (error) {
+        console.error(error);
+    }
+    return itemIds.map(id => TRAINING_ITEM_CACHE.get(id)).filter(Boolean);
+}
+
+// Warm the item cache for a pipeline so moving between its steps never waits on the network
+function prefetchPipelineItems(pipeline) {
+    if (!pipeline || prefetchPipelineItems.done.has(pipeline.id)) return;
+    prefetchPipelineItems.done.add(pipeline.id);
+    fetchTrainingItems([], { pipeline: pipeline.id });
+}
+prefetchPipelineItems.done = new Set();
+
+// Pipelines with steps already joined to module metadata by the server
+const RESOLVED_PIPELINE_CACHE = new Map();
+
+async function fetchResolvedPipeline(pipelineId) {
+    if (RESOLVED_PIPELINE_CACHE.has(pipelineId)) {
+        return RESOLVED_PIPELINE_CACHE.get(pipelineId);
+    }
+
+    try {
+        const response = await fetch(`/api/training/pipelines/${encodeURIComponent(pipelineId)}`);
+        if (!response.ok) {
+            throw new Error(`Failed to load pipeline ${pipelineId}`);
+        }
+        const data = await response.json();
+        RESOLVED_PIPELINE_CACHE.set(pipelineId, data);
+        return data;
+    } catch (error) {
+        console.error(error);
+        return null;
+    }
+}
+
 
 
 
@@ -189,11 +268,13 @@ async function initTrainingOnReady() {
         renderActiveTab();
     }
 
-    // Open specific guide if requested
+    // Open specific guide or module if requested
     if (openParam) {
         const lesson = findLessonById(openParam);
         if (lesson) {
             setTimeout(() => openGuideModal(lesson), 200);
+        } else if (findModuleWithLevel(openParam)) {
+            setTimeout(() => openTrainingModal(openParam), 200);
         }
     }
 }
@@ -781,8 +862,9 @@ function initTrainingModals() {
     });
 }
 
-function openPipelineModal(pipelineId) {
-    const pipeline = PIPELINES_DATA.find(p => p.id === pipelineId);
+async function openPipelineModal(pipelineId) {
+    const pipeline = await fetchResolvedPipeline(pipelineId) ||
+        PIPELINES_DATA.find(p => p.id === pipelineId);
     if (!pipeline) return;
 
     const modal = document.getElementById('pipelineModal');
@@ -799,6 +881,8 @@ function openPipelineModal(pipelineId) {
         advanced: 'Advanced'
     };
 
+    prefetchPipelineItems(pipeline);
+
     levelBadge.textContent = levelLabels[pipeline.level] || pipeline.level;
     levelBadge.className = 'pipeline-level-badge ' + pipeline.level;
     if (trackBadge) {
@@ -859,7 +943,9 @@ function renderPipelineStep(step, index) {
         challenge: 'Challenge'
     };
 
-    return '<div class="pipeline-step" data-index="' + index + '" data-type="' + (step.type || '') + '">' +
+    const difficulty = step.module?.difficulty || '';
+
+    return '<div class="pipeline-step" data-index="' + index + '" data-type="' + (step.type || '') + '" data-difficulty="' + difficulty + '">' +
         '<div class="pipeline-step-number">' + (index + 1) + '</div>' +
         '<div class="pipeline-step-content">' +
             '<div class="pipeline-step-header">' +
@@ -1207,12 +1293,14 @@ function renderChallengeContent(content) {
             '<div class="challenge-workspace-actions">' +
                 '<button class="workspace-btn" id="formatSplBtn" title="Format SPL">Format</button>' +
                 '<button class="workspace-btn" id="clearSplBtn" title="Clear">Clear</button>' +
+                '<button class="workspace-btn" id="checkSplBtn" title="Compare with the reference solutions">Check</button>' +
             '</div>' +
         '</div>' +
         '<div class="challenge-spl-editor">' +
             '<pre class="challenge-spl-highlight" id="challengeSplHighlight"></pre>' +
             '<textarea class="challenge-spl-input" id="challengeSplInput" placeholder="Write your SPL query here..." spellcheck="false"></textarea>' +
         '</div>' +
+        '<div class="challenge-check-result" id="challengeCheckResult" hidden></div>' +
     '</div>';
 
     // Handle solution - support both simple and complex formats
@@ -1311,12 +1399,14 @@ function renderAssessmentChallenge(content) {
             '<div class="challenge-workspace-actions">' +
                 '<button class="workspace-btn" id="formatSplBtn" title="Format SPL">Format</button>' +
                 '<button class="workspace-btn" id="clearSplBtn" title="Clear">Clear</button>' +
+                '<button class="workspace-btn" id="checkSplBtn" title="Compare with the reference solutions">Check</button>' +
             '</div>' +
         '</div>' +
         '<div class="challenge-spl-editor">' +
             '<pre class="challenge-spl-highlight" id="challengeSplHighlight"></pre>' +
             '<textarea class="challenge-spl-input" id="challengeSplInput" placeholder="Write your SPL query here..." spellcheck="false"></textarea>' +
         '</div>' +
+        '<div class="challenge-check-result" id="challengeCheckResult" hidden></div>' +
     '</div>';
 
     // Scoring section
@@ -1420,6 +1510,7 @@ function initChallengeInteractivity() {
     const splHighlight = document.getElementById('challengeSplHighlight');
     const formatBtn = document.getElementById('formatSplBtn');
     const clearBtn = document.getElementById('clearSplBtn');
+    const checkBtn = document.getElementById('checkSplBtn');
 
     function updateSplHighlight(value) {
         if (!splHighlight) return;
@@ -1496,6 +1587,10 @@ function initChallengeInteractivity() {
         updateSplHighlight(splInput.value);
     }
 
+    if (checkBtn && splInput) {
+        checkBtn.addEventListener('click', () => checkChallengeAnswer(splInput.value));
+    }
+
     // Assessment challenge: requirement solution reveals
     document.querySelectorAll('.show-req-solution-btn').forEach(btn => {
         btn.addEventListener('click', () => {
@@ -1544,6 +1639,66 @@ function renderSplBlock(spl, explanation) {
     '</div>';
 }
 
+/**
+ * Label for a solution location such as "requirements[1].solution" or "solution.panels[0].spl"
+ */
+function describeAnswerLocation(location) {
+    const requirement = location.match(/^requirements\[(\d+)\]/);
+    if (requirement) return 'Requirement ' + (Number(requirement[1]) + 1);
+    const step = location.match(/^steps\[(\d+)\]/);
+    if (step) return 'Step ' + (Number(step[1]) + 1);
+    const panel = location.match(/panels\[(\d+)\]/);
+    if (panel) return 'Panel ' + (Number(panel[1]) + 1);
+    return 'the solution';
+}
+
+async function checkChallengeAnswer(spl) {
+    const resultEl = document.getElementById('challengeCheckResult');
+    if (!resultEl || !currentModalData) return;
+
+    const itemId = currentModalData.id;
+    resultEl.hidden = false;
+    resultEl.className = 'challenge-check-result';
+    if (!spl.trim()) {
+        resultEl.textContent = 'Write a query first.';
+        return;
+    }
+
+    let result;
+    try {
+        const response = await fetch(`/api/training/items/${encodeURIComponent(itemId)}/check`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ spl })
+        });
+        result = await response.json();
+        if (!response.ok) throw new Error(result.error || 'Check failed');
+    } catch (error) {
+        resultEl.classList.add('error');
+        resultEl.textContent = 'Could not check this answer: ' + error.message;
+        return;
+    }
+    // The modal may have closed or moved on while the request was in flight
+    if (currentModalData?.id !== itemId) return;
+
+    if (result.correct) {
+        resultEl.classList.add('correct');
+        resultEl.textContent = 'Matches the reference answer for ' + describeAnswerLocation(result.match.location) + '.';
+        return;
+    }
+
+    const closest = result.closest;
+    resultEl.classList.add('incorrect');
+    let message = 'Not a match yet. Closest: ' + describeAnswerLocation(closest.location) + ', where ' +
+        closest.matchedStages + ' of ' + closest.expectedStages + ' pipeline stages match.';
+    if (closest.expectedCommand) {
+        message += ' Check stage ' + (closest.matchedStages + 1) + ' (the reference uses ' + closest.expectedCommand + ').';
+    } else if (closest.submittedStages > closest.expectedStages) {
+        message += ' Your query has extra stages.';
+    }
+    resultEl.textContent = message;
+}
+
 // Simple HTML escaping for fallback when highlightSPL is unavailable
 function escapeHtml(text) {
     if (!text) return '';
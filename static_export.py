@@ -0,0 +1,191 @@
+"""
+Static-site export: renders every page and materializes every read-only API response into
+a directory any static file server can host. API bodies are stored under content hashes in
+_api/, text files get precompressed .gz siblings, and static-manifest.json maps API URLs to files.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from urllib.parse import quote
+
+import training_storage
+from flask import url_for
+
+MANIFEST_NAME = "static-manifest.json"
+API_DIR = "_api"
+
+# Endpoints rendered as pages; the redirect routes become meta-refresh pages
+PAGE_ENDPOINTS = ("index", "glossary", "references", "training", "query_library", "prompt_builder")
+REDIRECT_ENDPOINTS = ("guides", "enterprise_security")
+
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".svg", ".txt", ".md")
+# Files this small gain nothing from a .gz copy
+MIN_COMPRESS_BYTES = 256
+
+REDIRECT_PAGE = (
+    '<!DOCTYPE html>\n<html lang="en"><head><meta charset="UTF-8">'
+    '<meta http-equiv="refresh" content="0; url={target}"><link rel="canonical" href="{target}">'
+    '<title>Redirecting</title></head><body><a href="{target}">Continue</a></body></html>\n'
+)
+
+
+def api_urls():
+    """Every read-only API URL as (manifest key, request path): training, pipelines, snippets, similar."""
+    ids = training_storage.get_static_ids()
+    urls = [("/api/training/index", "/api/training/index")]
+    for pipeline_id in ids["pipelines"]:
+        urls.append((f"/api/training/pipelines/{pipeline_id}", f"/api/training/pipelines/{quote(pipeline_id, safe='')}"))
+        urls.append((f"/api/training/items?pipeline={pipeline_id}", f"/api/training/items?pipeline={quote(pipeline_id, safe='')}"))
+    for module_id in ids["modules"]:
+        path = f"/api/training/items/{quote(module_id, safe='')}"
+        urls.append((f"/api/training/items/{module_id}", path))
+        urls.append((f"/api/training/items/{module_id}/similar", f"{path}/similar"))
+    for query_id in ids["queries"]:
+        urls.append((f"/api/queries/{query_id}/similar", f"/api/queries/{quote(query_id, safe='')}/similar"))
+    for digest in ids["snippets"]:
+        urls.append((f"/api/snippets/{digest}", f"/api/snippets/{digest}"))
+    return urls
+
+
+def _page_path(url):
+    """/ -> index.html, /glossary -> glossary/index.html, so any server finds it for the clean URL."""
+    return os.path.join(url.strip("/"), "index.html") if url.strip("/") else "index.html"
+
+
+class _Writer:
+    """Writes files under the output directory, adding .gz copies and keeping totals."""
+
+    def __init__(self, output_dir, compress):
+        self.output_dir = output_dir
+        self.compress = compress
+        self.files = 0
+        self.bytes = 0
+        self.compressed_bytes = 0
+
+    def write(self, rel_path, body):
+        path = os.path.join(self.output_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(body)
+        os.replace(tmp_path, path)
+        self.files += 1
+        self.bytes += len(body)
+        if self.compress and rel_path.endswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES:
+            # mtime=0 keeps the .gz identical across exports of the same content
+            packed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(packed) < len(body):
+                with open(f"{tmp_path}.gz", "wb") as handle:
+                    handle.write(packed)
+                os.replace(f"{tmp_path}.gz", f"{path}.gz")
+                self.compressed_bytes += len(packed)
+                return
+        if os.path.exists(f"{path}.gz"):
+            os.remove(f"{path}.gz")
+
+
+def _get(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return response.get_data()
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _prune_api_files(output_dir, keep):
+    """Delete hashed API files referenced by neither this export nor the previous one."""
+    api_dir = os.path.join(output_dir, API_DIR)
+    removed = 0
+    for name in os.listdir(api_dir):
+        if name.split(".")[0] not in keep:
+            os.remove(os.path.join(api_dir, name))
+            removed += 1
+    return removed
+
+
+def freeze(app, output_dir, compress=True, report=None):
+    """
+    Export the site into output_dir and return a summary. The manifest is written after every
+    file it points at, and API files from the previous export are kept so open pages still resolve.
+    """
+    writer = _Writer(output_dir, compress)
+    previous = _load_manifest(output_dir)
+    app.config["STATIC_EXPORT"] = True
+    try:
+        with app.test_request_context():
+            pages = {endpoint: url_for(endpoint) for endpoint in PAGE_ENDPOINTS + REDIRECT_ENDPOINTS}
+
+        client = app.test_client()
+        for endpoint in PAGE_ENDPOINTS:
+            writer.write(_page_path(pages[endpoint]), _get(client, pages[endpoint]))
+        for endpoint in REDIRECT_ENDPOINTS:
+            target = client.get(pages[endpoint]).headers["Location"]
+            writer.write(_page_path(pages[endpoint]), REDIRECT_PAGE.format(target=target).encode())
+        if report:
+            report(f"Rendered {len(PAGE_ENDPOINTS) + len(REDIRECT_ENDPOINTS)} pages")
+
+        for rel_path, path in _iter_static(app.static_folder):
+            with open(path, "rb") as handle:
+                writer.write(os.path.join("static", rel_path), handle.read())
+        writer.write("sw.js", _get(client, "/sw.js"))
+        writer.write("offline-manifest.json", _get(client, "/offline-manifest.json"))
+
+        api = {}
+        hashes = set()
+        for key, path in api_urls():
+            body = _get(client, path)
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            if digest not in hashes:
+                hashes.add(digest)
+                writer.write(os.path.join(API_DIR, f"{digest}.json"), body)
+            api[key] = f"/{API_DIR}/{digest}.json"
+        if report:
+            report(f"Materialized {len(api)} API responses ({len(hashes)} unique)")
+    finally:
+        app.config["STATIC_EXPORT"] = False
+
+    version = hashlib.sha256(json.dumps(api, sort_keys=True).encode()).hexdigest()[:16]
+    manifest = {
+        "version": version,
+        "revision": training_storage.get_training_revision(),
+        "api": api
+    }
+    writer.write(MANIFEST_NAME, json.dumps(manifest, sort_keys=True, separators=(",", ":")).encode())
+
+    keep = hashes | {os.path.basename(url).split(".")[0] for url in (previous or {}).get("api", {}).values()}
+    removed = _prune_api_files(output_dir, keep)
+    return {
+        "version": version,
+        "files": writer.files,
+        "bytes": writer.bytes,
+        "compressedBytes": writer.compressed_bytes,
+        "apiResponses": len(api),
+        "apiFiles": len(hashes),
+        "removed": removed
+    }
+
+
+def _iter_static(root):
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".gz"):
+                continue
+            path = os.path.join(dir_path, file_name)
+            yield os.path.relpath(path, root), path
+
+
+def clean(output_dir):
+    """Remove a previous export entirely."""
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
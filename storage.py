@@ -5,10 +5,15 @@ Keeps the API contract stable while removing JSON write fragility.
 
 import json
 import os
+import re
 import sqlite3
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
+import write_queue
+
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 DB_PATH = os.path.join(DATA_DIR, "splunked.db")
@@ -43,6 +48,55 @@ ID_PREFIX_MAP = {
     "timeRangePresets": "tr"
 }
 
+# Relative weight of a term match in each indexed column when ranking suggestions
+SUGGEST_FIELD_WEIGHTS = {
+    "name": 8,
+    "friendly_name": 6,
+    "tags": 4,
+    "spl": 1
+}
+
+TERM_PATTERN = re.compile(r"[a-z0-9_]+")
+
+# Mappings every tenant sees; the unscoped /api/mappings routes read and write this set
+SHARED_TENANT = "shared"
+TENANT_PATTERN = r"[a-z0-9][a-z0-9_-]{0,63}"
+
+# Tenants whose mappings (and derived values such as composition catalogs) are kept in memory
+TENANT_CACHE_SIZE = 64
+
+# Rows kept in mapping_changes; clients further behind than this reload everything
+CHANGE_LOG_SIZE = 1000
+
+# Most changes returned by one get_mapping_changes call
+CHANGE_PAGE_SIZE = 500
+
+# Largest generation counter kept; larger values are left over from random() generations
+GENERATION_LIMIT = 2 ** 53
+
+# Tags are read back from mapping_tags as one delimited string per row
+TAG_SEPARATOR = "\x1f"
+
+MAPPING_SELECT = """
+    SELECT m.*, (
+        SELECT group_concat(tag, char(31)) FROM (
+            SELECT tag FROM mapping_tags
+            WHERE mapping_id = m.id
+            ORDER BY position
+        )
+    ) AS tag_list
+    FROM mappings m
+"""
+
+
+class MappingConflict(Exception):
+    """A new mapping's id is already taken."""
+
+
+_write_queue = None
+_tenant_cache = OrderedDict()
+_tenant_cache_lock = threading.Lock()
+
 
 def _connect():
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -53,6 +107,30 @@ def _connect():
     return conn
 
 
+def configure_write_queue(config):
+    """Apply WRITE_* settings (see write_queue.DEFAULT_CONFIG) to this process's writer."""
+    global _write_queue
+    _write_queue = write_queue.WriteQueue(DB_PATH, config)
+
+
+def _write(job):
+    """Run job(conn) through the serialized writer; raises write_queue.WriteQueueFull when saturated."""
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = write_queue.WriteQueue(DB_PATH)
+    return _write_queue.submit(job)
+
+
+def get_write_queue_stats():
+    if _write_queue is None:
+        return None
+    return {
+        **_write_queue.stats,
+        "pending": _write_queue.jobs.qsize(),
+        "capacity": _write_queue.config["WRITE_QUEUE_SIZE"]
+    }
+
+
 def init_db():
     with _connect() as conn:
         conn.execute(
@@ -69,15 +147,85 @@ def init_db():
                 requires_field INTEGER,
                 field_placeholder TEXT,
                 created_at TEXT,
-                updated_at TEXT
+                updated_at TEXT,
+                tenant TEXT NOT NULL DEFAULT 'shared'
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mapping_terms (
+                term TEXT NOT NULL,
+                mapping_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                position INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mapping_tags (
+                mapping_id TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (mapping_id, tag)
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mapping_generations (
+                tenant TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mapping_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tenant TEXT NOT NULL,
+                op TEXT NOT NULL,
+                type_key TEXT,
+                mapping_id TEXT,
+                object TEXT,
+                changed_at TEXT NOT NULL
+            )
+            """
+        )
+        _ensure_column(conn, "mappings", "tenant", f"TEXT NOT NULL DEFAULT '{SHARED_TENANT}'")
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_mappings_type_key ON mappings (type_key)"
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mappings_tenant_type ON mappings (tenant, type_key, name)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mapping_tags_tag ON mapping_tags (tag, mapping_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mapping_terms_term ON mapping_terms (term)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mapping_terms_mapping ON mapping_terms (mapping_id)"
+        )
+        # Generations used to be random(); counting up from them could overflow
+        conn.execute(
+            "UPDATE mapping_generations SET generation = 1 WHERE EXISTS ("
+            "SELECT 1 FROM mapping_generations WHERE generation < 0 OR generation > ?)",
+            (GENERATION_LIMIT,)
+        )
 
     _seed_if_empty()
+    _backfill_tags_if_empty()
+    _backfill_terms_if_empty()
+
+
+def _ensure_column(conn, table, column, definition):
+    """Add a column to tables created before it existed."""
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 
 def _seed_if_empty():
@@ -94,9 +242,88 @@ def _seed_if_empty():
         except (OSError, json.JSONDecodeError):
             seed = DEFAULT_MAPPINGS
 
-    for type_key, items in seed.items():
-        for item in items:
-            _insert_mapping(type_key, item, allow_existing=True)
+    with _connect() as conn:
+        for type_key, items in seed.items():
+            for item in items:
+                _insert_mapping(conn, type_key, item, allow_existing=True)
+
+
+def _backfill_tags_if_empty():
+    """Copy legacy JSON tags into mapping_tags for databases created before the join table."""
+    with _connect() as conn:
+        if conn.execute("SELECT 1 FROM mapping_tags LIMIT 1").fetchone():
+            return
+        rows = conn.execute(
+            "SELECT id, tags FROM mappings WHERE tags IS NOT NULL AND tags != '[]'"
+        ).fetchall()
+        for row in rows:
+            try:
+                tags = json.loads(row["tags"])
+            except json.JSONDecodeError:
+                tags = []
+            _store_tags(conn, row["id"], tags)
+
+
+def _backfill_terms_if_empty():
+    with _connect() as conn:
+        if conn.execute("SELECT 1 FROM mapping_terms LIMIT 1").fetchone():
+            return
+        rows = conn.execute(MAPPING_SELECT).fetchall()
+        for row in rows:
+            _index_terms(conn, row["id"], {
+                "name": row["name"],
+                "friendly_name": row["friendly_name"],
+                "tags": _split_tags(row["tag_list"]),
+                "spl": row["spl"]
+            })
+
+
+def _normalize_tags(tags):
+    if not isinstance(tags, list):
+        return []
+    normalized = []
+    for tag in tags:
+        tag = str(tag).strip()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def _split_tags(tag_list):
+    return tag_list.split(TAG_SEPARATOR) if tag_list else []
+
+
+def _store_tags(conn, obj_id, tags):
+    """Replace the tag rows for one mapping inside the caller's transaction."""
+    conn.execute("DELETE FROM mapping_tags WHERE mapping_id = ?", (obj_id,))
+    conn.executemany(
+        "INSERT INTO mapping_tags (mapping_id, tag, position) VALUES (?, ?, ?)",
+        [(obj_id, tag, position) for position, tag in enumerate(_normalize_tags(tags))]
+    )
+
+
+def _tokenize(text):
+    return TERM_PATTERN.findall((text or "").lower())
+
+
+def _index_terms(conn, obj_id, fields):
+    """Replace the suggest-index terms for one mapping inside the caller's transaction."""
+    conn.execute("DELETE FROM mapping_terms WHERE mapping_id = ?", (obj_id,))
+    entries = []
+    for field in SUGGEST_FIELD_WEIGHTS:
+        value = fields.get(field)
+        if isinstance(value, list):
+            value = " ".join(str(item) for item in value)
+        seen = set()
+        for position, term in enumerate(_tokenize(value)):
+            if term in seen:
+                continue
+            seen.add(term)
+            entries.append((term, obj_id, field, position))
+    conn.executemany(
+        "INSERT INTO mapping_terms (term, mapping_id, field, position) VALUES (?, ?, ?, ?)",
+        entries
+    )
 
 
 def get_type_key(type_name):
@@ -116,21 +343,15 @@ def _row_to_object(row):
     if row is None:
         return None
 
-    tags = []
-    if row["tags"]:
-        try:
-            tags = json.loads(row["tags"])
-        except json.JSONDecodeError:
-            tags = []
-
     obj = {
         "id": row["id"],
         "type": row["type"] or singularize_type_name(row["type_key"]),
         "name": row["name"] or "",
         "friendlyName": row["friendly_name"] or (row["name"] or "").upper(),
         "spl": row["spl"] or "",
-        "tags": tags,
-        "description": row["description"] or ""
+        "tags": _split_tags(row["tag_list"]),
+        "description": row["description"] or "",
+        "tenant": row["tenant"]
     }
 
     if row["requires_field"] is not None:
@@ -141,46 +362,53 @@ def _row_to_object(row):
     return obj
 
 
-def _insert_mapping(type_key, data, allow_existing=False):
+def _insert_mapping(conn, type_key, data, allow_existing=False, tenant=SHARED_TENANT):
     obj_id = data.get("id") or _generate_id(type_key)
     obj_type = data.get("type") or singularize_type_name(type_key)
 
     now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    tags = data.get("tags", [])
-    tags_json = json.dumps(tags) if isinstance(tags, list) else json.dumps([])
+    tags = _normalize_tags(data.get("tags", []))
+    tags_json = json.dumps(tags)
 
-    with _connect() as conn:
-        if allow_existing:
-            existing = conn.execute(
-                "SELECT 1 FROM mappings WHERE id = ?",
-                (obj_id,)
-            ).fetchone()
-            if existing:
-                return obj_id
-
-        conn.execute(
-            """
-            INSERT INTO mappings (
-                id, type_key, type, name, friendly_name, spl,
-                tags, description, requires_field, field_placeholder,
-                created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                obj_id,
-                type_key,
-                obj_type,
-                data.get("name", ""),
-                data.get("friendlyName", data.get("name", "").upper()),
-                data.get("spl", ""),
-                tags_json,
-                data.get("description", ""),
-                1 if data.get("requiresField") else 0 if data.get("requiresField") is not None else None,
-                data.get("fieldPlaceholder", ""),
-                now,
-                now
-            )
+    if allow_existing:
+        existing = conn.execute(
+            "SELECT 1 FROM mappings WHERE id = ?",
+            (obj_id,)
+        ).fetchone()
+        if existing:
+            return obj_id
+
+    conn.execute(
+        """
+        INSERT INTO mappings (
+            id, type_key, type, name, friendly_name, spl,
+            tags, description, requires_field, field_placeholder,
+            created_at, updated_at, tenant
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            obj_id,
+            type_key,
+            obj_type,
+            data.get("name", ""),
+            data.get("friendlyName", data.get("name", "").upper()),
+            data.get("spl", ""),
+            tags_json,
+            data.get("description", ""),
+            1 if data.get("requiresField") else 0 if data.get("requiresField") is not None else None,
+            data.get("fieldPlaceholder", ""),
+            now,
+            now,
+            tenant
         )
+    )
+    _store_tags(conn, obj_id, tags)
+    _index_terms(conn, obj_id, {
+        "name": data.get("name", ""),
+        "friendly_name": data.get("friendlyName", data.get("name", "").upper()),
+        "tags": tags,
+        "spl": data.get("spl", "")
+    })
 
     return obj_id
 
@@ -190,11 +418,188 @@ def _generate_id(type_key):
     return f"{prefix}_{uuid.uuid4().hex[:8]}"
 
 
-def get_all_mappings():
+def _tag_filter(tags):
+    """Build a WHERE fragment requiring every tag, answered from idx_mapping_tags_tag."""
+    clauses = []
+    params = []
+    for tag in _normalize_tags(tags or []):
+        clauses.append("m.id IN (SELECT mapping_id FROM mapping_tags WHERE tag = ?)")
+        params.append(tag)
+    return clauses, params
+
+
+def _tenant_filter(tenant):
+    """WHERE fragment for the mappings a tenant sees: its own plus the shared base set."""
+    if not tenant or tenant == SHARED_TENANT:
+        return ["m.tenant = ?"], [SHARED_TENANT]
+    return ["m.tenant IN (?, ?)"], [tenant, SHARED_TENANT]
+
+
+def _owned_filter(tenant):
+    """WHERE fragment for the mappings a tenant may change: only its own."""
+    return ["m.tenant = ?"], [tenant or SHARED_TENANT]
+
+
+def _bump_generation(conn, tenant, floor=0):
+    """
+    Mark a tenant's mappings as changed inside the caller's write transaction. Generations count
+    up across all tenants, so a tenant never gets back a value it had before (even after its row
+    went away), and the new one is above floor.
+    """
+    conn.execute(
+        """
+        INSERT INTO mapping_generations (tenant, generation)
+        VALUES (?, (SELECT MAX(COALESCE(MAX(generation), 0), ?) + 1 FROM mapping_generations))
+        ON CONFLICT(tenant) DO UPDATE SET generation = excluded.generation
+        """,
+        (tenant or SHARED_TENANT, floor)
+    )
+
+
+def _record_change(conn, tenant, op, type_key=None, obj=None):
+    """Append a create/update/delete (or reset) event to the change feed inside the caller's transaction."""
+    cursor = conn.execute(
+        """
+        INSERT INTO mapping_changes (tenant, op, type_key, mapping_id, object, changed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            tenant or SHARED_TENANT,
+            op,
+            type_key,
+            obj["id"] if obj else None,
+            json.dumps(obj) if obj and op != "delete" else None,
+            datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        )
+    )
+    conn.execute("DELETE FROM mapping_changes WHERE seq <= ?", (cursor.lastrowid - CHANGE_LOG_SIZE,))
+
+
+def get_latest_change_seq():
+    """Sequence number of the newest mapping change, 0 when there is none."""
+    with _connect() as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM mapping_changes").fetchone()[0]
+
+
+def get_latest_generation():
+    """Highest mapping generation handed out so far, 0 when there is none."""
+    with _connect() as conn:
+        return conn.execute("SELECT COALESCE(MAX(generation), 0) FROM mapping_generations").fetchone()[0]
+
+
+def mark_all_changed(after_seq=0, after_generation=0):
+    """
+    Invalidate every tenant's cached mappings, e.g. after a restore replaced the database.
+    The reset event is numbered after after_seq, the newest change clients may already have seen,
+    and the shared generation moves past after_generation, the newest one workers may have cached.
+    """
+    with _connect() as conn:
+        _bump_generation(conn, SHARED_TENANT, floor=after_generation)
+        # A restore brings back the backup's sqlite_sequence, which may be behind what clients hold
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mapping_changes'").fetchone()
+        if sequence is None or sequence[0] < after_seq:
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'mapping_changes'")
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('mapping_changes', ?)", (after_seq,))
+        # Shared events reach every tenant's feed, so all clients reload
+        _record_change(conn, SHARED_TENANT, "reset")
+
+
+def get_generation(tenant=None):
+    """Opaque token that changes whenever the mappings visible to tenant change."""
+    tenants = [SHARED_TENANT] if not tenant or tenant == SHARED_TENANT else [SHARED_TENANT, tenant]
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT tenant, generation FROM mapping_generations WHERE tenant IN ({', '.join('?' for _ in tenants)})",
+            tenants
+        ).fetchall()
+    generations = {row["tenant"]: row["generation"] for row in rows}
+    return tuple(generations.get(name) for name in tenants)
+
+
+def _change_to_event(row):
+    event = {
+        "seq": row["seq"],
+        "op": row["op"],
+        "tenant": row["tenant"],
+        "typeKey": row["type_key"],
+        "id": row["mapping_id"],
+        "changedAt": row["changed_at"]
+    }
+    if row["object"]:
+        event["object"] = json.loads(row["object"])
+    return event
+
+
+def get_mapping_changes(since=None, tenant=None, limit=CHANGE_PAGE_SIZE):
+    """
+    Changes visible to tenant after sequence number since, oldest first.
+    "latest" is the since value for the next call; "reset" means the log no longer reaches
+    back to since (or the database was restored) and the client should reload everything.
+    """
+    with _connect() as conn:
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM mapping_changes").fetchone()[0]
+        if since is None:
+            return {"changes": [], "latest": latest, "more": False, "reset": False}
+        oldest = conn.execute("SELECT MIN(seq) FROM mapping_changes").fetchone()[0]
+        if since > latest or (oldest is not None and since < oldest - 1):
+            return {"changes": [], "latest": latest, "more": False, "reset": True}
+
+        tenants = [SHARED_TENANT] if not tenant or tenant == SHARED_TENANT else [SHARED_TENANT, tenant]
+        rows = conn.execute(
+            f"""
+            SELECT * FROM mapping_changes
+            WHERE seq > ? AND seq <= ? AND tenant IN ({', '.join('?' for _ in tenants)})
+            ORDER BY seq
+            LIMIT ?
+            """,
+            [since, latest] + tenants + [limit]
+        ).fetchall()
+
+    changes = [_change_to_event(row) for row in rows]
+    more = len(changes) == limit
+    reset = any(change["op"] == "reset" for change in changes)
+    return {
+        "changes": changes,
+        "latest": changes[-1]["seq"] if more else latest,
+        "more": more,
+        "reset": reset
+    }
+
+
+def tenant_cached(tenant, name, build):
+    """
+    Return build() memoized per tenant until that tenant's or the shared mappings change.
+    The least recently used tenant is evicted past TENANT_CACHE_SIZE; values must not be mutated.
+    """
+    tenant = tenant or SHARED_TENANT
+    generation = get_generation(tenant)
+    with _tenant_cache_lock:
+        entry = _tenant_cache.get(tenant)
+        if entry and entry["generation"] == generation and name in entry["values"]:
+            _tenant_cache.move_to_end(tenant)
+            return entry["values"][name]
+
+    value = build()
+    with _tenant_cache_lock:
+        entry = _tenant_cache.get(tenant)
+        if not entry or entry["generation"] != generation:
+            entry = {"generation": generation, "values": {}}
+            _tenant_cache[tenant] = entry
+        entry["values"][name] = value
+        _tenant_cache.move_to_end(tenant)
+        while len(_tenant_cache) > TENANT_CACHE_SIZE:
+            _tenant_cache.popitem(last=False)
+    return value
+
+
+def _load_mappings(tags=None, tenant=None):
     data = {key: [] for key in DEFAULT_MAPPINGS}
+    clauses, params = _tenant_filter(tenant)
+    tag_clauses, tag_params = _tag_filter(tags)
     with _connect() as conn:
         rows = conn.execute(
-            "SELECT * FROM mappings ORDER BY type_key, name"
+            f"{MAPPING_SELECT} WHERE {' AND '.join(clauses + tag_clauses)} ORDER BY m.type_key, m.name",
+            params + tag_params
         ).fetchall()
     for row in rows:
         obj = _row_to_object(row)
@@ -203,57 +608,133 @@ def get_all_mappings():
     return data
 
 
-def get_mappings_by_type(type_name):
+def get_all_mappings(tags=None, tenant=None):
+    """Mappings visible to tenant grouped by type; unfiltered listings come from the tenant cache."""
+    if _normalize_tags(tags or []):
+        return _load_mappings(tags, tenant)
+    return tenant_cached(tenant, "mappings", lambda: _load_mappings(tenant=tenant))
+
+
+def iter_mappings(tags=None, tenant=None, type_key=None):
+    """Yield (type_key, object) pairs row by row instead of loading every mapping at once."""
+    clauses, params = _tenant_filter(tenant)
+    if type_key:
+        clauses.append("m.type_key = ?")
+        params.append(type_key)
+    tag_clauses, tag_params = _tag_filter(tags)
+    clauses += tag_clauses
+    params += tag_params
+    where = f"WHERE {' AND '.join(clauses)}"
+    conn = _connect()
+    try:
+        for row in conn.execute(f"{MAPPING_SELECT} {where} ORDER BY m.type_key, m.name", params):
+            yield row["type_key"], _row_to_object(row)
+    finally:
+        conn.close()
+
+
+def get_mappings_by_type(type_name, tags=None, tenant=None):
     type_key = resolve_type_key(type_name)
     if not type_key:
         return None
+    clauses, params = _tenant_filter(tenant)
+    tag_clauses, tag_params = _tag_filter(tags)
+    clauses += ["m.type_key = ?"] + tag_clauses
+    params += [type_key] + tag_params
     with _connect() as conn:
         rows = conn.execute(
-            "SELECT * FROM mappings WHERE type_key = ? ORDER BY name",
-            (type_key,)
+            f"{MAPPING_SELECT} WHERE {' AND '.join(clauses)} ORDER BY m.name",
+            params
         ).fetchall()
     return [_row_to_object(row) for row in rows]
 
 
-def create_mapping(type_name, data):
+def get_tag_counts(type_name=None, tenant=None):
+    type_key = resolve_type_key(type_name) if type_name else None
+    if type_name and not type_key:
+        return None
+    clauses, params = _tenant_filter(tenant)
+    if type_key:
+        clauses.append("m.type_key = ?")
+        params.append(type_key)
+    with _connect() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT t.tag, COUNT(*) AS count FROM mapping_tags t
+            JOIN mappings m ON m.id = t.mapping_id
+            WHERE {' AND '.join(clauses)}
+            GROUP BY t.tag
+            ORDER BY count DESC, t.tag
+            """,
+            params
+        ).fetchall()
+    return [{"tag": row["tag"], "count": row["count"]} for row in rows]
+
+
+def create_mapping(type_name, data, tenant=None):
     type_key = resolve_type_key(type_name)
     if not type_key:
         return None
-    obj_id = _insert_mapping(type_key, data)
-    return get_mapping_by_id(type_key, obj_id)
+    tenant = tenant or SHARED_TENANT
+
+    def apply(conn):
+        # Ids are global across tenants, so a client-chosen id could clash with (or reveal)
+        # another namespace's mapping; new mappings always get a generated one
+        try:
+            obj_id = _insert_mapping(conn, type_key, {**data, "id": None}, tenant=tenant)
+        except sqlite3.IntegrityError as exc:
+            raise MappingConflict("A mapping with that id already exists; retry the request") from exc
+        _bump_generation(conn, tenant)
+        obj = _get_mapping(conn, type_key, obj_id, _owned_filter(tenant))
+        _record_change(conn, tenant, "create", type_key, obj)
+        return obj
+
+    return _write(apply)
+
+
+def _get_mapping(conn, type_key, obj_id, scope=None):
+    clauses, params = scope or _tenant_filter(None)
+    row = conn.execute(
+        f"{MAPPING_SELECT} WHERE m.type_key = ? AND m.id = ? AND {' AND '.join(clauses)}",
+        [type_key, obj_id] + params
+    ).fetchone()
+    return _row_to_object(row)
 
 
-def get_mapping_by_id(type_key, obj_id):
+def get_mapping_by_id(type_key, obj_id, tenant=None):
     with _connect() as conn:
-        row = conn.execute(
-            "SELECT * FROM mappings WHERE type_key = ? AND id = ?",
-            (type_key, obj_id)
-        ).fetchone()
-    return _row_to_object(row)
+        return _get_mapping(conn, type_key, obj_id, _tenant_filter(tenant))
 
 
-def update_mapping(type_name, obj_id, data):
+def update_mapping(type_name, obj_id, data, tenant=None):
+    """Update a mapping the tenant owns; shared mappings are only changed through the unscoped routes."""
     type_key = resolve_type_key(type_name)
     if not type_key:
         return None
+    tenant = tenant or SHARED_TENANT
 
-    obj = get_mapping_by_id(type_key, obj_id)
-    if not obj:
-        return None
+    # Read and write inside one writer transaction so concurrent edits merge onto fresh data
+    def apply(conn):
+        obj = _get_mapping(conn, type_key, obj_id, _owned_filter(tenant))
+        if not obj:
+            return None
 
-    now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    tags = data.get("tags", obj.get("tags", []))
-    tags_json = json.dumps(tags) if isinstance(tags, list) else json.dumps([])
+        now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        tags = _normalize_tags(data.get("tags", obj.get("tags", [])))
+        tags_json = json.dumps(tags)
 
-    requires_field = data.get("requiresField")
-    if requires_field is None:
-        requires_field = obj.get("requiresField")
+        requires_field = data.get("requiresField")
+        if requires_field is None:
+            requires_field = obj.get("requiresField")
 
-    field_placeholder = data.get("fieldPlaceholder")
-    if field_placeholder is None:
-        field_placeholder = obj.get("fieldPlaceholder", "")
+        field_placeholder = data.get("fieldPlaceholder")
+        if field_placeholder is None:
+            field_placeholder = obj.get("fieldPlaceholder", "")
+
+        name = data.get("name", obj.get("name"))
+        friendly_name = data.get("friendlyName", data.get("name", obj.get("name", "")).upper())
+        spl = data.get("spl", obj.get("spl"))
 
-    with _connect() as conn:
         conn.execute(
             """
             UPDATE mappings
@@ -262,9 +743,9 @@ def update_mapping(type_name, obj_id, data):
             WHERE type_key = ? AND id = ?
             """,
             (
-                data.get("name", obj.get("name")),
-                data.get("friendlyName", data.get("name", obj.get("name", "")).upper()),
-                data.get("spl", obj.get("spl")),
+                name,
+                friendly_name,
+                spl,
                 tags_json,
                 data.get("description", obj.get("description", "")),
                 1 if requires_field else 0 if requires_field is not None else None,
@@ -274,20 +755,108 @@ def update_mapping(type_name, obj_id, data):
                 obj_id
             )
         )
-
-    return get_mapping_by_id(type_key, obj_id)
-
-
-def delete_mapping(type_name, obj_id):
+        _store_tags(conn, obj_id, tags)
+        _index_terms(conn, obj_id, {
+            "name": name,
+            "friendly_name": friendly_name,
+            "tags": tags,
+            "spl": spl
+        })
+        _bump_generation(conn, tenant)
+        obj = _get_mapping(conn, type_key, obj_id, _owned_filter(tenant))
+        _record_change(conn, tenant, "update", type_key, obj)
+        return obj
+
+    return _write(apply)
+
+
+def delete_mapping(type_name, obj_id, tenant=None):
     type_key = resolve_type_key(type_name)
     if not type_key:
         return None
-    obj = get_mapping_by_id(type_key, obj_id)
-    if not obj:
-        return None
-    with _connect() as conn:
+    tenant = tenant or SHARED_TENANT
+
+    def apply(conn):
+        obj = _get_mapping(conn, type_key, obj_id, _owned_filter(tenant))
+        if not obj:
+            return None
         conn.execute(
             "DELETE FROM mappings WHERE type_key = ? AND id = ?",
             (type_key, obj_id)
         )
-    return obj
+        conn.execute("DELETE FROM mapping_tags WHERE mapping_id = ?", (obj_id,))
+        conn.execute("DELETE FROM mapping_terms WHERE mapping_id = ?", (obj_id,))
+        _bump_generation(conn, tenant)
+        _record_change(conn, tenant, "delete", type_key, obj)
+        return obj
+
+    return _write(apply)
+
+
+def suggest_mappings(query, type_name=None, limit=10, tenant=None):
+    """Rank mappings whose indexed terms start with every token in the query."""
+    tokens = list(dict.fromkeys(_tokenize(query)))
+    if not tokens:
+        return []
+
+    type_key = None
+    if type_name:
+        type_key = resolve_type_key(type_name)
+        if not type_key:
+            return []
+
+    tenant_clauses, tenant_params = _tenant_filter(tenant)
+    scores = None
+    with _connect() as conn:
+        for token in tokens:
+            rows = conn.execute(
+                f"""
+                SELECT t.mapping_id, t.field, t.term, t.position FROM mapping_terms t
+                JOIN mappings m ON m.id = t.mapping_id
+                WHERE t.term >= ? AND t.term < ? AND {' AND '.join(tenant_clauses)}
+                """,
+                [token, token + "\uffff"] + tenant_params
+            ).fetchall()
+
+            token_scores = {}
+            for row in rows:
+                weight = SUGGEST_FIELD_WEIGHTS[row["field"]]
+                if row["term"] == token:
+                    weight *= 2
+                if row["position"] == 0 and row["field"] != "spl":
+                    weight += 1
+                mapping_id = row["mapping_id"]
+                token_scores[mapping_id] = max(token_scores.get(mapping_id, 0), weight)
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    mapping_id: score + token_scores[mapping_id]
+                    for mapping_id, score in scores.items()
+                    if mapping_id in token_scores
+                }
+            if not scores:
+                return []
+
+        placeholders = ", ".join("?" for _ in scores)
+        params = list(scores)
+        sql = f"{MAPPING_SELECT} WHERE m.id IN ({placeholders}) AND {' AND '.join(tenant_clauses)}"
+        params += tenant_params
+        if type_key:
+            sql += " AND m.type_key = ?"
+            params.append(type_key)
+        rows = conn.execute(sql, params).fetchall()
+
+    ranked = sorted(
+        rows,
+        key=lambda row: (-scores[row["id"]], (row["name"] or "").lower())
+    )[:limit]
+
+    results = []
+    for row in ranked:
+        obj = _row_to_object(row)
+        obj["typeKey"] = row["type_key"]
+        obj["score"] = scores[row["id"]]
+        results.append(obj)
+    return results
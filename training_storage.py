@@ -1,29 +1,149 @@
 """
 SQLite-backed storage for SPLUNKed training content and pipelines.
 Keeps training metadata small for fast index loads and fetches full content on demand.
+Content lives in its own database file that the rebuild writes to a copy and swaps in,
+so serving workers read it immutable and lock-free.
 """
 
+import hashlib
 import json
 import os
+import secrets
+import shutil
 import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.request import pathname2url
+
+import spl_analyzer
+import spl_snippets
+import spl_structure
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_PATH = os.path.join(DATA_DIR, "splunked.db")
+DB_PATH = os.path.join(DATA_DIR, "training.db")
 PIPELINES_SEED_PATH = os.path.join(DATA_DIR, "training-pipelines.json")
 
+# Training tables used to live next to the mappings; imported once when training.db is created
+LEGACY_DB_PATH = os.path.join(DATA_DIR, "splunked.db")
+TRAINING_TABLES = (
+    "training_modules",
+    "training_pipelines",
+    "training_pipeline_steps",
+    "training_meta",
+    "training_tombstones"
+)
+
+# Read connections map the whole file; the content database is a few MB
+READ_MMAP_SIZE = 256 * 1024 * 1024
+
+# Temp file written by build(); None outside a rebuild
+_build_path = None
+_readers = threading.local()
+
 
 def _connect():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    """Writable connection to the copy being built; only valid inside build()."""
+    if _build_path is None:
+        raise RuntimeError("Training content is read-only outside training_storage.build()")
+    conn = sqlite3.connect(_build_path)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
+    # The copy is discarded on failure, so skip durability until it is swapped in
+    conn.execute("PRAGMA journal_mode=MEMORY;")
+    conn.execute("PRAGMA synchronous=OFF;")
     return conn
 
 
+def _read():
+    """
+    Per-thread read-only connection to the live training database.
+    A rebuild replaces the file rather than editing it, so the connection is opened
+    immutable (no locks, no change detection) and reopened when the file is swapped.
+    """
+    stat = os.stat(DB_PATH)
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    conn = getattr(_readers, "conn", None)
+    if conn is None or _readers.key != key:
+        if conn is not None:
+            conn.close()
+        conn = _open_reader()
+        _readers.conn = conn
+        _readers.key = key
+    return conn
+
+
+def _open_reader():
+    conn = sqlite3.connect(f"file:{pathname2url(DB_PATH)}?mode=ro&immutable=1", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE};")
+    return conn
+
+
+@contextmanager
+def snapshot():
+    """
+    Dedicated read connection for streaming responses. It keeps reading the file it opened
+    even if a rebuild swaps in a new one mid-stream, and is closed when the block exits.
+    """
+    conn = _open_reader()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def build():
+    """
+    Apply training writes to a copy of the database, then atomically rename it into place.
+    If the block raises, the live database is left untouched.
+    """
+    global _build_path
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    created = not os.path.exists(DB_PATH)
+    handle, temp_path = tempfile.mkstemp(prefix=".training-", suffix=".db", dir=DATA_DIR)
+    os.close(handle)
+    try:
+        if created:
+            os.chmod(temp_path, 0o644)
+        else:
+            shutil.copyfile(DB_PATH, temp_path)
+            shutil.copymode(DB_PATH, temp_path)
+        _build_path = temp_path
+        _create_schema()
+        _ensure_epoch(fresh=created)
+        if created:
+            _import_legacy_tables()
+            _seed_pipelines_if_empty()
+        yield
+
+        conn = _connect()
+        conn.execute("PRAGMA journal_mode=DELETE;")
+        conn.execute("PRAGMA optimize;")
+        conn.close()
+        with open(temp_path, "rb") as built:
+            os.fsync(built.fileno())
+        os.replace(temp_path, DB_PATH)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        _build_path = None
+
+
 def init_db():
+    """Create training.db on first run; later changes come from the rebuild script."""
+    if os.path.exists(DB_PATH):
+        return
+    with build():
+        pass
+
+
+def _create_schema():
     with _connect() as conn:
         conn.execute(
             """
@@ -42,6 +162,8 @@ def init_db():
                 content_format TEXT,
                 content TEXT,
                 sort_order INTEGER DEFAULT 0,
+                revision INTEGER DEFAULT 0,
+                content_hash TEXT,
                 created_at TEXT,
                 updated_at TEXT
             )
@@ -59,6 +181,8 @@ def init_db():
                 objectives_json TEXT,
                 track TEXT,
                 sort_order INTEGER DEFAULT 0,
+                revision INTEGER DEFAULT 0,
+                content_hash TEXT,
                 created_at TEXT,
                 updated_at TEXT
             )
@@ -80,6 +204,66 @@ def init_db():
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS training_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS training_tombstones (
+                kind TEXT NOT NULL,
+                id TEXT NOT NULL,
+                revision INTEGER NOT NULL,
+                PRIMARY KEY (kind, id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spl_snippets (
+                hash TEXT PRIMARY KEY,
+                spl TEXT NOT NULL,
+                commands_json TEXT,
+                token_count INTEGER,
+                subsearch_count INTEGER,
+                analysis_json TEXT,
+                structure_json TEXT
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spl_snippet_refs (
+                hash TEXT NOT NULL,
+                dataset TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                location TEXT NOT NULL,
+                PRIMARY KEY (dataset, item_id, location)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS similar_items (
+                kind TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                neighbor_kind TEXT NOT NULL,
+                neighbor_id TEXT NOT NULL,
+                title TEXT,
+                score REAL NOT NULL,
+                PRIMARY KEY (kind, item_id, rank)
+            )
+            """
+        )
+        for table in ("training_modules", "training_pipelines"):
+            _ensure_column(conn, table, "revision", "INTEGER DEFAULT 0")
+            _ensure_column(conn, table, "content_hash", "TEXT")
+        _ensure_column(conn, "spl_snippets", "structure_json", "TEXT")
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_training_modules_type ON training_modules (type)"
         )
@@ -89,8 +273,53 @@ def init_db():
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_training_pipeline_steps_pipeline ON training_pipeline_steps (pipeline_id)"
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_training_modules_revision ON training_modules (revision)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_training_pipelines_revision ON training_pipelines (revision)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_training_tombstones_revision ON training_tombstones (revision)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_spl_snippet_refs_hash ON spl_snippet_refs (hash)"
+        )
+
+
+def _import_legacy_tables():
+    """Copy training tables out of the mappings database they used to share."""
+    if not os.path.exists(LEGACY_DB_PATH):
+        return
+
+    conn = _connect()
+    try:
+        conn.execute("ATTACH DATABASE ? AS legacy", (LEGACY_DB_PATH,))
+        with conn:
+            for table in TRAINING_TABLES:
+                if not conn.execute(
+                    "SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = ?",
+                    (table,)
+                ).fetchone():
+                    continue
+                current = {row["name"] for row in conn.execute(f"PRAGMA main.table_info({table})")}
+                columns = ", ".join(
+                    row["name"] for row in conn.execute(f"PRAGMA legacy.table_info({table})")
+                    if row["name"] in current
+                )
+                conn.execute(
+                    f"INSERT OR IGNORE INTO main.{table} ({columns}) SELECT {columns} FROM legacy.{table}"
+                )
+        conn.execute("DETACH DATABASE legacy")
+    finally:
+        conn.close()
+
 
-    _seed_pipelines_if_empty()
+def _ensure_column(conn, table, column, definition):
+    """Add a column to tables created before it existed."""
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 
 def _seed_pipelines_if_empty():
@@ -125,6 +354,61 @@ def _json_dump(value):
     return json.dumps(value) if value is not None else None
 
 
+def _content_hash(values):
+    encoded = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _current_revision(conn):
+    row = conn.execute(
+        "SELECT value FROM training_meta WHERE key = 'revision'"
+    ).fetchone()
+    return int(row["value"]) if row else 0
+
+
+def _next_revision(conn):
+    """Claim the next content revision inside the caller's transaction."""
+    revision = _current_revision(conn) + 1
+    conn.execute(
+        """
+        INSERT INTO training_meta (key, value) VALUES ('revision', ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """,
+        (str(revision),)
+    )
+    return revision
+
+
+def _ensure_epoch(fresh):
+    """
+    Give a newly created database a random epoch. Its revision counter starts over, so clients
+    holding revisions from an older file must not receive deltas from this one.
+    """
+    with _connect() as conn:
+        epoch = secrets.token_hex(8)
+        if fresh:
+            conn.execute(
+                """
+                INSERT INTO training_meta (key, value) VALUES ('epoch', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                """,
+                (epoch,)
+            )
+        else:
+            # Databases built before epochs existed get one on their next rebuild
+            conn.execute("INSERT OR IGNORE INTO training_meta (key, value) VALUES ('epoch', ?)", (epoch,))
+
+
+def current_epoch(conn):
+    row = conn.execute("SELECT value FROM training_meta WHERE key = 'epoch'").fetchone()
+    return row["value"] if row else ""
+
+
+def get_training_revision():
+    with _read() as conn:
+        return _current_revision(conn)
+
+
 def _row_to_module(row, include_content=False):
     if row is None:
         return None
@@ -184,12 +468,19 @@ def _row_to_step(row):
     }
 
 
+MODULE_INDEX_COLUMNS = """
+    id, type, title, description, category, bucket, difficulty, duration,
+    tags_json, objectives_json, keywords_json, sort_order
+"""
+
+
 def get_training_index():
-    with _connect() as conn:
+    with _read() as conn:
+        revision = _current_revision(conn)
+        epoch = current_epoch(conn)
         rows = conn.execute(
-            """
-            SELECT id, type, title, description, category, bucket, difficulty, duration,
-                   tags_json, objectives_json, keywords_json, sort_order
+            f"""
+            SELECT {MODULE_INDEX_COLUMNS}
             FROM training_modules
             ORDER BY sort_order ASC, title ASC
             """
@@ -206,14 +497,85 @@ def get_training_index():
             training.setdefault(category, []).append(module)
 
     return {
+        "revision": revision,
+        "epoch": epoch,
         "lessons": lessons,
         "training": training,
         "pipelines": get_pipelines()
     }
 
 
+def current_revision(conn):
+    return _current_revision(conn)
+
+
+def iter_index_modules(conn, lessons):
+    """
+    Yield (category, module) for lessons or for the other training types, grouped by
+    category in sorted order and ordered like get_training_index() within each category.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT {MODULE_INDEX_COLUMNS}, COALESCE(NULLIF(category, ''), 'general') AS index_category
+        FROM training_modules
+        WHERE (type = 'lesson') = ?
+        ORDER BY index_category ASC, sort_order ASC, title ASC
+        """,
+        (1 if lessons else 0,)
+    )
+    for row in rows:
+        yield row["index_category"], _row_to_module(row, include_content=False)
+
+
+def get_training_changes(since, epoch=None):
+    """
+    Return modules and pipelines added or changed after revision `since`, plus deletions.
+    Returns None when `since` belongs to another database (a different epoch, or ahead of
+    this one), in which case the caller should send the full index instead.
+    """
+    with _read() as conn:
+        revision = _current_revision(conn)
+        current = current_epoch(conn)
+        if since > revision or (epoch is not None and epoch != current):
+            return None
+
+        module_rows = conn.execute(
+            f"""
+            SELECT {MODULE_INDEX_COLUMNS}
+            FROM training_modules
+            WHERE revision > ?
+            ORDER BY sort_order ASC, title ASC
+            """,
+            (since,)
+        ).fetchall()
+        pipeline_ids = [
+            row["id"] for row in conn.execute(
+                "SELECT id FROM training_pipelines WHERE revision > ?",
+                (since,)
+            )
+        ]
+        tombstones = conn.execute(
+            "SELECT kind, id FROM training_tombstones WHERE revision > ?",
+            (since,)
+        ).fetchall()
+
+    pipeline_id_set = set(pipeline_ids)
+    return {
+        "revision": revision,
+        "epoch": current,
+        "since": since,
+        "delta": True,
+        "modules": [_row_to_module(row) for row in module_rows],
+        "pipelines": [p for p in get_pipelines() if p["id"] in pipeline_id_set] if pipeline_id_set else [],
+        "deleted": {
+            "modules": [row["id"] for row in tombstones if row["kind"] == "module"],
+            "pipelines": [row["id"] for row in tombstones if row["kind"] == "pipeline"]
+        }
+    }
+
+
 def get_training_item(item_id):
-    with _connect() as conn:
+    with _read() as conn:
         row = conn.execute(
             "SELECT * FROM training_modules WHERE id = ?",
             (item_id,)
@@ -221,34 +583,501 @@ def get_training_item(item_id):
     return _row_to_module(row, include_content=True)
 
 
-def get_pipelines():
-    pipelines = []
+def get_training_item_with_snippets(item_id):
+    """One module whose SPL references come with their text under "snippets" (hash -> SPL)."""
+    item = get_training_item(item_id)
+    if item:
+        item["snippets"] = collect_snippets([item])
+    return item
+
+
+def get_training_items(item_ids):
+    """Load several modules with one IN query, returned as an id -> item dict."""
+    item_ids = list(dict.fromkeys(item_id for item_id in item_ids if item_id))
+    if not item_ids:
+        return {}
+
+    placeholders = ", ".join("?" for _ in item_ids)
+    with _read() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM training_modules WHERE id IN ({placeholders})",
+            item_ids
+        ).fetchall()
+    return {row["id"]: _row_to_module(row, include_content=True) for row in rows}
+
+
+def collect_snippets(items):
+    """SPL text (hash -> text) for every snippet referenced in the items' content."""
+    hashes = sorted({
+        digest
+        for item in items
+        for digest in spl_snippets.iter_references(item.get("content"))
+    })
+    return {digest: snippet["spl"] for digest, snippet in get_snippets(hashes, include_analysis=False).items()}
+
+
+def _row_to_snippet(row, include_analysis=True):
+    snippet = {
+        "hash": row["hash"],
+        "spl": row["spl"],
+        "commands": _json_load(row["commands_json"], []),
+        "tokenCount": row["token_count"],
+        "subsearchCount": row["subsearch_count"]
+    }
+    if include_analysis:
+        snippet["analysis"] = _json_load(row["analysis_json"], None)
+    return snippet
+
+
+def get_snippets(hashes, include_analysis=True):
+    """Snippets by hash as a hash -> snippet dict; unknown hashes are left out."""
+    hashes = [digest for digest in dict.fromkeys(hashes) if spl_snippets.is_snippet_hash(digest)]
+    if not hashes:
+        return {}
+    placeholders = ", ".join("?" for _ in hashes)
+    with _read() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM spl_snippets WHERE hash IN ({placeholders})",
+            hashes
+        ).fetchall()
+    return {row["hash"]: _row_to_snippet(row, include_analysis) for row in rows}
+
+
+def get_snippet(digest):
+    """One snippet with the dataset locations that use it, or None."""
+    snippet = get_snippets([digest]).get(digest)
+    if snippet is None:
+        return None
+    with _read() as conn:
+        rows = conn.execute(
+            "SELECT dataset, item_id, location FROM spl_snippet_refs WHERE hash = ? ORDER BY dataset, item_id, location",
+            (digest,)
+        ).fetchall()
+    snippet["refs"] = [
+        {"dataset": row["dataset"], "itemId": row["item_id"], "location": row["location"]}
+        for row in rows
+    ]
+    return snippet
+
+
+def get_cached_analysis(spl):
+    """Stored analyzer result when spl is exactly a known canonical snippet, else None."""
+    if not spl or spl != spl_snippets.canonicalize(spl):
+        return None
+    with _read() as conn:
+        version = conn.execute(
+            "SELECT value FROM training_meta WHERE key = 'snippet_analyzer_version'"
+        ).fetchone()
+        if not version or version["value"] != spl_snippets.analyzer_version():
+            return None
+        row = conn.execute(
+            "SELECT spl, analysis_json FROM spl_snippets WHERE hash = ?",
+            (spl_snippets.snippet_hash(spl),)
+        ).fetchone()
+    if row is None or row["spl"] != spl:
+        return None
+    return _json_load(row["analysis_json"], None)
+
+
+def get_answer_structures(item_id):
+    """
+    Structural forms of a module's reference answers as [(location, stages)], in content order,
+    or None if the module is unknown. Locations are relative to the module, e.g. "steps[2].spl".
+    """
+    with _read() as conn:
+        rows = conn.execute(
+            """
+            SELECT r.location, s.structure_json FROM spl_snippet_refs r
+            JOIN spl_snippets s ON s.hash = r.hash
+            WHERE r.dataset = 'training' AND r.item_id = ?
+            """,
+            (item_id,)
+        ).fetchall()
+        if not rows and not conn.execute("SELECT 1 FROM training_modules WHERE id = ?", (item_id,)).fetchone():
+            return None
+    prefix = f"{item_id}."
+    answers = []
+    for row in rows:
+        location = row["location"][len(prefix):] if row["location"].startswith(prefix) else row["location"]
+        if spl_snippets.ANSWER_LOCATION_PATTERN.match(location):
+            answers.append((location, tuple(_json_load(row["structure_json"], []))))
+    return sorted(answers, key=lambda answer: spl_snippets.location_sort_key(answer[0]))
+
+
+def get_pipeline_source_ids(pipeline_id):
+    """Return the module ids a pipeline's steps point at, in step order, or None if unknown."""
+    with _read() as conn:
+        if not conn.execute(
+            "SELECT 1 FROM training_pipelines WHERE id = ?",
+            (pipeline_id,)
+        ).fetchone():
+            return None
+        rows = conn.execute(
+            """
+            SELECT source_id FROM training_pipeline_steps
+            WHERE pipeline_id = ? AND source_id IS NOT NULL
+              AND (source IS NULL OR source IN ('training', 'lessons'))
+            ORDER BY step_index ASC
+            """,
+            (pipeline_id,)
+        ).fetchall()
+    return [row["source_id"] for row in rows]
+
+
+# Resolved pipelines keyed by id; only valid for _resolved_pipeline_revision
+_resolved_pipeline_cache = {}
+_resolved_pipeline_revision = None
+
+
+def _row_to_step_module(row):
+    if row["module_id"] is None:
+        return None
+    return {
+        "id": row["module_id"],
+        "type": row["module_type"],
+        "title": row["module_title"],
+        "description": row["module_description"] or "",
+        "category": row["module_category"],
+        "difficulty": row["module_difficulty"],
+        "duration": row["module_duration"],
+        "tags": _json_load(row["module_tags_json"], [])
+    }
+
+
+def get_resolved_pipeline(pipeline_id):
+    """
+    Return one pipeline with each step joined to its training module metadata.
+    Results are cached in-process until the content revision changes.
+    """
+    global _resolved_pipeline_revision
+
+    revision = get_training_revision()
+    if revision != _resolved_pipeline_revision:
+        _resolved_pipeline_cache.clear()
+        _resolved_pipeline_revision = revision
+    if pipeline_id in _resolved_pipeline_cache:
+        return _resolved_pipeline_cache[pipeline_id]
+
+    with _read() as conn:
+        rows = conn.execute(
+            """
+            SELECT p.*,
+                   s.id AS step_id, s.title AS step_title, s.type AS step_type,
+                   s.source AS step_source, s.source_id AS step_source_id,
+                   s.description AS step_description, s.duration AS step_duration,
+                   s.link AS step_link,
+                   m.id AS module_id, m.type AS module_type, m.title AS module_title,
+                   m.description AS module_description, m.category AS module_category,
+                   m.difficulty AS module_difficulty, m.duration AS module_duration,
+                   m.tags_json AS module_tags_json
+            FROM training_pipelines p
+            LEFT JOIN training_pipeline_steps s ON s.pipeline_id = p.id
+            LEFT JOIN training_modules m ON m.id = s.source_id
+            WHERE p.id = ?
+            ORDER BY s.step_index ASC
+            """,
+            (pipeline_id,)
+        ).fetchall()
+
+    if not rows:
+        return None
+
+    steps = []
+    for row in rows:
+        if row["step_id"] is None:
+            continue
+        steps.append({
+            "id": row["step_id"],
+            "title": row["step_title"] or row["module_title"] or "",
+            "type": row["step_type"] or row["module_type"] or "",
+            "source": row["step_source"] or "",
+            "sourceId": row["step_source_id"],
+            "description": row["step_description"] or row["module_description"] or "",
+            "duration": row["step_duration"] or row["module_duration"] or "",
+            "link": row["step_link"],
+            "module": _row_to_step_module(row)
+        })
+
+    pipeline = _row_to_pipeline(rows[0], steps)
+    pipeline["revision"] = revision
+    _resolved_pipeline_cache[pipeline_id] = pipeline
+    return pipeline
+
+
+def find_dangling_pipeline_steps():
+    """List pipeline steps whose sourceId does not match any training module; run inside build()."""
     with _connect() as conn:
-        pipeline_rows = conn.execute(
+        rows = conn.execute(
             """
-            SELECT * FROM training_pipelines
-            ORDER BY sort_order ASC, title ASC
+            SELECT s.pipeline_id, s.step_index, s.source, s.source_id
+            FROM training_pipeline_steps s
+            LEFT JOIN training_modules m ON m.id = s.source_id
+            WHERE s.source_id IS NOT NULL
+              AND (s.source IS NULL OR s.source IN ('training', 'lessons'))
+              AND m.id IS NULL
+            ORDER BY s.pipeline_id, s.step_index
             """
         ).fetchall()
-        for row in pipeline_rows:
-            steps_rows = conn.execute(
+    return [
+        {
+            "pipelineId": row["pipeline_id"],
+            "stepIndex": row["step_index"],
+            "source": row["source"],
+            "sourceId": row["source_id"]
+        }
+        for row in rows
+    ]
+
+
+def store_snippets(entries, replace_datasets=(), replace_items=()):
+    """
+    Record (dataset, item_id, location, spl) entries in the snippet store; run inside build().
+    Refs for replace_datasets and for replace_items ((dataset, item_id) pairs) are dropped
+    first, as are refs of removed modules. Analysis and token metadata are computed only for
+    snippets not already stored with the current analyzer version; unused snippets are deleted.
+    """
+    version = spl_snippets.analyzer_version()
+    stats = {"references": 0, "unique": 0, "analyzed": 0, "removed": 0}
+    with _connect() as conn:
+        stored = conn.execute(
+            "SELECT value FROM training_meta WHERE key = 'snippet_analyzer_version'"
+        ).fetchone()
+        if not stored or stored["value"] != version:
+            conn.execute("UPDATE spl_snippets SET analysis_json = NULL")
+            conn.execute(
                 """
-                SELECT * FROM training_pipeline_steps
-                WHERE pipeline_id = ?
-                ORDER BY step_index ASC
+                INSERT INTO training_meta (key, value) VALUES ('snippet_analyzer_version', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
                 """,
-                (row["id"],)
-            ).fetchall()
-            steps = [_row_to_step(step) for step in steps_rows]
-            pipelines.append(_row_to_pipeline(row, steps))
-    return pipelines
+                (version,)
+            )
+
+        for dataset in replace_datasets:
+            conn.execute("DELETE FROM spl_snippet_refs WHERE dataset = ?", (dataset,))
+        conn.executemany(
+            "DELETE FROM spl_snippet_refs WHERE dataset = ? AND item_id = ?",
+            list(replace_items)
+        )
+        conn.execute(
+            """
+            DELETE FROM spl_snippet_refs
+            WHERE dataset = 'training' AND item_id NOT IN (SELECT id FROM training_modules)
+            """
+        )
+
+        checked = set()
+        for dataset, item_id, location, spl in entries:
+            text = spl_snippets.canonicalize(spl)
+            if not text:
+                continue
+            digest = spl_snippets.snippet_hash(text)
+            if digest not in checked:
+                checked.add(digest)
+                row = conn.execute(
+                    "SELECT analysis_json FROM spl_snippets WHERE hash = ?",
+                    (digest,)
+                ).fetchone()
+                if row is None or row["analysis_json"] is None:
+                    metadata = spl_snippets.token_metadata(text)
+                    conn.execute(
+                        """
+                        INSERT INTO spl_snippets (
+                            hash, spl, commands_json, token_count, subsearch_count, analysis_json, structure_json
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(hash) DO UPDATE SET
+                            spl = excluded.spl,
+                            commands_json = excluded.commands_json,
+                            token_count = excluded.token_count,
+                            subsearch_count = excluded.subsearch_count,
+                            analysis_json = excluded.analysis_json,
+                            structure_json = excluded.structure_json
+                        """,
+                        (
+                            digest,
+                            text,
+                            _json_dump(metadata["commands"]),
+                            metadata["tokenCount"],
+                            metadata["subsearchCount"],
+                            _json_dump(spl_analyzer.analyze_spl(text)),
+                            _json_dump(list(spl_structure.structure(text)))
+                        )
+                    )
+                    stats["analyzed"] += 1
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO spl_snippet_refs (hash, dataset, item_id, location)
+                VALUES (?, ?, ?, ?)
+                """,
+                (digest, dataset, item_id or "", location)
+            )
+            stats["references"] += 1
+
+        stats["removed"] = conn.execute(
+            "DELETE FROM spl_snippets WHERE hash NOT IN (SELECT hash FROM spl_snippet_refs)"
+        ).rowcount
+        stats["unique"] = conn.execute("SELECT COUNT(*) FROM spl_snippets").fetchone()[0]
+    return stats
+
+
+def iter_snippet_analyses():
+    """Yield (location, analysis) for every recorded snippet reference; run inside build()."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            """
+            SELECT r.location, s.analysis_json FROM spl_snippet_refs r
+            JOIN spl_snippets s ON s.hash = r.hash
+            ORDER BY r.dataset, r.item_id, r.location
+            """
+        )
+        for row in rows:
+            yield row["location"], _json_load(row["analysis_json"], {"findings": []})
+    finally:
+        conn.close()
+
+
+def iter_modules_with_spl():
+    """Yield (module, [spl, ...]) for every training module using the snippet store; run inside build()."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT {MODULE_INDEX_COLUMNS}, (
+                SELECT json_group_array(s.spl) FROM spl_snippet_refs r
+                JOIN spl_snippets s ON s.hash = r.hash
+                WHERE r.dataset = 'training' AND r.item_id = training_modules.id
+            ) AS spl_json
+            FROM training_modules
+            ORDER BY id
+            """
+        )
+        for row in rows:
+            yield _row_to_module(row), _json_load(row["spl_json"], [])
+    finally:
+        conn.close()
+
+
+def replace_similar_items(rows):
+    """Replace the similarity index with (kind, item_id, rank, neighbor_kind, neighbor_id, title, score) rows; run inside build()."""
+    with _connect() as conn:
+        conn.execute("DELETE FROM similar_items")
+        conn.executemany(
+            """
+            INSERT INTO similar_items (kind, item_id, rank, neighbor_kind, neighbor_id, title, score)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+
+def _similarity_item_exists(conn, kind, item_id):
+    if kind == "training":
+        sql = "SELECT 1 FROM training_modules WHERE id = ?"
+    else:
+        # Library queries are indexed through the snippet store
+        sql = "SELECT 1 FROM spl_snippet_refs WHERE dataset = 'library' AND item_id = ? LIMIT 1"
+    return conn.execute(sql, (item_id,)).fetchone() is not None
+
+
+def get_similar_items(kind, item_id, limit=None):
+    """Precomputed neighbours of one query or training module, best first, or None if it is unknown."""
+    with _read() as conn:
+        rows = conn.execute(
+            """
+            SELECT neighbor_kind, neighbor_id, title, score FROM similar_items
+            WHERE kind = ? AND item_id = ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (kind, item_id, -1 if limit is None else limit)
+        ).fetchall()
+        if not rows and not _similarity_item_exists(conn, kind, item_id):
+            return None
+    return [
+        {"kind": row["neighbor_kind"], "id": row["neighbor_id"], "title": row["title"], "score": round(row["score"], 3)}
+        for row in rows
+    ]
+
+
+def get_static_ids():
+    """Ids behind every read-only training, snippet and similarity URL, for the static export."""
+    with _read() as conn:
+        return {
+            "modules": [row[0] for row in conn.execute("SELECT id FROM training_modules ORDER BY id")],
+            "pipelines": [row[0] for row in conn.execute("SELECT id FROM training_pipelines ORDER BY id")],
+            "snippets": [row[0] for row in conn.execute("SELECT hash FROM spl_snippets ORDER BY hash")],
+            "queries": [
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT item_id FROM spl_snippet_refs WHERE dataset = 'library' ORDER BY item_id"
+                )
+            ]
+        }
+
+
+def iter_pipelines(conn):
+    pipeline_rows = conn.execute(
+        """
+        SELECT * FROM training_pipelines
+        ORDER BY sort_order ASC, title ASC
+        """
+    )
+    for row in pipeline_rows:
+        steps_rows = conn.execute(
+            """
+            SELECT * FROM training_pipeline_steps
+            WHERE pipeline_id = ?
+            ORDER BY step_index ASC
+            """,
+            (row["id"],)
+        ).fetchall()
+        yield _row_to_pipeline(row, [_row_to_step(step) for step in steps_rows])
+
+
+def get_pipelines():
+    with _read() as conn:
+        return list(iter_pipelines(conn))
 
 
 def reset_training_data():
+    prune_training_data([], [])
+
+
+def prune_training_data(keep_module_ids, keep_pipeline_ids):
+    """Delete modules and pipelines not in the keep sets, leaving tombstones for delta sync."""
+    keep_modules = set(keep_module_ids)
+    keep_pipelines = set(keep_pipeline_ids)
+    removed = {"modules": [], "pipelines": []}
+
     with _connect() as conn:
-        conn.execute("DELETE FROM training_pipeline_steps")
-        conn.execute("DELETE FROM training_pipelines")
-        conn.execute("DELETE FROM training_modules")
+        module_ids = [row["id"] for row in conn.execute("SELECT id FROM training_modules")]
+        pipeline_ids = [row["id"] for row in conn.execute("SELECT id FROM training_pipelines")]
+        stale_modules = [module_id for module_id in module_ids if module_id not in keep_modules]
+        stale_pipelines = [pipeline_id for pipeline_id in pipeline_ids if pipeline_id not in keep_pipelines]
+        if not stale_modules and not stale_pipelines:
+            return removed
+
+        revision = _next_revision(conn)
+        for module_id in stale_modules:
+            conn.execute("DELETE FROM training_modules WHERE id = ?", (module_id,))
+            _record_tombstone(conn, "module", module_id, revision)
+        for pipeline_id in stale_pipelines:
+            conn.execute("DELETE FROM training_pipeline_steps WHERE pipeline_id = ?", (pipeline_id,))
+            conn.execute("DELETE FROM training_pipelines WHERE id = ?", (pipeline_id,))
+            _record_tombstone(conn, "pipeline", pipeline_id, revision)
+
+    removed["modules"] = stale_modules
+    removed["pipelines"] = stale_pipelines
+    return removed
+
+
+def _record_tombstone(conn, kind, item_id, revision):
+    conn.execute(
+        """
+        INSERT INTO training_tombstones (kind, id, revision) VALUES (?, ?, ?)
+        ON CONFLICT(kind, id) DO UPDATE SET revision = excluded.revision
+        """,
+        (kind, item_id, revision)
+    )
 
 
 def upsert_module(module):
@@ -265,14 +1094,39 @@ def upsert_module(module):
     if content_format == "json" and not isinstance(content, str):
         content = json.dumps(content)
 
+    values = [
+        module.get("type"),
+        module.get("title"),
+        module.get("description", ""),
+        module.get("category"),
+        module.get("bucket"),
+        module.get("difficulty"),
+        module.get("duration"),
+        _json_dump(tags),
+        _json_dump(objectives),
+        _json_dump(keywords),
+        content_format,
+        content,
+        module.get("sortOrder", 0)
+    ]
+    content_hash = _content_hash(values)
+
     with _connect() as conn:
+        existing = conn.execute(
+            "SELECT content_hash FROM training_modules WHERE id = ?",
+            (module_id,)
+        ).fetchone()
+        if existing and existing["content_hash"] == content_hash:
+            return module_id
+
+        revision = _next_revision(conn)
         conn.execute(
             """
             INSERT INTO training_modules (
                 id, type, title, description, category, bucket, difficulty, duration,
                 tags_json, objectives_json, keywords_json, content_format, content,
-                sort_order, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                sort_order, revision, content_hash, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(id) DO UPDATE SET
                 type = excluded.type,
                 title = excluded.title,
@@ -287,26 +1141,15 @@ def upsert_module(module):
                 content_format = excluded.content_format,
                 content = excluded.content,
                 sort_order = excluded.sort_order,
+                revision = excluded.revision,
+                content_hash = excluded.content_hash,
                 updated_at = excluded.updated_at
             """,
-            (
-                module_id,
-                module.get("type"),
-                module.get("title"),
-                module.get("description", ""),
-                module.get("category"),
-                module.get("bucket"),
-                module.get("difficulty"),
-                module.get("duration"),
-                _json_dump(tags),
-                _json_dump(objectives),
-                _json_dump(keywords),
-                content_format,
-                content,
-                module.get("sortOrder", 0),
-                now,
-                now
-            )
+            (module_id, *values, revision, content_hash, now, now)
+        )
+        conn.execute(
+            "DELETE FROM training_tombstones WHERE kind = 'module' AND id = ?",
+            (module_id,)
         )
     return module_id
 
@@ -319,13 +1162,49 @@ def upsert_pipeline(pipeline):
     now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
     objectives = pipeline.get("objectives", [])
 
+    values = [
+        pipeline.get("title"),
+        pipeline.get("description", ""),
+        pipeline.get("level"),
+        pipeline.get("duration"),
+        pipeline.get("icon", ""),
+        _json_dump(objectives),
+        pipeline.get("track"),
+        pipeline.get("sortOrder", 0)
+    ]
+    steps = []
+    for index, step in enumerate(pipeline.get("steps", [])):
+        raw_step_id = step.get("id") or f"step-{index + 1}"
+        steps.append([
+            f"{pipeline_id}-{raw_step_id}",
+            pipeline_id,
+            index,
+            step.get("title", ""),
+            step.get("type"),
+            step.get("source"),
+            step.get("sourceId"),
+            step.get("description", ""),
+            step.get("duration"),
+            step.get("link")
+        ])
+    content_hash = _content_hash([values, steps])
+
     with _connect() as conn:
+        existing = conn.execute(
+            "SELECT content_hash FROM training_pipelines WHERE id = ?",
+            (pipeline_id,)
+        ).fetchone()
+        if existing and existing["content_hash"] == content_hash:
+            return pipeline_id
+
+        revision = _next_revision(conn)
         conn.execute(
             """
             INSERT INTO training_pipelines (
                 id, title, description, level, duration, icon,
-                objectives_json, track, sort_order, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                objectives_json, track, sort_order, revision, content_hash,
+                created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(id) DO UPDATE SET
                 title = excluded.title,
                 description = excluded.description,
@@ -335,21 +1214,11 @@ def upsert_pipeline(pipeline):
                 objectives_json = excluded.objectives_json,
                 track = excluded.track,
                 sort_order = excluded.sort_order,
+                revision = excluded.revision,
+                content_hash = excluded.content_hash,
                 updated_at = excluded.updated_at
             """,
-            (
-                pipeline_id,
-                pipeline.get("title"),
-                pipeline.get("description", ""),
-                pipeline.get("level"),
-                pipeline.get("duration"),
-                pipeline.get("icon", ""),
-                _json_dump(objectives),
-                pipeline.get("track"),
-                pipeline.get("sortOrder", 0),
-                now,
-                now
-            )
+            (pipeline_id, *values, revision, content_hash, now, now)
         )
 
         conn.execute(
@@ -357,28 +1226,18 @@ def upsert_pipeline(pipeline):
             (pipeline_id,)
         )
 
-        for index, step in enumerate(pipeline.get("steps", [])):
-            raw_step_id = step.get("id") or f"step-{index + 1}"
-            step_id = f"{pipeline_id}-{raw_step_id}"
-            conn.execute(
-                """
-                INSERT INTO training_pipeline_steps (
-                    id, pipeline_id, step_index, title, type, source, source_id,
-                    description, duration, link
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    step_id,
-                    pipeline_id,
-                    index,
-                    step.get("title", ""),
-                    step.get("type"),
-                    step.get("source"),
-                    step.get("sourceId"),
-                    step.get("description", ""),
-                    step.get("duration"),
-                    step.get("link")
-                )
-            )
+        conn.executemany(
+            """
+            INSERT INTO training_pipeline_steps (
+                id, pipeline_id, step_index, title, type, source, source_id,
+                description, duration, link
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            steps
+        )
+        conn.execute(
+            "DELETE FROM training_tombstones WHERE kind = 'pipeline' AND id = ?",
+            (pipeline_id,)
+        )
 
     return pipeline_id
@@ -0,0 +1,163 @@
+"""
+Serialized SQLite writer with group commit and backpressure.
+One thread per process owns the write connection; concurrent mutations are batched into a
+single transaction (one savepoint each) and callers are turned away once the queue is full.
+"""
+
+import math
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_CONFIG = {
+    # Pending mutations allowed before callers get WriteQueueFull (HTTP 503)
+    "WRITE_QUEUE_SIZE": 256,
+    # Most mutations committed together in one transaction
+    "WRITE_BATCH_SIZE": 64,
+    # SQLite busy_timeout per attempt, in seconds
+    "WRITE_BUSY_TIMEOUT": 2.0,
+    # Give up on the write lock after retrying with backoff for this long
+    "WRITE_LOCK_DEADLINE": 10.0,
+    # How long a caller waits for its mutation to start before giving up
+    "WRITE_WAIT_TIMEOUT": 15.0
+}
+
+
+class WriteQueueFull(Exception):
+    """Too many mutations are pending; retry after retry_after seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Write queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class WriteUnavailable(Exception):
+    """The write lock could not be obtained in time; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _is_busy(exc):
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+class WriteQueue:
+    def __init__(self, db_path, config=None):
+        self.db_path = db_path
+        config = config or {}
+        self.config = {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+        self.jobs = queue.Queue(maxsize=self.config["WRITE_QUEUE_SIZE"])
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        # Moving average of seconds per committed mutation, for Retry-After estimates
+        self.seconds_per_job = 0.005
+        self.stats = {"batches": 0, "jobs": 0, "rejected": 0, "busyRetries": 0}
+
+    def submit(self, job):
+        """Run job(conn) on the writer thread and return its result (or raise its exception)."""
+        self._ensure_thread()
+        future = Future()
+        try:
+            self.jobs.put_nowait((job, future))
+        except queue.Full:
+            self.stats["rejected"] += 1
+            raise WriteQueueFull(self.retry_after())
+
+        try:
+            return future.result(timeout=self.config["WRITE_WAIT_TIMEOUT"])
+        except TimeoutError:
+            if future.cancel():
+                raise WriteUnavailable("Timed out waiting for the database writer", self.retry_after())
+            # Already running: it will finish shortly, so report its real outcome
+            return future.result()
+
+    def retry_after(self):
+        return max(1, math.ceil(self.jobs.qsize() * self.seconds_per_job))
+
+    def _ensure_thread(self):
+        # Started lazily so each forked worker gets its own writer
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.config["WRITE_BUSY_TIMEOUT"],
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, retrying with jittered exponential backoff while other workers write."""
+        deadline = time.monotonic() + self.config["WRITE_LOCK_DEADLINE"]
+        delay = 0.02
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as exc:
+                if not _is_busy(exc) or time.monotonic() + delay > deadline:
+                    raise WriteUnavailable(f"Database is busy: {exc}", self.retry_after()) from exc
+                self.stats["busyRetries"] += 1
+                time.sleep(delay * (0.5 + random.random()))
+                delay = min(delay * 2, 1.0)
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        while len(batch) < self.config["WRITE_BATCH_SIZE"]:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            results = []
+            try:
+                self._begin(conn)
+                for index, (job, future) in enumerate(batch):
+                    # Each mutation gets a savepoint so one failure does not undo the others
+                    conn.execute(f"SAVEPOINT job_{index}")
+                    try:
+                        results.append((future, job(conn), None))
+                        conn.execute(f"RELEASE job_{index}")
+                    except Exception as exc:
+                        conn.execute(f"ROLLBACK TO job_{index}")
+                        conn.execute(f"RELEASE job_{index}")
+                        results.append((future, None, exc))
+                conn.execute("COMMIT")
+            except Exception as exc:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+            elapsed = time.perf_counter() - started
+            self.seconds_per_job = 0.8 * self.seconds_per_job + 0.2 * (elapsed / len(batch))
+            self.stats["batches"] += 1
+            self.stats["jobs"] += len(batch)